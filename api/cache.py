@@ -0,0 +1,210 @@
+# api/cache.py
+"""Two-tier response cache for read endpoints (/stats, /stats/rollup, /search).
+
+Answers are kept in a bounded in-process LRU and, when a Redis URL is given,
+in Redis so every API process shares them. Each entry remembers the ingest
+watermark it was computed under: it is served while younger than its
+endpoint's TTL, but once an ingest has moved the watermark only while younger
+than max_staleness, which bounds how long fresh rows stay invisible.
+Concurrent misses for the same key are coalesced into one computation.
+
+The watermark only advances on writes made through this API (shared through
+Redis when it is configured); rows written by other processes, such as the
+ingestion engine, show up once the TTL expires. The Redis watermark is re-read
+at most every max_staleness / 2, so a write through another API process can
+stay invisible for up to 1.5 x max_staleness.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from fastapi.encoders import jsonable_encoder
+
+WATERMARK_KEY = "watermark"
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1000, max_staleness=0.2, redis_url=None, namespace="agentops:responses"):
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self.namespace = namespace
+
+        self._entries = OrderedDict()  # key -> (value, created_at, watermark), oldest first
+        self._inflight = {}            # key -> Future of the computation other callers wait on
+        self._lock = threading.Lock()
+        self._watermark = 0
+        self._shared_watermark = None  # (value, read_at) of the Redis watermark, reused for max_staleness / 2
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0  # entries skipped: an ingest landed since and they were older than max_staleness
+        self.evictions = 0
+        self.redis_errors = 0
+
+        self._redis = None
+        if redis_url:
+            import redis  # Only needed for the shared tier
+            self._redis = redis.Redis.from_url(redis_url)
+
+    def _key(self, endpoint, params):
+        digest = hashlib.sha1(json.dumps(jsonable_encoder(params), sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{endpoint}:{digest}"
+
+    # --- Ingest watermark ---
+
+    def bump(self):
+        """Call after every committed ingest."""
+        with self._lock:
+            self._watermark += 1
+        if self._redis is not None:
+            try:
+                value = int(self._redis.incr(f"{self.namespace}:{WATERMARK_KEY}"))
+            except Exception as e:
+                self._redis_failed(e)
+            else:
+                with self._lock:
+                    self._shared_watermark = (value, time.monotonic())  # Our own write is visible at once
+
+    def watermark(self):
+        if self._redis is not None:
+            now = time.monotonic()
+            with self._lock:
+                cached = self._shared_watermark
+            if cached is not None and now - cached[1] < self.max_staleness / 2:
+                return cached[0]
+            try:
+                value = int(self._redis.get(f"{self.namespace}:{WATERMARK_KEY}") or 0)
+            except Exception as e:
+                self._redis_failed(e)
+            else:
+                with self._lock:
+                    self._shared_watermark = (value, now)
+                return value
+        return self._watermark
+
+    def _redis_failed(self, error):
+        if not self.redis_errors:
+            print(f"⚠️ Response cache: Redis unavailable, using the in-process tier only ({error})")
+        self.redis_errors += 1
+
+    # --- Lookup ---
+
+    def _fresh(self, entry, ttl, watermark, now):
+        _, created, entry_watermark = entry
+        age = now - created
+        if age >= ttl:
+            return False
+        if entry_watermark != watermark and age >= self.max_staleness:
+            self.stale += 1
+            return False
+        return True
+
+    def get_or_compute(self, endpoint, params, ttl, compute):
+        """Cached answer for (endpoint, params), or compute() once however many callers miss together."""
+        if ttl <= 0:
+            return compute()
+        key = self._key(endpoint, params)
+        watermark = self.watermark()
+        now = time.time()
+
+        # 1. Memory tier
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry, ttl, watermark, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        # 2. Redis tier
+        entry = self._redis_get(key)
+        if entry is not None:
+            with self._lock:
+                fresh = self._fresh(entry, ttl, watermark, now)
+                if fresh:
+                    self.redis_hits += 1
+            if fresh:
+                self._store(key, entry)
+                return entry[0]
+
+        # 3. One computation per key; everyone else who misses meanwhile waits for it
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = jsonable_encoder(compute())
+            entry = (value, time.time(), watermark)
+            self._store(key, entry)
+            self._redis_set(key, entry, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _redis_get(self, key):
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(key)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return data["value"], data["created"], data["watermark"]
+
+    def _redis_set(self, key, entry, ttl):
+        if self._redis is None:
+            return
+        value, created, watermark = entry
+        try:
+            self._redis.set(key, json.dumps({"value": value, "created": created, "watermark": watermark}),
+                            px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            self._redis_failed(e)
+
+    def stats(self):
+        lookups = self.hits + self.redis_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "watermark": self._watermark,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "redis": self._redis is not None,
+            "redis_errors": self.redis_errors,
+            "hit_rate": round((self.hits + self.redis_hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._redis is not None:
+            self._redis.close()
+            self._redis = None
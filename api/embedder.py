@@ -0,0 +1,165 @@
+# api/embedder.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class EmbeddingService:
+    """Batches concurrent encode calls into shared model calls on dedicated worker threads.
+
+    Request threads call encode() (or submit() for a future) with their texts;
+    a worker takes the first waiting request, keeps collecting for up to
+    batch_window seconds or until max_batch texts, runs encode_fn once on all
+    of them and resolves each request's future with its slice. A request
+    larger than max_batch is encoded on its own. Workers are threads: torch
+    releases the GIL during inference, and one copy of the model is shared.
+    """
+
+    def __init__(self, encode_fn, batch_window=0.005, max_batch=64, workers=1, torch_threads=None):
+        self.encode_fn = encode_fn
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.workers = workers
+        self.torch_threads = torch_threads
+
+        self._queue = queue.Queue()  # (texts, future, enqueued_at)
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+
+        # Counters (read by stats())
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.max_batch_seen = 0
+        self._total_queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self._total_inference_ms = 0.0
+        self.max_inference_ms = 0.0
+
+    def start(self):
+        if self.torch_threads:
+            import torch  # Only touched when the intra-op pool size is overridden
+            torch.set_num_threads(self.torch_threads)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"embedder-service-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, texts) -> Future:
+        """Queues texts for the next batch; the future resolves to one vector per text."""
+        future = Future()
+        if not texts:
+            future.set_result([])
+            return future
+        with self._lock:  # Checked and queued together, so stop() can't miss a request
+            if not self._stopping.is_set():
+                self._queue.put((list(texts), future, time.perf_counter()))
+                return future
+        future.set_exception(RuntimeError("Embedding service is stopped"))
+        return future
+
+    def encode(self, texts):
+        """Blocking submit(): drop-in for model.encode(texts) in request threads."""
+        return self.submit(texts).result()
+
+    def stop(self, timeout=30.0):
+        """Stops accepting requests; workers finish what is already queued.
+
+        Requests the workers didn't get to before exiting (or before timeout)
+        fail instead of leaving their callers waiting forever.
+        """
+        with self._lock:
+            self._stopping.set()
+        for t in self._threads:
+            t.join(timeout)
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(RuntimeError("Embedding service is stopped"))
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "depth": self._queue.qsize(),
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_texts": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "max_batch_texts": self.max_batch_seen,
+            # Time a request waited for its batch to start vs time the model spent on batches
+            "avg_queue_ms": round(self._total_queue_ms / self.requests, 3) if self.requests else 0.0,
+            "max_queue_ms": round(self.max_queue_ms, 3),
+            "avg_inference_ms": round(self._total_inference_ms / self.batches, 3) if self.batches else 0.0,
+            "max_inference_ms": round(self.max_inference_ms, 3),
+        }
+
+    def _run(self):
+        carry = None  # a request that didn't fit in the previous batch
+        while True:
+            # 1. Wait for the first request of the next batch
+            if carry is not None:
+                first, carry = carry, None
+            else:
+                try:
+                    first = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stopping.is_set():
+                        return
+                    continue
+
+            # 2. Collect more until the batch is full or its window closes
+            batch = [first]
+            size = len(first[0])
+            deadline = time.perf_counter() + self.batch_window
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if size + len(request[0]) > self.max_batch:
+                    carry = request
+                    break
+                batch.append(request)
+                size += len(request[0])
+
+            self._encode(batch)
+
+    def _encode(self, batch):
+        start = time.perf_counter()
+        texts = [text for request_texts, _, _ in batch for text in request_texts]
+        try:
+            vectors = self.encode_fn(texts)
+        except Exception as e:
+            print(f"⚠️ Embedding batch failed ({len(texts)} texts): {e}")
+            with self._lock:
+                self.failed_batches += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        offset = 0
+        for request_texts, future, _ in batch:
+            future.set_result(vectors[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+        with self._lock:
+            self.batches += 1
+            self.texts += len(texts)
+            self.max_batch_seen = max(self.max_batch_seen, len(texts))
+            self._total_inference_ms += elapsed_ms
+            self.max_inference_ms = max(self.max_inference_ms, elapsed_ms)
+            for _, _, enqueued_at in batch:
+                queue_ms = (start - enqueued_at) * 1000
+                self.requests += 1
+                self._total_queue_ms += queue_ms
+                self.max_queue_ms = max(self.max_queue_ms, queue_ms)
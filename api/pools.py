@@ -0,0 +1,220 @@
+# api/pools.py
+"""Read/write connection routing for one shard.
+
+Writes use the primary's write pool. Reads go to a healthy replica (round
+robin or lowest measured latency) whose replication lag is within the bound,
+and otherwise to a separate read pool on the primary, so dashboard polling
+never queues behind ingestion for the same connections.
+"""
+import itertools
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import psycopg
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+# Seconds behind the primary. 0 on a primary, or on a replica that has replayed all it received
+# while its WAL receiver is streaming and has heard from the primary within wal_receiver_timeout
+# (an idle primary would otherwise make pg_last_xact_replay_timestamp() look ever more stale).
+# A disconnected receiver stops receiving, so "replayed all it received" alone proves nothing:
+# then the lag is the age of the last replayed commit, and NULL (unknown) before the first one.
+# pg_stat_wal_receiver only shows status to roles with pg_read_all_stats (e.g. via pg_monitor);
+# without it every replica is measured the conservative way.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() AND EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver
+            WHERE status = 'streaming'
+              AND last_msg_receipt_time > now() - current_setting('wal_receiver_timeout')::interval
+        ) THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+STRATEGIES = ("round_robin", "least_latency")
+
+
+def make_pool(dsn, max_size, name):
+    return ConnectionPool(dsn, min_size=1, max_size=max_size, kwargs={"row_factory": dict_row}, open=False, name=name)
+
+
+def pool_stats(pool):
+    """Size and wait-time counters of one psycopg pool."""
+    stats = pool.get_stats()
+    requests = stats.get("requests_num", 0)
+    return {
+        "name": pool.name,
+        "min_size": stats.get("pool_min"),
+        "max_size": stats.get("pool_max"),
+        "size": stats.get("pool_size"),
+        "available": stats.get("pool_available"),
+        "waiting": stats.get("requests_waiting", 0),
+        "requests": requests,
+        "queued": stats.get("requests_queued", 0),
+        "wait_ms_total": stats.get("requests_wait_ms", 0),
+        "wait_ms_avg": round(stats.get("requests_wait_ms", 0) / requests, 3) if requests else None,
+        "errors": stats.get("requests_errors", 0),
+    }
+
+
+class Replica:
+    def __init__(self, pool):
+        self.pool = pool
+        self.healthy = False  # until the first health check passes
+        self.latency_ms = None  # EWMA of the health-check round trip
+        self.lag_secs = None
+        self.routed = 0
+        self.last_error = None
+
+    def stats(self):
+        return {
+            "healthy": self.healthy,
+            "latency_ms": None if self.latency_ms is None else round(self.latency_ms, 3),
+            "lag_secs": self.lag_secs,
+            "routed": self.routed,
+            "last_error": self.last_error,
+            "pool": pool_stats(self.pool),
+        }
+
+
+class ReadRouter:
+    """Picks the pool each read runs on and health-checks the replicas in the background."""
+
+    def __init__(self, primary_pool, replica_pools=(), strategy="round_robin", max_lag=None, check_interval=5.0,
+                 check_timeout=2.0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy: {strategy!r} (expected one of {STRATEGIES})")
+        self.primary = primary_pool
+        self.replicas = [Replica(pool) for pool in replica_pools]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self.primary_reads = 0
+        self.fallbacks = 0  # reads sent to the primary although replicas are configured
+        self._next = itertools.count()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def pools(self):
+        return [self.primary] + [r.pool for r in self.replicas]
+
+    # --- Routing ---
+
+    def _eligible(self, replica):
+        if not replica.healthy:
+            return False
+        return self.max_lag is None or (replica.lag_secs is not None and replica.lag_secs <= self.max_lag)
+
+    def choose(self):
+        """The replica to read from, or None for the primary."""
+        candidates = [r for r in self.replicas if self._eligible(r)]
+        if not candidates:
+            return None
+        if self.strategy == "least_latency":
+            return min(candidates, key=lambda r: r.latency_ms)
+        return candidates[next(self._next) % len(candidates)]
+
+    @contextmanager
+    def connection(self):
+        replica = self.choose()
+        if replica is None:
+            self.primary_reads += 1
+            if self.replicas:
+                self.fallbacks += 1
+            with self.primary.connection() as conn:
+                yield conn
+            return
+        replica.routed += 1
+        with ExitStack() as stack:
+            try:
+                conn = stack.enter_context(replica.pool.connection())
+            except (psycopg.OperationalError, PoolTimeout) as e:
+                # Couldn't get a connection: out of rotation until the next health check says otherwise
+                replica.healthy = False
+                replica.last_error = str(e)
+                raise
+            # The caller's own errors (e.g. a statement_timeout cancel) say nothing about the replica
+            yield conn
+
+    @contextmanager
+    def dedicated_connection(self, connect_timeout=10):
+        """A fresh connection outside the pools (replica or primary, routed like connection()), closed on exit.
+
+        For long reads such as exports, which would otherwise hold a pooled
+        connection for as long as the client takes to download.
+        """
+        replica = self.choose()
+        pool = self.primary if replica is None else replica.pool
+        if replica is None:
+            self.primary_reads += 1
+            if self.replicas:
+                self.fallbacks += 1
+        else:
+            replica.routed += 1
+        try:
+            conn = psycopg.connect(pool.conninfo, connect_timeout=connect_timeout, **pool.kwargs)
+        except psycopg.OperationalError as e:
+            if replica is not None:
+                replica.healthy = False
+                replica.last_error = str(e)
+            raise
+        with conn:
+            yield conn
+
+    # --- Health checks ---
+
+    def check(self):
+        for replica in self.replicas:
+            started = time.perf_counter()
+            try:
+                with replica.pool.connection(timeout=self.check_timeout) as conn:
+                    with conn.cursor(row_factory=tuple_row) as cur:
+                        cur.execute(LAG_SQL)
+                        lag = cur.fetchone()[0]
+            except Exception as e:
+                if replica.healthy:
+                    print(f"⚠️ Read replica {replica.pool.name} failed its health check: {e}")
+                replica.healthy = False
+                replica.last_error = str(e)
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            replica.latency_ms = elapsed_ms if replica.latency_ms is None else 0.3 * elapsed_ms + 0.7 * replica.latency_ms
+            replica.lag_secs = None if lag is None else round(float(lag), 3)  # None: unknown, never within max_lag
+            replica.healthy = True
+            replica.last_error = None
+
+    def run(self):
+        while not self._stopping.wait(self.check_interval):
+            self.check()
+
+    # --- Lifecycle ---
+
+    def open(self):
+        for pool in self.pools:
+            pool.open()
+        if self.replicas:
+            self.check()
+            self._thread = threading.Thread(target=self.run, name="replica-health", daemon=True)
+            self._thread.start()
+
+    def close(self, timeout=10.0):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        for pool in self.pools:
+            pool.close()
+
+    def stats(self):
+        return {
+            "strategy": self.strategy,
+            "max_lag_secs": self.max_lag,
+            "primary_reads": self.primary_reads,
+            "fallbacks": self.fallbacks,
+            "primary": pool_stats(self.primary),
+            "replicas": [r.stats() for r in self.replicas],
+        }
@@ -0,0 +1,122 @@
+# api/search.py
+import json
+
+from database.vector_index import set_search_params
+
+# Filters matching fewer rows than this are searched exactly over the filtered set
+EXACT_SEARCH_THRESHOLD = 5000
+# Over-fetch factor for ANN scans on pgvector builds without iterative index scans
+ANN_OVERFETCH = 10
+
+_iterative_scan_supported = None
+
+
+def _supports_iterative_scan(cur):
+    """pgvector >= 0.8 can keep walking the HNSW graph until enough rows pass the filter."""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cur.fetchone()
+        if not row:
+            return False
+        version = row["extversion"] if isinstance(row, dict) else row[0]
+        major, minor = (int(x) for x in version.split(".")[:2])
+        _iterative_scan_supported = (major, minor) >= (0, 8)
+    return _iterative_scan_supported
+
+
+def build_filters(agent_id=None, level=None, since=None, until=None, payload=None):
+    """Returns (sql, params) for the WHERE clause. Each predicate has a supporting index."""
+    clauses = ["embedding IS NOT NULL"]
+    params = []
+    if agent_id:
+        clauses.append("agent_id = %s")         # agent_logs_agent_ts_idx
+        params.append(agent_id)
+    if level:
+        clauses.append("level = %s")            # agent_logs_level_ts_idx
+        params.append(level)
+    if since:
+        clauses.append("ts >= %s")
+        params.append(since)
+    if until:
+        clauses.append("ts < %s")
+        params.append(until)
+    if payload:
+        clauses.append("payload @> %s::jsonb")  # agent_logs_payload_gin_idx (jsonb_path_ops)
+        params.append(json.dumps(payload))
+    return " AND ".join(clauses), params
+
+
+def hybrid_search(conn, vector, limit=5, ef_search=None, probes=None, **filters):
+    """Top-`limit` rows by cosine similarity among rows matching the filters.
+
+    Selective filters are answered exactly from the B-tree/GIN indexes (a
+    materialized candidate set sorted by distance), so the ANN index can never
+    return a handful of neighbours that the filter then throws away. Broad
+    filters use the ANN index with iterative scans (or over-fetching).
+    """
+    where, params = build_filters(**filters)
+    vector = str(vector)
+    columns = "id, ts, agent_id, level, action, payload, trace_id, span_id, embedding <=> %s::vector AS distance"
+
+    with conn.cursor() as cur:
+        # 1. How selective is the filter? (capped count, index-only where possible)
+        selective = False
+        if len(params) > 0:
+            cur.execute(
+                f"SELECT count(*) AS n FROM (SELECT 1 FROM agent_logs WHERE {where} LIMIT %s) AS c",
+                params + [EXACT_SEARCH_THRESHOLD],
+            )
+            row = cur.fetchone()
+            matched = row["n"] if isinstance(row, dict) else row[0]
+            selective = matched < EXACT_SEARCH_THRESHOLD
+
+        exact_sql = f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT id, ts, agent_id, level, action, payload, trace_id, span_id, embedding
+                FROM agent_logs
+                WHERE {where}
+            )
+            SELECT {columns}
+            FROM candidates
+            ORDER BY distance
+            LIMIT %s
+        """
+        exact_params = params + [vector, limit]
+
+        if selective:
+            cur.execute(exact_sql, exact_params)
+            rows = cur.fetchall()
+            conn.commit()
+            return rows
+
+        # 2. Broad (or no) filter: ANN index scan
+        if _supports_iterative_scan(cur):
+            cur.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+            cur.execute("SET LOCAL ivfflat.iterative_scan = relaxed_order")
+        elif len(params) > 0:
+            ef_search = max(ef_search or 40, limit * ANN_OVERFETCH)
+        set_search_params(cur, ef_search, probes)
+
+        cur.execute(
+            f"""
+            SELECT * FROM (
+                SELECT {columns}
+                FROM agent_logs
+                WHERE {where}
+                ORDER BY embedding <=> %s::vector
+                LIMIT %s
+            ) AS ann
+            ORDER BY distance
+            """,
+            [vector] + params + [vector, limit],
+        )
+        rows = cur.fetchall()
+
+        # 3. The ANN walk ran out before finding enough matches: fall back to exact
+        if len(rows) < limit and len(params) > 0:
+            cur.execute(exact_sql, exact_params)
+            rows = cur.fetchall()
+
+        conn.commit()
+        return rows
@@ -0,0 +1,139 @@
+# api/stream.py
+import asyncio
+from collections import deque
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class Subscriber:
+    """One connected client: a bounded buffer plus a count of points it failed to keep up with."""
+
+    def __init__(self, buffer_size):
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+        self.lagging = 0     # consecutive points dropped since the client last read
+        self.dropped = 0
+        self.closed = False
+
+    async def get(self):
+        point = await self.queue.get()
+        self.lagging = 0
+        return point
+
+
+class StatsBroadcaster:
+    """Single producer, many subscribers.
+
+    produce_fn (blocking, run on the threadpool) returns the latest points as
+    dicts carrying a numeric "ts"; the broadcaster polls it once per interval,
+    works out which points are new or changed, and fans those deltas out to
+    every subscriber. A full subscriber buffer drops its oldest point; a
+    client that drops max_lag points in a row is disconnected.
+    """
+
+    def __init__(self, produce_fn, interval=0.2, buffer_size=64, max_lag=256, history=100):
+        self.produce_fn = produce_fn
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self.max_lag = max_lag
+
+        self.subscribers = set()
+        self.history = deque(maxlen=history)  # replayed to new clients as a snapshot
+        self._last = {}                       # ts -> last point sent, for delta detection
+        self._task = None
+
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+        self.errors = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for sub in list(self.subscribers):
+            self._close(sub)
+
+    def subscribe(self):
+        sub = Subscriber(self.buffer_size)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+        if not self.subscribers:
+            # Nobody listening means no polling, so the history would go stale: the next
+            # client starts from a fresh snapshot instead
+            self.history.clear()
+            self._last.clear()
+
+    def snapshot(self):
+        return list(self.history)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "disconnected_slow_consumers": self.disconnected,
+            "producer_errors": self.errors,
+        }
+
+    async def _run(self):
+        while True:
+            # Only poll the database while someone is listening
+            if self.subscribers:
+                try:
+                    points = await run_in_threadpool(self.produce_fn)
+                    for point in self._deltas(points):
+                        self.publish(point)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"⚠️ Stats stream producer failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def _deltas(self, points):
+        fresh = []
+        for point in points:
+            if self._last.get(point["ts"]) != point:
+                self._last[point["ts"]] = point
+                fresh.append(point)
+        # Forget points older than anything the producer still returns
+        if points:
+            oldest = min(p["ts"] for p in points)
+            for ts in [ts for ts in self._last if ts < oldest]:
+                del self._last[ts]
+        return fresh
+
+    def publish(self, point):
+        self.published += 1
+        if self.history and self.history[-1]["ts"] == point["ts"]:
+            self.history[-1] = point  # the current second is still accumulating
+        else:
+            self.history.append(point)
+
+        for sub in list(self.subscribers):
+            if sub.queue.full():
+                # Slow consumer: drop its oldest point rather than block everyone else
+                sub.queue.get_nowait()
+                sub.dropped += 1
+                sub.lagging += 1
+                self.dropped += 1
+                if sub.lagging >= self.max_lag:
+                    self.disconnected += 1
+                    self._close(sub)
+                    continue
+            sub.queue.put_nowait(point)
+
+    def _close(self, sub):
+        self.unsubscribe(sub)
+        sub.closed = True
+        # Wake the client's generator so it can end the response
+        while sub.queue.full():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
@@ -0,0 +1,146 @@
+# api/traces.py
+"""Trace queries: logs sharing a trace_id are the spans of one trace.
+
+Spans are sharded by agent like every other row, so a trace may live on
+several shards. Each shard answers with one range scan of
+agent_logs_trace_idx, and the caller merges the results. Traces are listed
+by their root spans (parent_span_id IS NULL), newest first, through
+agent_logs_trace_roots_idx. A trace whose root was never logged is still
+fetchable by id but doesn't show up in the list.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta, timezone
+
+from psycopg.rows import dict_row
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# (ts, id) bounds that put a whole shard before / after the cursor row at the same ts
+_MIN_ID = 0
+_MAX_ID = 2 ** 63 - 1
+
+SPAN_COLUMNS = "id, ts, agent_id, level, action, payload, span_id, parent_span_id, duration_ms"
+
+
+# --- Fetching ---
+
+def fetch_trace_spans(conn, trace_id, limit):
+    """A shard's spans of one trace in ts order (at most limit)."""
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            f"SELECT {SPAN_COLUMNS} FROM agent_logs WHERE trace_id = %s ORDER BY ts LIMIT %s",
+            (trace_id, limit),
+        )
+        return cur.fetchall()
+
+
+def fetch_trace_roots(conn, limit, before=None):
+    """A shard's newest root spans, strictly before the (ts, id) keyset bound."""
+    where, params = "trace_id IS NOT NULL AND parent_span_id IS NULL", []
+    if before is not None:
+        where += " AND (ts, id) < (%s, %s)"
+        params += list(before)
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            f"""
+            SELECT id, ts, trace_id, agent_id, level, action, span_id, duration_ms
+            FROM agent_logs
+            WHERE {where}
+            ORDER BY ts DESC, id DESC
+            LIMIT %s
+            """,
+            params + [limit],
+        )
+        return cur.fetchall()
+
+
+def count_spans(conn, trace_ids):
+    """{trace_id: spans on this shard} for a page of traces."""
+    with conn.cursor(row_factory=dict_row) as cur:
+        cur.execute(
+            "SELECT trace_id, count(*) AS n FROM agent_logs WHERE trace_id = ANY(%s) GROUP BY trace_id",
+            (list(trace_ids),),
+        )
+        return {row["trace_id"]: row["n"] for row in cur.fetchall()}
+
+
+def delete_traces(conn, trace_ids):
+    """Deletes every span of the given traces on one shard; returns the rows deleted. Caller commits."""
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM agent_logs WHERE trace_id = ANY(%s)", (list(trace_ids),))
+        return cur.rowcount
+
+
+# --- Cursors ---
+
+def encode_cursor(ts, shard, row_id):
+    delta = ts - _EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return base64.urlsafe_b64encode(f"{micros}:{shard}:{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """cursor -> (ts, shard, id); raises ValueError when it wasn't made by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        micros, shard, row_id = (int(part) for part in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor")
+    return _EPOCH + timedelta(microseconds=micros), shard, row_id
+
+
+def shard_bound(cursor, shard):
+    """The (ts, id) bound that continues the global (ts, shard, id) descending order on one shard."""
+    ts, cursor_shard, row_id = cursor
+    if shard < cursor_shard:
+        return ts, _MAX_ID   # Rows at the cursor's ts come after it
+    if shard > cursor_shard:
+        return ts, _MIN_ID   # Rows at the cursor's ts came before it
+    return ts, row_id
+
+
+# --- Assembly ---
+
+def build_span_tree(spans):
+    """Orders spans depth-first (children by ts) and sets each one's depth and children (span_ids).
+
+    Iterative, so a deep chain of spans can't hit the recursion limit. Spans whose
+    parent isn't in the trace (or that sit on a parent cycle) become roots.
+    """
+    by_span_id = {}
+    for i, span in enumerate(spans):
+        span["children"] = []
+        if span["span_id"] is not None:
+            by_span_id.setdefault(span["span_id"], i)
+
+    children = [[] for _ in spans]
+    roots = []
+    for i, span in enumerate(spans):
+        parent = by_span_id.get(span["parent_span_id"])
+        if parent is None or parent == i:
+            roots.append(i)
+        else:
+            children[parent].append(i)
+            if span["span_id"] is not None:
+                spans[parent]["children"].append(span["span_id"])
+
+    ordered = []
+    visited = [False] * len(spans)
+
+    def walk(root):
+        stack = [(root, 0)]
+        while stack:
+            i, depth = stack.pop()
+            if visited[i]:
+                continue
+            visited[i] = True
+            spans[i]["depth"] = depth
+            ordered.append(spans[i])
+            stack.extend((child, depth + 1) for child in reversed(children[i]))
+
+    for i in roots:
+        walk(i)
+    for i in range(len(spans)):
+        if not visited[i]:
+            walk(i)  # Only reachable through a parent cycle
+    return ordered
@@ -0,0 +1,135 @@
+# api/write_behind.py
+import queue
+import threading
+import time
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue drained by a background flusher thread.
+
+    Producers call put() and return immediately; the flusher hands groups of
+    items to flush_fn once flush_rows have accumulated or flush_interval
+    seconds have passed since the first item of the group arrived. A group whose
+    flush raises is retried up to max_retries times before it is dropped.
+    """
+
+    def __init__(self, flush_fn, max_size=10_000, flush_rows=500, flush_interval=0.05, max_retries=3):
+        self.flush_fn = flush_fn
+        self.max_size = max_size
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._retry = None  # (group, attempts) of the last failed flush
+
+        # Counters (read by stats())
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.retried_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+        self._thread.start()
+
+    def put(self, item) -> bool:
+        """Queues an item. Returns False (caller should answer 429) when the queue is full."""
+        if self._stopping.is_set():
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def stop(self, timeout=30.0):
+        """Stops accepting items and waits for the flusher to drain what is queued."""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._queue.qsize():
+            print(f"⚠️ Write-behind queue stopped with {self._queue.qsize()} unflushed logs")
+
+    def stats(self):
+        return {
+            "depth": self._queue.qsize(),
+            "capacity": self.max_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "retried_rows": self.retried_rows,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "avg_flush_ms": round(self._total_flush_ms / self.flushes, 3) if self.flushes else 0.0,
+            "max_flush_ms": round(self.max_flush_ms, 3),
+        }
+
+    def _run(self):
+        while True:
+            # 0. Retry the last failed group before taking new items
+            if self._retry:
+                group, attempts = self._retry
+                self._retry = None
+                time.sleep(self.flush_interval)
+                self._flush(group, attempts)
+                continue
+
+            # 1. Wait for the first item of the next group
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            # 2. Collect more until the group is full or its time window closes
+            group = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(group) < self.flush_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    group.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(group)
+
+    def _flush(self, group, attempts=0):
+        """flush_fn raises if nothing was written, or returns how many items of the group failed."""
+        start = time.perf_counter()
+        try:
+            failed = self.flush_fn(group) or 0
+        except Exception as e:
+            # Nothing was written, so the whole group can safely go round again
+            if attempts < self.max_retries:
+                print(f"⚠️ Write-behind flush failed ({len(group)} logs), retrying: {e}")
+                self.retried_rows += len(group)
+                self._retry = (group, attempts + 1)
+            else:
+                print(f"⚠️ Write-behind flush failed ({len(group)} logs), dropping them: {e}")
+                self.failed_rows += len(group)
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.failed_rows += failed
+        self.flushes += 1
+        self.flushed_rows += len(group) - failed
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
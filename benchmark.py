@@ -1,45 +1,103 @@
 # benchmark.py
+import argparse
+import itertools
 import time
 import multiprocessing
 # Adjust import based on your actual file structure
-from ingestion import IngestionEngine, generate_log_batch 
-from ingestion.config import TOTAL_LOGS_TO_PROCESS, BATCH_SIZE
-
-def run_benchmark():
-    engine = IngestionEngine()
-    engine.start()
-
-    # --- THE FIX: Pre-generate one batch and reuse it ---
-    print("⚡ Pre-generating data to bypass CPU bottleneck...")
-    # Generate one single batch of data
-    cached_batch = generate_log_batch(BATCH_SIZE) 
-    
-    # Calculate how many times we need to insert this batch
+from ingestion import IngestionEngine, AsyncIngestionEngine, LogBatch
+from ingestion.workload import WorkloadGenerator, to_json_lines
+from ingestion.config import (
+    TOTAL_LOGS_TO_PROCESS, BATCH_SIZE, TRANSPORT, COPY_FORMAT, BATCH_FORMAT, FLUSH_POLICY, SPOOL_DIR, ENGINE,
+)
+
+ENGINES = {"process": IngestionEngine, "async": AsyncIngestionEngine}
+
+def copy_bytes_per_row(batch, copy_format):
+    """Approximate COPY payload per row for one generated batch (what goes over the wire)."""
+    if not isinstance(batch, LogBatch):
+        batch = LogBatch.from_json(batch)
+    if copy_format == "binary":
+        return len(batch.encode_binary()) / len(batch)
+    total = sum(len("\t".join(r"\N" if v is None else v for v in row).encode()) + 1 for row in batch.copy_rows())
+    return total / len(batch)
+
+def run_benchmark(transport=TRANSPORT, copy_format=COPY_FORMAT, batch_format=BATCH_FORMAT, engine_kind=ENGINE,
+                  flush_policy=FLUSH_POLICY, report_every=None, spool_dir=SPOOL_DIR, seed=None):
+    engine = ENGINES[engine_kind](transport=transport, copy_format=copy_format, flush_policy=flush_policy,
+                                  spool_dir=spool_dir)
+    engine.start(report_every=report_every)
+
+    # Every batch is freshly generated (seeded for reproducible runs), so the engine and
+    # the database see unique rows rather than one batch replayed. Timestamps start now, so rows
+    # land in the live partitions like real traffic
+    workload = WorkloadGenerator(seed=seed, start_ts=time.time())
     batches_needed = TOTAL_LOGS_TO_PROCESS // BATCH_SIZE
-    
-    print(f"🚀 Starting Benchmark: Processing {TOTAL_LOGS_TO_PROCESS} logs...")
+
+    sample = workload.batch(100)
+    if batch_format == "json":
+        sample = to_json_lines(sample)
+    print(f"📦 COPY {copy_format}: ~{copy_bytes_per_row(sample, copy_format):,.0f} bytes/row")
+    print(f"🚀 Starting Benchmark: Processing {TOTAL_LOGS_TO_PROCESS} logs ({engine_kind} engine, {batch_format} batches, {transport} transport, {copy_format} COPY)...")
     start_time = time.time()
 
-    # Feed the engine with the SAME batch repeatedly
-    # This simulates "infinite" generation speed
+    generating = 0.0
     for _ in range(batches_needed):
-        engine.ingest_batch(cached_batch)
+        t = time.time()
+        batch = workload.batch(BATCH_SIZE)
+        if batch_format == "json":
+            batch = to_json_lines(batch)
+        generating += time.time() - t
+        engine.ingest_batch(batch)
 
     engine.stop()
     end_time = time.time()
-    
+
     duration = end_time - start_time
     throughput = TOTAL_LOGS_TO_PROCESS / duration
 
     print(f"\n✅ DONE in {duration:.4f} seconds")
+    print(f"🧪 Of which generating data in the producer: {generating:.4f} seconds")
     print(f"⚡ Throughput: {throughput:,.0f} events/sec")
+    engine.report()
 
     if throughput > 5000:
         print("🏆 RESULT: YC SCALE ACHIEVED!")
     else:
         print("⚠️ RESULT: Still hitting a bottleneck.")
+    return throughput
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion engine throughput benchmark.")
+    parser.add_argument("--transport", choices=["queue", "shm", "both"], default=TRANSPORT,
+                        help="'both' runs queue and shm back to back and compares them")
+    parser.add_argument("--copy-format", choices=["text", "binary", "both"], default=COPY_FORMAT)
+    parser.add_argument("--batch-format", choices=["json", "columnar", "both"], default=BATCH_FORMAT)
+    parser.add_argument("--engine", choices=["process", "async", "both"], default=ENGINE)
+    parser.add_argument("--flush-policy", choices=["fixed", "adaptive"], default=FLUSH_POLICY)
+    parser.add_argument("--spool-dir", default=SPOOL_DIR, help="Write-ahead spool directory ('' disables it)")
+    parser.add_argument("--report-every", type=float, default=None, help="Print live worker metrics every N seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Workload RNG seed (same seed, same rows)")
+    args = parser.parse_args()
+
+    transports = ["queue", "shm"] if args.transport == "both" else [args.transport]
+    formats = ["text", "binary"] if args.copy_format == "both" else [args.copy_format]
+    batch_formats = ["json", "columnar"] if args.batch_format == "both" else [args.batch_format]
+    engines = ["process", "async"] if args.engine == "both" else [args.engine]
+    configs = list(itertools.product(transports, formats, batch_formats, engines))
+    results = {
+        c: run_benchmark(*c, flush_policy=args.flush_policy, report_every=args.report_every, spool_dir=args.spool_dir,
+                         seed=args.seed)
+        for c in configs
+    }
+
+    if len(results) > 1:
+        print("\n📊 Head-to-head:")
+        baseline = results[configs[0]]
+        for (transport, copy_format, batch_format, engine_kind), throughput in results.items():
+            print(f"   {engine_kind:<8} {transport:<6} {copy_format:<7} {batch_format:<9} "
+                  f"{throughput:>12,.0f} events/sec  ({throughput / baseline:.2f}x)")
 
 if __name__ == "__main__":
     # Ensure this protects the entry point
     multiprocessing.freeze_support()
-    run_benchmark()
\ No newline at end of file
+    main()
@@ -0,0 +1,13 @@
+# benchmarks/__init__.py
+"""Reproducible benchmark suite (see benchmarks/runner.py for the CLI).
+
+    docker compose up -d db
+    python -m benchmarks --list
+    python -m benchmarks engine_ingest -p workers=2,4,8 -p batch_size=1000,5000
+    python -m benchmarks vector_search -p rows=10000,100000 -p index=none,hnsw,ivfflat -p dim=384
+    python -m benchmarks http_ingest stats_pollers -p pollers=8,64   # needs the API running
+    python -m benchmarks engine_ingest --out baseline.json
+    python -m benchmarks engine_ingest --baseline baseline.json     # exit 1 on regressions
+"""
+from .runner import main, run_one, compare
+from .scenarios import SCENARIOS
@@ -0,0 +1,274 @@
+# benchmarks/scenarios.py
+"""Benchmark scenarios.
+
+Each scenario is fn(ctx, **params) -> dict with:
+  ops        operations completed (rows, requests, texts, queries)
+  seconds    wall time the ops took
+  latencies  per-operation latencies in seconds (may be empty)
+  extra      optional scenario-specific numbers (recall, bytes/row, ...)
+ctx carries the targets: dsn, dsns (one per shard; dsn is the first) and api_url.
+"""
+import json
+import struct
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+# --- Ingestion engine ---
+
+def engine_ingest(ctx, engine="process", workers=4, batch_size=2000, batches=50, copy_format="binary",
+                  transport="queue", flush_policy="fixed", seed=42):
+    """Pushes distinct columnar batches through IngestionEngine; latency = producer-side ingest_batch() time."""
+    from ingestion import IngestionEngine, AsyncIngestionEngine
+    from ingestion.workload import WorkloadGenerator
+
+    engines = {"process": IngestionEngine, "async": AsyncIngestionEngine}
+    # Generated up front so the producer measures the engine, not the generator; ts start now like real traffic
+    pending = list(WorkloadGenerator(seed=seed, start_ts=time.time()).stream(batch_size * batches, batch_size))
+    eng = engines[engine](transport=transport, copy_format=copy_format, flush_policy=flush_policy,
+                          spool_dir="", num_workers=workers, dsns=ctx["dsns"])
+    eng.start()
+    latencies = []
+    start = time.perf_counter()
+    for batch in pending:
+        t = time.perf_counter()
+        eng.ingest_batch(batch)
+        latencies.append(time.perf_counter() - t)
+    eng.stop()
+    seconds = time.perf_counter() - start
+    metrics = eng.metrics()
+    return {
+        "ops": batch_size * batches,
+        "seconds": seconds,
+        "latencies": latencies,
+        "extra": {"flush_seconds_p95": metrics["flush_seconds_p95"], "flush_errors": metrics["flush_errors"]},
+    }
+
+
+# --- HTTP load ---
+
+def _request(url, body=None, headers=None):
+    data = None if body is None else json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json", **(headers or {})})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        resp.read()
+        return resp.status
+
+
+def _closed_loop(concurrency, requests, send):
+    """Runs send(i) `requests` times from `concurrency` threads; returns (seconds, latencies, errors)."""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        t = time.perf_counter()
+        try:
+            send(i)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - t
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def _log(i, agents=50):
+    return {
+        "agent_id": f"agent_{i % agents + 1}",
+        "level": "INFO" if i % 20 else "ERROR",
+        "action": f"bench_step_{i % 100}",
+        "payload": {"latency": 50 + (i * 37) % 400, "i": i},
+    }
+
+
+def http_ingest(ctx, concurrency=16, requests=2000):
+    """POST /ingest, one log per request."""
+    url = f"{ctx['api_url']}/ingest"
+    seconds, latencies, errors = _closed_loop(concurrency, requests, lambda i: _request(url, _log(i)))
+    return {"ops": len(latencies), "seconds": seconds, "latencies": latencies, "extra": {"errors": errors}}
+
+
+def http_batch_ingest(ctx, concurrency=4, requests=100, batch_size=500):
+    """POST /ingest/batch; ops are rows, latencies are per request."""
+    url = f"{ctx['api_url']}/ingest/batch"
+    send = lambda i: _request(url, [_log(i * batch_size + j) for j in range(batch_size)])
+    seconds, latencies, errors = _closed_loop(concurrency, requests, send)
+    return {"ops": len(latencies) * batch_size, "seconds": seconds, "latencies": latencies,
+            "extra": {"errors": errors}}
+
+
+def stats_pollers(ctx, pollers=32, duration=10.0):
+    """N dashboards polling GET /stats back to back for `duration` seconds."""
+    url = f"{ctx['api_url']}/stats"
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def poll():
+        nonlocal errors
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            t = time.perf_counter()
+            try:
+                _request(url)
+            except Exception:
+                failed += 1
+                continue
+            mine.append(time.perf_counter() - t)
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=poll) for _ in range(pollers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"ops": len(latencies), "seconds": time.perf_counter() - start, "latencies": latencies,
+            "extra": {"errors": errors}}
+
+
+# --- Embeddings ---
+
+def embedding_throughput(ctx, clients=16, requests=2000, max_batch=64, window_ms=5.0, workers=1, torch_threads=0,
+                         model="all-MiniLM-L6-v2"):
+    """Concurrent single-text encodes through the API's EmbeddingService (no cache, every text distinct)."""
+    from sentence_transformers import SentenceTransformer
+    from api.embedder import EmbeddingService
+
+    st = SentenceTransformer(model)
+    service = EmbeddingService(lambda texts: st.encode(texts, batch_size=max_batch), batch_window=window_ms / 1000,
+                               max_batch=max_batch, workers=workers, torch_threads=torch_threads or None)
+    service.start()
+    service.encode(["warm up"])
+    seconds, latencies, errors = _closed_loop(clients, requests, lambda i: service.encode([f"agent step {i} failed"]))
+    stats = service.stats()
+    service.stop()
+    return {
+        "ops": len(latencies),
+        "seconds": seconds,
+        "latencies": latencies,
+        "extra": {
+            "errors": errors,
+            "avg_batch_texts": stats["avg_batch_texts"],
+            "avg_queue_ms": stats["avg_queue_ms"],
+            "avg_inference_ms": stats["avg_inference_ms"],
+            "dim": st.get_sentence_embedding_dimension(),
+        },
+    }
+
+
+# --- Vector search ---
+
+BENCH_TABLE = "bench_vectors"
+
+
+def _load_vectors(conn, vectors):
+    from database.db import COPY_BINARY_HEADER, COPY_BINARY_TRAILER, copy_vector_field
+
+    tuple_header = struct.pack("!h", 1)
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY {BENCH_TABLE} (embedding) FROM STDIN (FORMAT BINARY)") as copy:
+            copy.write(COPY_BINARY_HEADER)
+            for start in range(0, len(vectors), 10_000):
+                copy.write(b"".join(tuple_header + copy_vector_field(v) for v in vectors[start:start + 10_000]))
+            copy.write(COPY_BINARY_TRAILER)
+    conn.commit()
+
+
+def vector_search(ctx, rows=100_000, dim=384, index="none", queries=200, k=10, ef_search=40, lists=0,
+                  recall_samples=20, seed=42):
+    """Top-k cosine search over a scratch table of `rows` random vectors, optionally behind an HNSW/IVFFlat index.
+
+    Recall is measured against exact search on the first recall_samples queries.
+    """
+    import psycopg
+    from database.vector_index import _index_sql, set_search_params
+
+    rng = np.random.default_rng(seed)
+    data = rng.standard_normal((rows, dim), dtype=np.float32)
+    probes = rng.standard_normal((queries, dim), dtype=np.float32)
+    lists = lists or max(1, int(rows ** 0.5))
+
+    with psycopg.connect(ctx["dsn"]) as conn:
+        with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+            cur.execute(f"CREATE TABLE {BENCH_TABLE} (id BIGSERIAL PRIMARY KEY, embedding vector({dim}) NOT NULL)")
+        conn.commit()
+        t = time.perf_counter()
+        _load_vectors(conn, data)
+        load_seconds = time.perf_counter() - t
+
+        build_seconds = 0.0
+        if index != "none":
+            t = time.perf_counter()
+            with conn.cursor() as cur:
+                cur.execute(_index_sql(f"{BENCH_TABLE}_ann_idx", index, "cosine", 16, 64, lists, False, table=BENCH_TABLE))
+            conn.commit()
+            build_seconds = time.perf_counter() - t
+        with conn.cursor() as cur:
+            cur.execute(f"ANALYZE {BENCH_TABLE}")
+        conn.commit()
+
+        sql = f"SELECT id FROM {BENCH_TABLE} ORDER BY embedding <=> %s::vector LIMIT %s"
+        latencies = []
+        found = []
+        with conn.cursor() as cur:
+            set_search_params(cur, ef_search=ef_search if index == "hnsw" else None,
+                              probes=max(1, lists // 10) if index == "ivfflat" else None)
+            start = time.perf_counter()
+            for q in probes:
+                t = time.perf_counter()
+                cur.execute(sql, (str(q.tolist()), k))
+                found.append({row[0] for row in cur.fetchall()})
+                latencies.append(time.perf_counter() - t)
+            seconds = time.perf_counter() - start
+
+            recall = None
+            if index != "none" and recall_samples:
+                # Same queries with index scans off = exact answers
+                cur.execute("SET LOCAL enable_indexscan = off")
+                hits = 0
+                for q, approx in zip(probes[:recall_samples], found):
+                    cur.execute(sql, (str(q.tolist()), k))
+                    hits += len(approx & {row[0] for row in cur.fetchall()})
+                recall = round(hits / (k * min(recall_samples, queries)), 4)
+        conn.rollback()
+
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+        conn.commit()
+
+    return {
+        "ops": queries,
+        "seconds": seconds,
+        "latencies": latencies,
+        "extra": {"recall": recall, "load_seconds": round(load_seconds, 3), "build_seconds": round(build_seconds, 3)},
+    }
+
+
+# name -> scenario; its keyword defaults are the parameters the CLI can override and sweep
+SCENARIOS = {
+    "engine_ingest": engine_ingest,
+    "http_ingest": http_ingest,
+    "http_batch_ingest": http_batch_ingest,
+    "embedding_throughput": embedding_throughput,
+    "stats_pollers": stats_pollers,
+    "vector_search": vector_search,
+}
@@ -0,0 +1,10 @@
+import { agentOpsFetch } from "@/lib/server-api";
+
+// POST /api/search -> POST {API}/search with the server-held key
+export async function POST(req: Request) {
+  return agentOpsFetch("/search", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: await req.text(),
+  });
+}
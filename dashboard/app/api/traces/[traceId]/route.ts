@@ -0,0 +1,7 @@
+import { agentOpsFetch } from "@/lib/server-api";
+
+// DELETE /api/traces/:traceId -> DELETE {API}/traces/:traceId with the server-held key
+export async function DELETE(_req: Request, { params }: { params: Promise<{ traceId: string }> }) {
+  const { traceId } = await params;
+  return agentOpsFetch(`/traces/${encodeURIComponent(traceId)}`, { method: "DELETE" });
+}
@@ -12,6 +12,7 @@ interface Trace {
   time: string;
   payload: any;
   id: number;
+  trace_id?: string | null;
 }
 
 export default function Home() {
@@ -98,15 +99,23 @@ export default function Home() {
               </div>
 
               {/* 👇 FIXED BUTTON LOGIC AND STYLING 👇 */}
+              {/* Deletes the whole trace; logs outside a trace have nothing to resolve */}
               <button 
+                disabled={!selectedTrace.trace_id}
+                title={selectedTrace.trace_id ? undefined : "This log isn't part of a trace"}
                 onClick={async () => {
-                  if(!confirm("Are you sure?")) return;
-                  const apiUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
-                  await fetch(`${apiUrl}/traces/${selectedTrace.id}`, { method: 'DELETE' });
+                  const traceId = selectedTrace.trace_id;
+                  if (!traceId || !confirm("Are you sure?")) return;
+                  // Our route handler holds the API key; the browser never sees it
+                  const res = await fetch(`/api/traces/${encodeURIComponent(traceId)}`, { method: 'DELETE' });
+                  if (!res.ok) {
+                    alert(`Couldn't resolve the trace (${res.status})`);
+                    return;
+                  }
                   setSelectedTrace(null); 
                   alert("Resolved! 🧹");
                 }}
-                className="mt-6 w-full bg-red-500/10 text-red-500 border border-red-500/50 py-3 rounded-lg flex justify-center hover:bg-red-500/20"
+                className="mt-6 w-full bg-red-500/10 text-red-500 border border-red-500/50 py-3 rounded-lg flex justify-center hover:bg-red-500/20 disabled:opacity-40 disabled:cursor-not-allowed disabled:hover:bg-red-500/10"
               >
                 🗑️ Resolve Incident
               </button>
@@ -14,8 +14,9 @@ const CONFIG = {
   SCROLL_SPEED: 0.1, // Pixels per millisecond (Higher = faster flow)
   
   // Data
+  STREAM_URL: 'https://agentops-e0zs.onrender.com/stats/stream', // Server-Sent Events (preferred)
   FETCH_URL: 'https://agentops-e0zs.onrender.com/stats',
-  FETCH_INTERVAL: 500, // Fallback if server doesn't dictate
+  FETCH_INTERVAL: 500, // Polling interval when EventSource is unavailable
   MAX_LATENCY_Y: 300,  // Latency value that maps to top of graph (scaling)
   KEEP_HISTORY_MS: 10000, // How many seconds of history to keep in memory
 };
@@ -43,26 +44,52 @@ export default function LatencyChart() {
   useEffect(() => {
     let isMounted = true;
 
+    const pushPoint = (newVal: number) => {
+      const now = Date.now();
+
+      // Add to our data buffer
+      dataRef.current.push({ val: newVal, time: now });
+      setCurrentLatency(newVal);
+
+      // Prune old data to keep memory usage stable
+      const cutoff = now - CONFIG.KEEP_HISTORY_MS;
+      if (dataRef.current[0] && dataRef.current[0].time < cutoff) {
+         // Removing from front is O(N), but array is small enough (<100 items)
+         // for this to be negligible compared to Canvas ops.
+        dataRef.current = dataRef.current.filter(p => p.time > cutoff);
+      }
+    };
+
+    // Preferred path: the API pushes each new point once to every open tab
+    if (typeof EventSource !== 'undefined') {
+      const source = new EventSource(CONFIG.STREAM_URL);
+      source.onmessage = (event) => {
+        try {
+          const point = JSON.parse(event.data);
+          if (isMounted && typeof point.latency === 'number') {
+            pushPoint(point.latency);
+          }
+        } catch (err) {
+          console.error("Bad stream event", err);
+        }
+      };
+      // EventSource reconnects on its own; just surface the error
+      source.onerror = (err) => console.error("Stream error", err);
+
+      return () => {
+        isMounted = false;
+        source.close();
+      };
+    }
+
+    // Fallback: polling
     const fetchData = async () => {
       try {
         const res = await fetch(CONFIG.FETCH_URL);
         const json = await res.json();
         
         if (isMounted && typeof json.latency === 'number') {
-          const now = Date.now();
-          const newVal = json.latency;
-          
-          // Add to our data buffer
-          dataRef.current.push({ val: newVal, time: now });
-          setCurrentLatency(newVal);
-
-          // Prune old data to keep memory usage stable
-          const cutoff = now - CONFIG.KEEP_HISTORY_MS;
-          if (dataRef.current[0] && dataRef.current[0].time < cutoff) {
-             // Removing from front is O(N), but array is small enough (<100 items)
-             // for this to be negligible compared to Canvas ops.
-            dataRef.current = dataRef.current.filter(p => p.time > cutoff);
-          }
+          pushPoint(json.latency);
         }
       } catch (err) {
         console.error("Fetch failed", err);
@@ -70,7 +97,7 @@ export default function LatencyChart() {
       
       if (isMounted) {
         // Use recursive timeout to adjust for network delay variation
-        setTimeout(fetchData, 200); 
+        setTimeout(fetchData, CONFIG.FETCH_INTERVAL); 
       }
     };
 
@@ -2,7 +2,6 @@
 
 import { useState } from "react";
 import { Search } from "lucide-react";
-import { API_URL } from "@/lib/config";
 
 // Define the shape of the data
 interface SearchResult {
@@ -10,6 +9,7 @@ interface SearchResult {
   latency: number;
   time: string;
   payload?: any; // <--- The secret data
+  trace_id?: string | null;
 }
 
 interface SearchBarProps {
@@ -25,7 +25,8 @@ export function SearchBar({ onSelect }: SearchBarProps) {
     if (!query) return;
 
     try {
-      const res = await fetch(`${API_URL}/search`, {
+      // Through our own route handler, which adds the API key server-side
+      const res = await fetch("/api/search", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ query }),
@@ -0,0 +1,16 @@
+// Server-only: calls to the AgentOps API that need the API key. Route handlers use this so the key
+// (AGENTOPS_API_KEY, no NEXT_PUBLIC_ prefix) never reaches the browser bundle. Import it from server code only.
+import { API_URL } from "@/lib/config";
+
+export async function agentOpsFetch(path: string, init: RequestInit = {}): Promise<Response> {
+  const res = await fetch(`${process.env.AGENTOPS_API_URL || API_URL}${path}`, {
+    ...init,
+    headers: { ...init.headers, "X-API-Key": process.env.AGENTOPS_API_KEY || "" },
+    cache: "no-store",
+  });
+  // Pass the API's status and body straight through to the browser
+  return new Response(await res.text(), {
+    status: res.status,
+    headers: { "Content-Type": res.headers.get("Content-Type") || "application/json" },
+  });
+}
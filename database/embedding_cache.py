@@ -0,0 +1,141 @@
+# database/embedding_cache.py
+"""Content-addressed LRU cache in front of SentenceTransformer.encode.
+
+Agents reuse a small vocabulary of action strings, so most encode calls are
+repeats. Vectors are keyed by a hash of (namespace, text), bounded by entry
+count and/or bytes, and optionally persisted to a SQLite file so a restarted
+process starts warm.
+"""
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries=10_000, max_bytes=None, path=None, namespace=""):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.path = path
+        self.namespace = namespace
+
+        self._entries = OrderedDict()  # key -> float32 vector, oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    def _key(self, text):
+        return hashlib.sha1(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def encode(self, texts, encode_fn):
+        """Returns one float32 vector per text, calling encode_fn once for all cache misses."""
+        keys = [self._key(t) for t in texts]
+        results = [None] * len(texts)
+
+        # 1. Memory tier
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                    self.hits += 1
+
+        # Unique misses -> every position that needs them
+        missing = OrderedDict()
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                missing.setdefault(key, (texts[i], []))[1].append(i)
+
+        # 2. Disk tier
+        if missing and self._db is not None:
+            for key, vector in self._load(list(missing)).items():
+                self._store(key, vector)
+                positions = missing.pop(key)[1]
+                for i in positions:
+                    results[i] = vector
+                with self._lock:
+                    self.disk_hits += len(positions)
+
+        # 3. Encode the remaining unique texts in a single batch
+        if missing:
+            encoded = np.asarray(encode_fn([text for text, _ in missing.values()]), dtype=np.float32)
+            fresh = {}
+            for (key, (_, positions)), vector in zip(missing.items(), encoded):
+                fresh[key] = vector
+                self._store(key, vector)
+                for i in positions:
+                    results[i] = vector
+                with self._lock:
+                    self.misses += len(positions)
+            self._persist(fresh)
+
+        return results
+
+    def _store(self, key, vector):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            # Evict least recently used until both bounds hold
+            while self._entries and (
+                (self.max_entries and len(self._entries) > self.max_entries)
+                or (self.max_bytes and self._bytes > self.max_bytes)
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def _load(self, keys):
+        found = {}
+        with self._lock:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, blob in self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ):
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _persist(self, vectors):
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in vectors.items()],
+            )
+            self._db.commit()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,319 @@
+# database/export.py
+"""Streaming export of agent_logs to Parquet or Arrow IPC files (pyarrow required).
+
+    python -m database.export --start 2026-10-01 --end 2026-10-08 --out exports/
+    python -m database.export --start 2026-10-17T12:00 --format arrow --agent-id agent_7
+
+The range is cut into slices on partition boundaries (AGENT_LOGS_PARTITION, else
+--slice-hours), and every (shard, slice) pair is exported in parallel to its own
+file. Rows are streamed with a binary COPY (SELECT ...) TO STDOUT and written a
+row group at a time, so memory is about row_group_rows x workers however large
+the range is. The embedding column is a fixed-size list of float32; rows without
+an embedding are null there (all-NaN in Parquet written by a pyarrow too old to
+store null fixed-size lists). Rows within a file are not sorted.
+"""
+import argparse
+import functools
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import psycopg
+
+from database.db import EMBEDDING_DIM, get_embedding_dim, PARTITION_GRANULARITY, PARTITION_STEPS, partition_start
+from database.sharding import SHARD_DSNS
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+MEDIA_TYPES = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.stream"}
+ROW_GROUP_ROWS = int(os.getenv("EXPORT_ROW_GROUP_ROWS", "65536"))
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "4"))
+PARQUET_COMPRESSION = os.getenv("EXPORT_PARQUET_COMPRESSION", "zstd")
+
+# ts as int8 microseconds and payload as text keep the binary rows trivial to decode;
+# embedding arrives in pgvector's binary form (int16 dim, int16 unused, big-endian float4s)
+EXPORT_SQL = """
+    COPY (
+        SELECT id, (EXTRACT(EPOCH FROM ts) * 1000000)::int8, agent_id, level, action, payload::text, embedding,
+               trace_id, span_id, parent_span_id, duration_ms
+        FROM agent_logs
+        WHERE ts >= %s AND ts < %s {agent_filter}
+    ) TO STDOUT (FORMAT BINARY)
+"""
+EXPORT_TYPES = ["int8", "int8", "text", "text", "text", "text", "bytea", "text", "text", "text", "float8"]
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Exporting agent_logs needs pyarrow (pip install pyarrow)") from e
+    return pa, pq
+
+
+def embedding_dim(conn):
+    """Width of agent_logs.embedding (EMBEDDING_DIM when the column is unconstrained)."""
+    return get_embedding_dim(conn) or EMBEDDING_DIM
+
+
+def export_schema(dim):
+    pa, _ = _pyarrow()
+    return pa.schema([
+        ("id", pa.int64()),
+        ("ts", pa.timestamp("us", tz="UTC")),
+        ("agent_id", pa.string()),
+        ("level", pa.string()),
+        ("action", pa.string()),
+        ("payload", pa.string()),  # JSON text
+        ("embedding", pa.list_(pa.float32(), dim)),
+        ("trace_id", pa.string()),
+        ("span_id", pa.string()),
+        ("parent_span_id", pa.string()),
+        ("duration_ms", pa.float64()),
+    ])
+
+
+# --- Reading ---
+
+def read_row_groups(conn, start, end, agent_id=None, row_group_rows=ROW_GROUP_ROWS):
+    """Yields lists of up to row_group_rows raw rows for [start, end), streamed off a binary COPY."""
+    sql = EXPORT_SQL.format(agent_filter="AND agent_id = %s" if agent_id else "")
+    params = (start, end, agent_id) if agent_id else (start, end)
+    with conn.cursor() as cur:
+        with cur.copy(sql, params) as copy:
+            copy.set_types(EXPORT_TYPES)
+            rows = []
+            for row in copy.rows():
+                rows.append(row)
+                if len(rows) >= row_group_rows:
+                    yield rows
+                    rows = []
+            if rows:
+                yield rows
+
+
+@functools.cache
+def parquet_writes_null_vectors():
+    """Older pyarrow can't write null entries of a fixed-size list column to Parquet; probed once."""
+    pa, pq = _pyarrow()
+    try:
+        pq.write_table(pa.table({"v": pa.array([[0.0], None, [0.0]], type=pa.list_(pa.float32(), 1))}), io.BytesIO())
+    except pa.ArrowNotImplementedError:
+        return False
+    return True
+
+
+def rows_to_table(rows, schema, nan_for_null=False):
+    """Raw COPY rows -> Table; missing embeddings are null, or all-NaN vectors when nan_for_null."""
+    pa, _ = _pyarrow()
+    dim = schema.field("embedding").type.list_size
+    ids, ts, agents, levels, actions, payloads, vectors, trace_ids, span_ids, parent_span_ids, duration = zip(*rows)
+    present = np.fromiter((v is not None for v in vectors), dtype=bool, count=len(rows))
+    flat = np.zeros((len(rows), dim), dtype=np.float32)
+    if present.any():
+        # One conversion for the whole group: skip each vector's 4-byte header, then big-endian -> native
+        raw = b"".join(v[4:] for v in vectors if v is not None)
+        flat[present] = np.frombuffer(raw, dtype=">f4").reshape(-1, dim)
+    mask = pa.array(~present)
+    if nan_for_null:
+        flat[~present] = np.nan
+        mask = None
+    embedding = pa.FixedSizeListArray.from_arrays(pa.array(flat.reshape(-1)), dim, mask=mask)
+    return pa.Table.from_arrays([
+        pa.array(np.array(ids, dtype=np.int64)),
+        pa.array(np.array(ts, dtype=np.int64), type=pa.timestamp("us", tz="UTC")),
+        pa.array(agents, type=pa.string()),
+        pa.array(levels, type=pa.string()),
+        pa.array(actions, type=pa.string()),
+        pa.array(payloads, type=pa.string()),
+        embedding,
+        pa.array(trace_ids, type=pa.string()),
+        pa.array(span_ids, type=pa.string()),
+        pa.array(parent_span_ids, type=pa.string()),
+        pa.array(duration, type=pa.float64()),
+    ], schema=schema)
+
+
+# --- Writing ---
+
+class TableWriter:
+    """One output (path or file-like) in Parquet (one row group per write) or Arrow IPC.
+
+    Arrow goes out in the IPC file format, or the stream format (no footer) when stream is set.
+    """
+
+    def __init__(self, sink, schema, fmt="parquet", compression=PARQUET_COMPRESSION, stream=False):
+        pa, pq = _pyarrow()
+        self.schema = schema
+        self.fmt = fmt
+        self.nan_for_null = fmt == "parquet" and not parquet_writes_null_vectors()
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(sink, schema, compression=compression)
+        elif fmt == "arrow":
+            self._writer = (pa.ipc.new_stream if stream else pa.ipc.new_file)(sink, schema)
+        else:
+            raise ValueError(f"Unknown export format: {fmt!r} (expected one of {list(FORMATS)})")
+
+    def write_rows(self, rows):
+        table = rows_to_table(rows, self.schema, self.nan_for_null)
+        if self.fmt == "parquet":
+            self._writer.write_table(table, row_group_size=len(table))
+        else:
+            self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+def export_slice(dsn, start, end, path, fmt="parquet", agent_id=None, row_group_rows=ROW_GROUP_ROWS):
+    """Exports one shard's [start, end) to path; returns rows written (no file is left when there are none)."""
+    tmp = path + ".tmp"  # Renamed into place once complete, so a partial file never looks finished
+    rows = 0
+    with psycopg.connect(dsn) as conn:
+        schema = export_schema(embedding_dim(conn))
+        writer = TableWriter(tmp, schema, fmt)
+        try:
+            for group in read_row_groups(conn, start, end, agent_id, row_group_rows):
+                writer.write_rows(group)
+                rows += len(group)
+            writer.close()
+        except BaseException:
+            writer.close()
+            os.remove(tmp)
+            raise
+    if rows:
+        os.replace(tmp, path)
+    else:
+        os.remove(tmp)
+    return rows
+
+
+def time_slices(start, end, granularity=PARTITION_GRANULARITY, slice_hours=24):
+    """[start, end) cut on partition boundaries (or every slice_hours when unpartitioned)."""
+    step = PARTITION_STEPS[granularity] if granularity else timedelta(hours=slice_hours)
+    edge = partition_start(start, granularity) if granularity else start
+    slices = []
+    while edge < end:
+        upper = edge + step
+        slices.append((max(start, edge), min(end, upper)))
+        edge = upper
+    return slices
+
+
+def export_range(start, end, out_dir, fmt="parquet", agent_id=None, dsns=None, workers=EXPORT_WORKERS,
+                 row_group_rows=ROW_GROUP_ROWS, granularity=PARTITION_GRANULARITY, slice_hours=24):
+    """Exports every shard's rows in [start, end) to out_dir, one file per (shard, slice), in parallel."""
+    dsns = dsns or SHARD_DSNS
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = []
+    for shard, dsn in enumerate(dsns):
+        for lo, hi in time_slices(start, end, granularity, slice_hours):
+            shard_part = f"_s{shard}" if len(dsns) > 1 else ""
+            name = f"agent_logs{shard_part}_{lo:%Y%m%dT%H%M%S}_{hi:%Y%m%dT%H%M%S}{FORMATS[fmt]}"
+            tasks.append((dsn, lo, hi, os.path.join(out_dir, name)))
+
+    def run(task):
+        dsn, lo, hi, path = task
+        started = time.time()
+        rows = export_slice(dsn, lo, hi, path, fmt, agent_id, row_group_rows)
+        if rows:
+            print(f"📦 {path}: {rows:,} rows, {os.path.getsize(path) / 1024 / 1024:,.1f} MB "
+                  f"in {time.time() - started:.1f}s")
+        return path, rows
+
+    with ThreadPoolExecutor(max(1, workers)) as pool:
+        return [(path, rows) for path, rows in pool.map(run, tasks) if rows]
+
+
+# --- HTTP streaming ---
+
+class _ChunkSink:
+    """Write-only file object that buffers what the writer emits until the response takes it."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+    def tell(self):
+        return self.position
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def stream_export(connections, start, end, fmt="parquet", agent_id=None, row_group_rows=ROW_GROUP_ROWS):
+    """Yields the bytes of one Parquet / Arrow stream over every shard, a row group at a time.
+
+    connections: context managers yielding a connection per shard (e.g. the API's read routers).
+    """
+    pa, _ = _pyarrow()
+    sink = _ChunkSink()
+    writer = None
+    for connection in connections:
+        with connection as conn:
+            if writer is None:
+                writer = TableWriter(pa.PythonFile(sink, mode="w"), export_schema(embedding_dim(conn)), fmt,
+                                     stream=True)
+            for group in read_row_groups(conn, start, end, agent_id, row_group_rows):
+                writer.write_rows(group)
+                yield sink.take()
+    if writer is not None:
+        writer.close()
+        yield sink.take()
+
+
+# --- CLI ---
+
+def _parse_time(value):
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export agent_logs by time range to Parquet / Arrow files.")
+    parser.add_argument("--start", type=_parse_time, required=True, help="ISO time, UTC unless it has an offset")
+    parser.add_argument("--end", type=_parse_time, default=None, help="Exclusive; default now")
+    parser.add_argument("--out", default="exports")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet")
+    parser.add_argument("--agent-id", default=None)
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS, help="(shard, slice) files exported at once")
+    parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS)
+    parser.add_argument("--slice-hours", type=float, default=24, help="Slice width when agent_logs is unpartitioned")
+    args = parser.parse_args()
+
+    end = args.end or datetime.now(timezone.utc)
+    started = time.time()
+    files = export_range(args.start, end, args.out, args.format, args.agent_id, workers=args.workers,
+                         row_group_rows=args.row_group_rows, slice_hours=args.slice_hours)
+    rows = sum(r for _, r in files)
+    duration = time.time() - started
+    print(f"✅ Exported {rows:,} rows to {len(files)} file(s) in {duration:.1f}s "
+          f"({rows / duration if duration else 0:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
-from db import get_db_connection
+from db import get_db_connection, EMBEDDING_DIM
+
+# ⚠️ This drops every stored vector. To keep existing data, use the online
+# migration instead: python -m database.migrate_embedding_dim
 
 def fix_column():
     conn = get_db_connection()
@@ -7,14 +10,14 @@ def fix_column():
 
     try:
         with conn.cursor() as cur:
-            print("🔧 Dropping the wrong column (1536)...")
+            print("🔧 Dropping the wrong column...")
             cur.execute("ALTER TABLE agent_logs DROP COLUMN IF EXISTS embedding;")
             
-            print("✨ Creating the correct column (384)...")
-            cur.execute("ALTER TABLE agent_logs ADD COLUMN embedding vector(384);")
+            print(f"✨ Creating the correct column ({EMBEDDING_DIM})...")
+            cur.execute(f"ALTER TABLE agent_logs ADD COLUMN embedding vector({EMBEDDING_DIM});")
             
             conn.commit()
-            print("✅ Database dimensions fixed to 384!")
+            print(f"✅ Database dimensions fixed to {EMBEDDING_DIM}!")
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -0,0 +1,146 @@
+# database/migrate_embedding_dim.py
+"""Online migration of agent_logs.embedding to the model's native dimension.
+
+Older deployments stored 384-dim MiniLM vectors zero-padded to vector(1536).
+This rewrites them without a long table lock:
+
+  1. add a nullable embedding_new vector(N) column (catalog-only change)
+  2. install a trigger so rows written during the migration fill both columns
+  3. backfill existing rows in id-range chunks, one short transaction each,
+     then catch up any stragglers in small batches
+  4. swap the columns in one brief transaction (drop old, rename new)
+
+Stop writers that still send padded vectors before step 4; after it, deploy
+the API with the native dimension. Vector indexes on the old column are
+dropped with it and must be rebuilt.
+
+    python -m database.migrate_embedding_dim --dim 384 --chunk-size 20000
+"""
+import argparse
+import time
+
+import psycopg
+
+from database.db import DB_URI, EMBEDDING_DIM, get_embedding_dim
+
+TRIGGER_FN_SQL = """
+    CREATE OR REPLACE FUNCTION agent_logs_sync_embedding_new() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.embedding IS NULL THEN
+            NEW.embedding_new := NULL;
+        ELSE
+            NEW.embedding_new := ((NEW.embedding::real[])[1:{dim}])::vector({dim});
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS agent_logs_sync_embedding_new ON agent_logs;
+    CREATE TRIGGER agent_logs_sync_embedding_new
+        BEFORE INSERT OR UPDATE OF embedding ON agent_logs
+        FOR EACH ROW EXECUTE FUNCTION agent_logs_sync_embedding_new();
+"""
+
+BACKFILL_SQL = """
+    UPDATE agent_logs
+    SET embedding_new = ((embedding::real[])[1:{dim}])::vector({dim})
+    WHERE id >= %s AND id < %s
+      AND embedding IS NOT NULL
+      AND embedding_new IS NULL
+"""
+
+# Rows the backfill may have missed (e.g. written while the trigger was being installed)
+CATCH_UP_SQL = """
+    UPDATE agent_logs
+    SET embedding_new = ((embedding::real[])[1:{dim}])::vector({dim})
+    WHERE id IN (
+        SELECT id FROM agent_logs
+        WHERE embedding IS NOT NULL AND embedding_new IS NULL
+        LIMIT %s
+    )
+"""
+
+SWAP_SQL = """
+    DROP TRIGGER IF EXISTS agent_logs_sync_embedding_new ON agent_logs;
+    DROP FUNCTION IF EXISTS agent_logs_sync_embedding_new();
+    ALTER TABLE agent_logs DROP COLUMN embedding;
+    ALTER TABLE agent_logs RENAME COLUMN embedding_new TO embedding;
+    CREATE INDEX IF NOT EXISTS agent_logs_unembedded_idx ON agent_logs (id) WHERE embedding IS NULL;
+"""
+
+
+def migrate(dim=EMBEDDING_DIM, chunk_size=20_000, pause=0.0, dsn=DB_URI, lock_timeout="5s"):
+    with psycopg.connect(dsn) as conn:
+        current = get_embedding_dim(conn)
+        if current is None:
+            print("❌ agent_logs.embedding not found. Nothing to migrate.")
+            return
+        if current == dim:
+            print(f"✅ agent_logs.embedding is already vector({dim}).")
+            return
+        if current < dim:
+            # Can't invent information: growing the column means re-embedding with a new model
+            print(f"❌ Cannot widen vector({current}) to vector({dim}) in place; re-embed instead.")
+            return
+
+        with conn.cursor() as cur:
+            # 1 + 2. New column and sync trigger (brief catalog locks only)
+            print(f"🔧 Adding embedding_new vector({dim}) + sync trigger...")
+            cur.execute(f"SET lock_timeout = '{lock_timeout}'")
+            cur.execute(f"ALTER TABLE agent_logs ADD COLUMN IF NOT EXISTS embedding_new vector({dim})")
+            cur.execute(TRIGGER_FN_SQL.format(dim=dim))
+            cur.execute(TRIGGER_SQL)
+            conn.commit()
+
+            # 3. Chunked backfill; each chunk commits so locks and WAL stay small
+            cur.execute("SELECT min(id), max(id) FROM agent_logs")
+            low, high = cur.fetchone()
+            if low is not None:
+                backfill = BACKFILL_SQL.format(dim=dim)
+                total = 0
+                start = time.time()
+                for chunk_start in range(low, high + 1, chunk_size):
+                    cur.execute(backfill, (chunk_start, chunk_start + chunk_size))
+                    conn.commit()
+                    total += cur.rowcount
+                    print(f"   -> ids < {chunk_start + chunk_size:,}: {total:,} rows rewritten "
+                          f"({total / max(time.time() - start, 1e-9):,.0f} rows/sec)", end="\r")
+                    if pause:
+                        time.sleep(pause)
+                print()
+
+            # Catch up anything the backfill didn't see, batch by batch and before any long lock;
+            # from here on the trigger keeps embedding_new filled
+            catch_up = CATCH_UP_SQL.format(dim=dim)
+            while True:
+                cur.execute(catch_up, (chunk_size,))
+                conn.commit()
+                if cur.rowcount:
+                    print(f"   -> caught up {cur.rowcount:,} rows")
+                if cur.rowcount < chunk_size:
+                    break
+
+            # 4. Swap: the only step under the table lock is the catalog change
+            print("🔁 Swapping columns...")
+            cur.execute(f"SET lock_timeout = '{lock_timeout}'")
+            cur.execute(SWAP_SQL)
+            conn.commit()
+
+    print(f"✅ agent_logs.embedding migrated from vector({current}) to vector({dim}).")
+    print("   Rebuild vector indexes on the new column before serving search traffic.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite padded embeddings to the model's native dimension.")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Target dimension")
+    parser.add_argument("--chunk-size", type=int, default=20_000, help="Rows per backfill transaction (by id)")
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between chunks")
+    parser.add_argument("--dsn", default=DB_URI)
+    args = parser.parse_args()
+    migrate(args.dim, args.chunk_size, args.pause, args.dsn)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# database/partitions.py
+"""Partition maintenance for a range-partitioned agent_logs (AGENT_LOGS_PARTITION=day|hour).
+
+Keeps future partitions created ahead of the clock and enforces retention by
+dropping whole expired partitions, which is a catalog operation instead of a
+DELETE + VACUUM over millions of rows. Rows that fell outside every partition
+live in agent_logs_default, which can't be dropped; its expired rows are
+deleted instead (it is meant to stay small, so that DELETE stays cheap).
+
+    python -m database.partitions list
+    python -m database.partitions maintain --granularity day --ahead 7 --retention-hours 720
+"""
+import argparse
+import os
+import threading
+from datetime import datetime, timezone
+
+import psycopg
+from psycopg.rows import tuple_row
+
+from database.db import (
+    DB_URI, PARTITION_GRANULARITY, PARTITIONS_AHEAD, PARTITION_NAME_FORMATS, PARTITION_STEPS,
+    detect_partition_granularity, ensure_partitions,
+)
+
+# 0 = keep everything
+RETENTION_HOURS = int(os.getenv("AGENT_LOGS_RETENTION_HOURS", "0"))
+
+
+def list_partitions(conn, granularity=PARTITION_GRANULARITY):
+    """Returns [(name, start, size_bytes)] for the time partitions, oldest first (default partition excluded)."""
+    with conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute("""
+            SELECT c.relname, pg_total_relation_size(c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'agent_logs'::regclass
+        """)
+        rows = cur.fetchall()
+
+    partitions = []
+    for name, size in rows:
+        try:
+            start = datetime.strptime(name[len("agent_logs_p"):], PARTITION_NAME_FORMATS[granularity])
+        except ValueError:
+            continue  # agent_logs_default or a partition of another granularity
+        partitions.append((name, start.replace(tzinfo=timezone.utc), size))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def drop_expired_partitions(conn, granularity=PARTITION_GRANULARITY, retention_hours=RETENTION_HOURS):
+    """Drops partitions whose whole range is older than the retention window."""
+    if not retention_hours:
+        return []
+    cutoff = datetime.now(timezone.utc).timestamp() - retention_hours * 3600
+    step = PARTITION_STEPS[granularity]
+    dropped = []
+    with conn.cursor() as cur:
+        for name, start, _ in list_partitions(conn, granularity):
+            if (start + step).timestamp() <= cutoff:
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+                conn.commit()
+                dropped.append(name)
+    return dropped
+
+
+def prune_default_partition(conn, retention_hours=RETENTION_HOURS):
+    """Deletes default-partition rows older than the retention window. Returns how many went."""
+    if not retention_hours:
+        return 0
+    cutoff = datetime.fromtimestamp(datetime.now(timezone.utc).timestamp() - retention_hours * 3600, timezone.utc)
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('agent_logs_default') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return 0
+        cur.execute("DELETE FROM agent_logs_default WHERE ts < %s", (cutoff,))
+        deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def default_partition_size(conn):
+    """(rows, size_bytes) of agent_logs_default, or None when the table isn't partitioned."""
+    with conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute("SELECT to_regclass('agent_logs_default') IS NOT NULL")
+        if not cur.fetchone()[0]:
+            return None
+        cur.execute("SELECT count(*), pg_total_relation_size('agent_logs_default') FROM agent_logs_default")
+        return cur.fetchone()
+
+
+def maintain(conn, granularity=PARTITION_GRANULARITY, ahead=PARTITIONS_AHEAD, retention_hours=RETENTION_HOURS):
+    created = ensure_partitions(conn, granularity, ahead)
+    dropped = drop_expired_partitions(conn, granularity, retention_hours)
+    pruned = prune_default_partition(conn, retention_hours)
+    if created:
+        print(f"🗂️ Created partitions: {', '.join(created)}")
+    if dropped:
+        print(f"🗑️ Dropped expired partitions: {', '.join(dropped)}")
+    if pruned:
+        print(f"🗑️ Deleted {pruned:,} expired rows from agent_logs_default")
+    return created, dropped
+
+
+class PartitionMaintainer:
+    """Background thread that runs maintain() on an interval (started by the API)."""
+
+    def __init__(self, dsn=DB_URI, granularity=PARTITION_GRANULARITY, ahead=PARTITIONS_AHEAD,
+                 retention_hours=RETENTION_HOURS, interval=300.0):
+        self.dsn = dsn
+        self.granularity = granularity
+        self.ahead = ahead
+        self.retention_hours = retention_hours
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def run(self):
+        while not self._stopping.is_set():
+            try:
+                with psycopg.connect(self.dsn) as conn:
+                    # Existing partitions decide, as in init_db: mixed granularities would overlap
+                    granularity = detect_partition_granularity(conn) or self.granularity
+                    maintain(conn, granularity, self.ahead, self.retention_hours)
+            except Exception as e:
+                print(f"⚠️ Partition maintenance failed: {e}")
+            self._stopping.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="partition-maintainer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain agent_logs time partitions.")
+    parser.add_argument("--dsn", default=DB_URI)
+    parser.add_argument("--granularity", choices=list(PARTITION_STEPS), default=PARTITION_GRANULARITY or None,
+                        help="Default: AGENT_LOGS_PARTITION, else what the existing partitions use, else day")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    p = sub.add_parser("maintain")
+    p.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD)
+    p.add_argument("--retention-hours", type=int, default=RETENTION_HOURS)
+    args = parser.parse_args()
+
+    with psycopg.connect(args.dsn) as conn:
+        args.granularity = args.granularity or detect_partition_granularity(conn) or "day"
+        if args.command == "list":
+            for name, start, size in list_partitions(conn, args.granularity):
+                print(f"📦 {name}  from {start:%Y-%m-%d %H:%M}  {size / 1024 / 1024:,.1f} MB")
+            default = default_partition_size(conn)
+            if default:
+                rows, size = default
+                print(f"📦 agent_logs_default  (outside every range)  {rows:,} rows  {size / 1024 / 1024:,.1f} MB")
+        else:
+            maintain(conn, args.granularity, args.ahead, args.retention_hours)
+
+
+if __name__ == "__main__":
+    main()
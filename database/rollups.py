@@ -0,0 +1,218 @@
+# database/rollups.py
+"""Incremental latency rollups per (bucket, agent_id, action).
+
+Writers aggregate each flushed batch in memory and upsert one row per
+(resolution, bucket, agent, action), so readers (/stats, /stats/rollup)
+touch a few hundred small rows instead of raw logs. Percentiles come from a
+fixed-layout log-bucket histogram that merges by element-wise addition, both
+in Python and in SQL (sketch_merge).
+"""
+import math
+import os
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+from psycopg.rows import tuple_row
+
+# Stored resolutions (seconds) and how long each is kept
+RESOLUTIONS = (1, 60)
+RETENTION_SECS = {
+    1: int(os.getenv("ROLLUP_1S_RETENTION_SECS", "3600")),
+    60: int(os.getenv("ROLLUP_1M_RETENTION_SECS", str(7 * 86400))),
+}
+
+# Sketch layout: bucket i holds values in (GAMMA^(i-1), GAMMA^i] ms, bucket 0 holds <= 1 ms.
+# GAMMA = 1.105 keeps quantiles within ~5% relative error; 128 buckets reach ~5 minutes.
+SKETCH_GAMMA = 1.105
+SKETCH_BUCKETS = 128
+_LOG_GAMMA = math.log(SKETCH_GAMMA)
+
+UPSERT_SQL = """
+    INSERT INTO agent_log_rollups AS r
+        (bucket_secs, bucket, agent_id, action, count, latency_count, latency_sum, latency_min, latency_max, sketch)
+    VALUES (%s, to_timestamp(%s), %s, %s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (bucket_secs, bucket, agent_id, action) DO UPDATE SET
+        count = r.count + EXCLUDED.count,
+        latency_count = r.latency_count + EXCLUDED.latency_count,
+        latency_sum = r.latency_sum + EXCLUDED.latency_sum,
+        latency_min = LEAST(r.latency_min, EXCLUDED.latency_min),
+        latency_max = GREATEST(r.latency_max, EXCLUDED.latency_max),
+        sketch = sketch_merge(r.sketch, EXCLUDED.sketch)
+"""
+
+
+# --- Sketch ---
+
+def sketch_indices(values):
+    """Vectorized bucket index for an array of latencies (ms)."""
+    values = np.asarray(values, dtype=np.float64)
+    idx = np.ceil(np.log(np.maximum(values, 1.0)) / _LOG_GAMMA)
+    return np.clip(idx, 0, SKETCH_BUCKETS - 1).astype(np.int64)
+
+
+def sketch_quantile(counts, q):
+    """Approximate q-quantile from merged sketch counts (None when empty)."""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    if total == 0:
+        return None
+    i = int(np.searchsorted(np.cumsum(counts), q * total, side="left"))
+    if i == 0:
+        return 1.0
+    # Midpoint (in relative terms) of the bucket's (GAMMA^(i-1), GAMMA^i] range
+    return round(2 * SKETCH_GAMMA ** i / (SKETCH_GAMMA + 1), 3)
+
+
+def extract_latency(payload):
+    """Returns payload['latency'] as a float, or None if absent / not numeric."""
+    if isinstance(payload, dict):
+        latency = payload.get("latency")
+        if isinstance(latency, (int, float)) and not isinstance(latency, bool):
+            return float(latency)
+    return None
+
+
+# --- Write path ---
+
+def aggregate(entries):
+    """Folds (epoch_secs, agent_id, action, latency_or_None) entries into rollup rows, sorted by key."""
+    groups = {}
+    for ts, agent_id, action, latency in entries:
+        for res in RESOLUTIONS:
+            key = (res, int(ts // res) * res, agent_id, action)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = [0, []]
+            group[0] += 1
+            if latency is not None:
+                group[1].append(latency)
+
+    rows = []
+    # Sorted keys = consistent lock order across concurrent writers (no upsert deadlocks)
+    for key in sorted(groups):
+        count, latencies = groups[key]
+        sketch = np.zeros(SKETCH_BUCKETS, dtype=np.int64)
+        if latencies:
+            np.add.at(sketch, sketch_indices(latencies), 1)
+            stats = (len(latencies), float(sum(latencies)), min(latencies), max(latencies))
+        else:
+            stats = (0, 0.0, None, None)
+        rows.append(key + (count,) + stats + (sketch.tolist(),))
+    return rows
+
+
+def record_rollups(cur, entries):
+    """Upserts the rollups for one flushed batch. Run it in the same transaction as the COPY."""
+    rows = aggregate(entries)
+    if rows:
+        cur.executemany(UPSERT_SQL, rows)
+
+
+# --- Read path ---
+
+def rollup_source(bucket_secs):
+    """The coarsest stored resolution that divides bucket_secs (it only covers RETENTION_SECS of it)."""
+    return 60 if bucket_secs >= 60 and bucket_secs % 60 == 0 else 1
+
+
+def fetch_rollup_rows(conn, window_secs=300, bucket_secs=1, agent_id=None, action=None):
+    """Raw rollup rows for the window, read from rollup_source(bucket_secs)."""
+    source = rollup_source(bucket_secs)
+    clauses = ["bucket_secs = %s", "bucket >= now() - make_interval(secs => %s)"]
+    params = [source, window_secs]
+    if agent_id:
+        clauses.append("agent_id = %s")
+        params.append(agent_id)
+    if action:
+        clauses.append("action = %s")
+        params.append(action)
+
+    with conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute(f"""
+            SELECT extract(epoch FROM bucket), count, latency_count, latency_sum, latency_min, latency_max, sketch
+            FROM agent_log_rollups
+            WHERE {' AND '.join(clauses)}
+        """, params)
+        return cur.fetchall()
+
+
+def merge_rollup_rows(rows, bucket_secs=1):
+    """Folds raw rollup rows (from one or many shards) into bucket_secs buckets (oldest first)."""
+    merged = {}
+    for epoch, count, lat_count, lat_sum, lat_min, lat_max, sketch in rows:
+        start = int(epoch) // bucket_secs * bucket_secs
+        m = merged.get(start)
+        if m is None:
+            m = merged[start] = {"count": 0, "lat_count": 0, "sum": 0.0, "min": None, "max": None,
+                                 "sketch": np.zeros(SKETCH_BUCKETS, dtype=np.int64)}
+        m["count"] += count
+        m["lat_count"] += lat_count
+        m["sum"] += lat_sum
+        if lat_min is not None:
+            m["min"] = lat_min if m["min"] is None else min(m["min"], lat_min)
+            m["max"] = lat_max if m["max"] is None else max(m["max"], lat_max)
+        m["sketch"] += np.asarray(sketch, dtype=np.int64)
+
+    buckets = []
+    for start in sorted(merged):
+        m = merged[start]
+        buckets.append({
+            "bucket": datetime.fromtimestamp(start, tz=timezone.utc),
+            "count": m["count"],
+            "min": m["min"],
+            "max": m["max"],
+            "avg": round(m["sum"] / m["lat_count"], 3) if m["lat_count"] else None,
+            "p50": sketch_quantile(m["sketch"], 0.50),
+            "p95": sketch_quantile(m["sketch"], 0.95),
+            "p99": sketch_quantile(m["sketch"], 0.99),
+        })
+    return buckets
+
+
+def query_rollups(conn, window_secs=300, bucket_secs=1, agent_id=None, action=None):
+    """Aggregates over the last window_secs, grouped into bucket_secs buckets (oldest first)."""
+    return merge_rollup_rows(fetch_rollup_rows(conn, window_secs, bucket_secs, agent_id, action), bucket_secs)
+
+
+# --- Retention ---
+
+def prune_rollups(conn):
+    """Deletes rollup rows older than each resolution's retention."""
+    deleted = 0
+    with conn.cursor() as cur:
+        for res, keep in RETENTION_SECS.items():
+            cur.execute(
+                "DELETE FROM agent_log_rollups WHERE bucket_secs = %s AND bucket < now() - make_interval(secs => %s)",
+                (res, keep),
+            )
+            deleted += cur.rowcount
+    conn.commit()
+    return deleted
+
+
+class RollupPruner:
+    """Background thread that runs prune_rollups() on an interval (started by the API)."""
+
+    def __init__(self, pool, interval=60.0):
+        self.pool = pool
+        self.interval = interval
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                with self.pool.connection() as conn:
+                    prune_rollups(conn)
+            except Exception as e:
+                print(f"⚠️ Rollup pruning failed: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="rollup-pruner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
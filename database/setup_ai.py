@@ -1,4 +1,4 @@
-from db import get_db_connection
+from db import get_db_connection, EMBEDDING_DIM
 
 def setup_vector_db():
     conn = get_db_connection()
@@ -12,11 +12,11 @@ def setup_vector_db():
             cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
             
             # 2. Add the 'embedding' column to your logs table
-            # 384 is the specific size for the 'all-MiniLM-L6-v2' model
+            # EMBEDDING_DIM defaults to 384, the native size of 'all-MiniLM-L6-v2'
             print("🗄️ Adding embedding column...")
-            cur.execute("""
+            cur.execute(f"""
                 ALTER TABLE agent_logs 
-                ADD COLUMN IF NOT EXISTS embedding vector(384);
+                ADD COLUMN IF NOT EXISTS embedding vector({EMBEDDING_DIM});
             """)
             
             conn.commit()
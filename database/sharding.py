@@ -0,0 +1,107 @@
+# database/sharding.py
+"""Routes agent_logs rows to Postgres shards by agent_id (consistent hashing).
+
+Every shard holds the full schema; a row and its rollups live on the shard
+that owns its agent_id. Writers group rows per shard, readers either go to
+the one shard that owns a filtered agent or fan out to all of them and merge.
+
+Shards are identified by their position in SHARD_DSNS, so grow the cluster by
+appending DSNs: with virtual nodes only ~1/N of the agents move to the new
+shard (and need their rows copied over), the rest keep their placement.
+"""
+import bisect
+import hashlib
+import heapq
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from database.db import DB_URI
+
+# Comma-separated shard DSNs; unset = a single shard on DB_URI (the unsharded layout)
+SHARD_DSNS = [dsn.strip() for dsn in os.getenv("SHARD_DSNS", "").split(",") if dsn.strip()] or [DB_URI]
+# Points per shard on the ring; more = smoother key distribution
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring with `vnodes` points per node."""
+
+    def __init__(self, num_nodes, vnodes=SHARD_VNODES):
+        points = sorted((_hash(f"shard-{node}#{v}"), node) for node in range(num_nodes) for v in range(vnodes))
+        self.num_nodes = num_nodes
+        self._hashes = [h for h, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key):
+        """Owner of `key`: the first ring point clockwise from its hash."""
+        i = bisect.bisect_right(self._hashes, _hash(key))
+        return self._nodes[i % len(self._nodes)]
+
+
+class ShardRouter:
+    """Maps agent_ids to shard indexes and runs per-shard work in parallel.
+
+    map() calls share one thread pool of max_workers threads (default: one per
+    shard, enough for a single caller). A router shared by many concurrent
+    callers, like the API's, should size it to the connections those calls can
+    hold, or the pool caps how many shard queries run at once.
+    """
+
+    def __init__(self, dsns=None, vnodes=SHARD_VNODES, max_workers=None):
+        self.dsns = list(dsns or SHARD_DSNS)
+        self.ring = HashRing(len(self.dsns), vnodes)
+        self._owners = {}  # agent_id -> shard (agent ids are few and repeat constantly)
+        self._executor = None
+        if len(self.dsns) > 1:
+            self._executor = ThreadPoolExecutor(max_workers or len(self.dsns), thread_name_prefix="shard")
+
+    def __len__(self):
+        return len(self.dsns)
+
+    def shard_for(self, agent_id):
+        shard = self._owners.get(agent_id)
+        if shard is None:
+            shard = self._owners[agent_id] = self.ring.node_for(agent_id)
+        return shard
+
+    def dsn_for(self, agent_id):
+        return self.dsns[self.shard_for(agent_id)]
+
+    def group(self, items, key):
+        """{shard: [items]} using key(item) -> agent_id."""
+        groups = {}
+        for item in items:
+            groups.setdefault(self.shard_for(key(item)), []).append(item)
+        return groups
+
+    def split_batch(self, batch):
+        """(shard, sub-batch) pairs for a columnar LogBatch; agents are hashed once per vocab entry."""
+        if len(self.dsns) == 1:
+            return [(0, batch)] if len(batch) else []
+        owners = np.array([self.shard_for(agent) for agent in batch.agents], dtype=np.int32)
+        row_shards = owners[batch.agent_codes] if len(owners) else np.zeros(len(batch), dtype=np.int32)
+        return [(int(shard), batch[np.flatnonzero(row_shards == shard)]) for shard in np.unique(row_shards)]
+
+    def map(self, fn, shards=None):
+        """[fn(shard) for each shard], run concurrently when there is more than one."""
+        shards = range(len(self.dsns)) if shards is None else list(shards)
+        if self._executor is None or len(shards) == 1:
+            return [fn(shard) for shard in shards]
+        return list(self._executor.map(fn, shards))
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+
+# --- Merging fanned-out results ---
+
+def merge_top_k(result_sets, limit, key):
+    """Global top-`limit` (smallest key first) from per-shard top-`limit` lists."""
+    return heapq.nsmallest(limit, (row for rows in result_sets for row in rows), key=key)
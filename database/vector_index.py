@@ -0,0 +1,231 @@
+# database/vector_index.py
+"""Lifecycle tooling for the ANN index on agent_logs.embedding (pgvector HNSW / IVFFlat).
+
+    python -m database.vector_index create --method hnsw --m 16 --ef-construction 64
+    python -m database.vector_index rebuild --method ivfflat --lists 1000
+    python -m database.vector_index list
+    python -m database.vector_index recall --k 10 --samples 100 --ef-search 40
+    python -m database.vector_index drop
+
+Builds and drops run CONCURRENTLY by default so ingestion keeps writing.
+"""
+import argparse
+import statistics
+import time
+
+import psycopg
+
+from database.db import DB_URI, is_partitioned
+
+# metric -> (operator class, distance operator)
+METRICS = {
+    "cosine": ("vector_cosine_ops", "<=>"),
+    "l2": ("vector_l2_ops", "<->"),
+    "ip": ("vector_ip_ops", "<#>"),
+}
+
+DEFAULT_INDEX_NAME = "agent_logs_embedding_ann_idx"
+
+
+def _index_sql(name, method, metric, m, ef_construction, lists, concurrently, table="agent_logs"):
+    opclass, _ = METRICS[metric]
+    if method == "hnsw":
+        params = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+    elif method == "ivfflat":
+        params = f"lists = {int(lists)}"
+    else:
+        raise ValueError(f"Unknown index method: {method}")
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} USING {method} (embedding {opclass}) WITH ({params})"
+    )
+
+
+def create_index(conn, method="hnsw", metric="cosine", m=16, ef_construction=64, lists=100,
+                 concurrently=True, name=DEFAULT_INDEX_NAME, maintenance_work_mem=None):
+    """Builds the ANN index. IVFFlat should be built after the table has data (it trains on it)."""
+    conn.autocommit = True  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with conn.cursor() as cur:
+        if maintenance_work_mem:
+            # HNSW builds are much faster when the graph fits in maintenance_work_mem
+            cur.execute(f"SET maintenance_work_mem = '{maintenance_work_mem}'")
+        start = time.time()
+        if concurrently and is_partitioned(conn):
+            _create_partitioned_index(cur, name, method, metric, m, ef_construction, lists)
+        else:
+            cur.execute(_index_sql(name, method, metric, m, ef_construction, lists, concurrently))
+    print(f"✅ Built {method} index {name} in {time.time() - start:.1f}s")
+
+
+def _create_partitioned_index(cur, name, method, metric, m, ef_construction, lists):
+    """CONCURRENTLY isn't allowed on a partitioned table: create the parent index ON ONLY
+    (invalid until complete), build each partition's index concurrently and attach it.
+    Partitions created later inherit the parent index automatically."""
+    cur.execute(_index_sql(name, method, metric, m, ef_construction, lists, False, table="ONLY agent_logs"))
+    cur.execute("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'agent_logs'::regclass")
+    partitions = [r[0] for r in cur.fetchall()]
+    suffix = int(time.time())  # unique per build, so a rebuild never collides with live child indexes
+    for partition in partitions:
+        child = f"{partition[:40]}_ann_{suffix}"
+        cur.execute(_index_sql(child, method, metric, m, ef_construction, lists, True, table=partition))
+        cur.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def drop_index(conn, name=DEFAULT_INDEX_NAME, concurrently=True):
+    conn.autocommit = True
+    # Partitioned indexes can only be dropped with a (brief) lock on the parent
+    concurrently = concurrently and not is_partitioned(conn)
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {name}")
+    print(f"🗑️ Dropped index {name}")
+
+
+def rebuild_index(conn, name=DEFAULT_INDEX_NAME, **params):
+    """Builds a replacement next to the live index, then swaps it in. Search never loses its index."""
+    temp_name, old_name = f"{name}_rebuild", f"{name}_old"
+    for leftover in (temp_name, old_name):  # from an interrupted rebuild (a _rebuild one is INVALID)
+        drop_index(conn, leftover)
+    create_index(conn, name=temp_name, **params)
+    # Both renames in one short transaction: there's always an index called name
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("SET LOCAL lock_timeout = '10s'")
+        cur.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {old_name}")
+        cur.execute(f"ALTER INDEX {temp_name} RENAME TO {name}")
+    drop_index(conn, old_name)
+    print(f"🔁 Rebuilt {name}")
+
+
+def list_indexes(conn):
+    """Returns the vector indexes on agent_logs with their on-disk size."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT i.relname, am.amname, pg_relation_size(i.oid), x.indisvalid, pg_get_indexdef(i.oid)
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_am am ON am.oid = i.relam
+            WHERE x.indrelid = 'agent_logs'::regclass AND am.amname IN ('hnsw', 'ivfflat')
+            ORDER BY i.relname
+        """)
+        return [
+            {"name": r[0], "method": r[1], "size_bytes": r[2], "valid": r[3], "definition": r[4]}
+            for r in cur.fetchall()
+        ]
+
+
+def set_search_params(cur, ef_search=None, probes=None):
+    """Per-transaction ANN knobs: higher ef_search/probes = better recall, slower queries."""
+    if ef_search:
+        cur.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+    if probes:
+        cur.execute(f"SET LOCAL ivfflat.probes = {int(probes)}")
+
+
+def measure_recall(conn, k=10, samples=50, metric="cosine", ef_search=None, probes=None):
+    """Compares ANN top-k against an exact scan for vectors sampled from the table."""
+    _, op = METRICS[metric]
+    query = f"SELECT id FROM agent_logs ORDER BY embedding {op} %s::vector LIMIT %s"
+
+    conn.autocommit = False
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT embedding::text FROM agent_logs TABLESAMPLE SYSTEM (1) WHERE embedding IS NOT NULL LIMIT %s",
+            (samples,),
+        )
+        probes_vectors = [r[0] for r in cur.fetchall()]
+        if len(probes_vectors) < samples:
+            # Small tables: a 1% block sample can come back nearly empty
+            cur.execute(
+                "SELECT embedding::text FROM agent_logs WHERE embedding IS NOT NULL ORDER BY random() LIMIT %s",
+                (samples,),
+            )
+            probes_vectors = [r[0] for r in cur.fetchall()]
+        conn.commit()
+
+        recalls, ann_ms, exact_ms = [], [], []
+        for vector in probes_vectors:
+            # Approximate: whatever plan the index gives us
+            set_search_params(cur, ef_search, probes)
+            start = time.perf_counter()
+            cur.execute(query, (vector, k))
+            approx = {r[0] for r in cur.fetchall()}
+            ann_ms.append((time.perf_counter() - start) * 1000)
+            conn.commit()
+
+            # Exact: forbid index scans so the planner sorts every row by distance
+            cur.execute("SET LOCAL enable_indexscan = off")
+            cur.execute("SET LOCAL enable_bitmapscan = off")
+            start = time.perf_counter()
+            cur.execute(query, (vector, k))
+            exact = {r[0] for r in cur.fetchall()}
+            exact_ms.append((time.perf_counter() - start) * 1000)
+            conn.commit()
+
+            if exact:
+                recalls.append(len(approx & exact) / len(exact))
+
+    if not recalls:
+        return {"samples": 0}
+    return {
+        "samples": len(recalls),
+        "k": k,
+        "recall": round(statistics.mean(recalls), 4),
+        "ann_p50_ms": round(statistics.median(ann_ms), 3),
+        "ann_max_ms": round(max(ann_ms), 3),
+        "exact_p50_ms": round(statistics.median(exact_ms), 3),
+        "exact_max_ms": round(max(exact_ms), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the ANN index on agent_logs.embedding.")
+    parser.add_argument("--dsn", default=DB_URI)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for cmd in ("create", "rebuild"):
+        p = sub.add_parser(cmd)
+        p.add_argument("--method", choices=["hnsw", "ivfflat"], default="hnsw")
+        p.add_argument("--metric", choices=list(METRICS), default="cosine")
+        p.add_argument("--m", type=int, default=16, help="HNSW max connections per layer")
+        p.add_argument("--ef-construction", type=int, default=64, help="HNSW build candidate list size")
+        p.add_argument("--lists", type=int, default=100, help="IVFFlat list count (~rows/1000)")
+        p.add_argument("--maintenance-work-mem", default=None, help="e.g. 2GB")
+        p.add_argument("--blocking", action="store_true", help="Build without CONCURRENTLY (faster, locks writes)")
+        p.add_argument("--name", default=DEFAULT_INDEX_NAME)
+
+    p = sub.add_parser("drop")
+    p.add_argument("--name", default=DEFAULT_INDEX_NAME)
+
+    sub.add_parser("list")
+
+    p = sub.add_parser("recall")
+    p.add_argument("--k", type=int, default=10)
+    p.add_argument("--samples", type=int, default=50)
+    p.add_argument("--metric", choices=list(METRICS), default="cosine")
+    p.add_argument("--ef-search", type=int, default=None)
+    p.add_argument("--probes", type=int, default=None)
+
+    args = parser.parse_args()
+
+    with psycopg.connect(args.dsn) as conn:
+        if args.command in ("create", "rebuild"):
+            params = dict(
+                method=args.method, metric=args.metric, m=args.m, ef_construction=args.ef_construction,
+                lists=args.lists, concurrently=not args.blocking, maintenance_work_mem=args.maintenance_work_mem,
+            )
+            if args.command == "create":
+                create_index(conn, name=args.name, **params)
+            else:
+                rebuild_index(conn, name=args.name, **params)
+        elif args.command == "drop":
+            drop_index(conn, args.name)
+        elif args.command == "list":
+            for idx in list_indexes(conn):
+                status = "" if idx["valid"] else " (INVALID)"
+                print(f"📇 {idx['name']}{status}: {idx['size_bytes'] / 1024 / 1024:,.1f} MB")
+                print(f"   {idx['definition']}")
+        elif args.command == "recall":
+            print(measure_recall(conn, args.k, args.samples, args.metric, args.ef_search, args.probes))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,17 @@
 from sentence_transformers import SentenceTransformer
 from db import get_db_connection
+from embedding_cache import EmbeddingCache
 import json
+import os
 
 # 1. Load the Free Local AI Model
 print("📥 Loading AI Model (this happens once)...")
 model = SentenceTransformer('all-MiniLM-L6-v2')
 
+# Same cache (and on-disk tier, if EMBED_CACHE_PATH is set) as the API
+cache = EmbeddingCache(path=os.getenv("EMBED_CACHE_PATH") or None, namespace='all-MiniLM-L6-v2')
+VECTORIZE_BATCH = int(os.getenv("VECTORIZE_BATCH", "256"))
+
 def vectorize_missing():
     conn = get_db_connection()
     if not conn:
@@ -19,30 +25,35 @@ def vectorize_missing():
             
             print(f"🧠 Found {len(rows)} logs to process...")
 
-            for row in rows:
-                log_id = row[0]
-                # Construct the "sentence" describing the event
+            # Encode a chunk at a time so the cache (and the model) see one batch per chunk
+            for start in range(0, len(rows), VECTORIZE_BATCH):
+                chunk = rows[start:start + VECTORIZE_BATCH]
+                # Construct the "sentence" describing each event
                 # We combine Agent Name + Action + Status + Latency
-                payload_str = str(row[4])
-                description = f"Agent {row[1]} did {row[2]} with status {row[3]}. Details: {payload_str}"
-                
-                # 3. Generate the Vector (The Magic)
-                embedding = model.encode(description)
-                
+                descriptions = [
+                    f"Agent {row[1]} did {row[2]} with status {row[3]}. Details: {str(row[4])}"
+                    for row in chunk
+                ]
+
+                # 3. Generate the Vectors (The Magic)
+                embeddings = cache.encode(descriptions, model.encode)
+
                 # 4. Save back to database
-                cur.execute(
+                cur.executemany(
                     "UPDATE agent_logs SET embedding = %s WHERE id = %s",
-                    (embedding.tolist(), log_id)
+                    [(embedding.tolist(), row[0]) for row, embedding in zip(chunk, embeddings)],
                 )
-                print(f"   -> Learned: {row[1]} ({row[2]})")
+                print(f"   -> Learned {start + len(chunk)}/{len(rows)}")
             
             conn.commit()
             print("✅ All logs vectorized!")
+            print(f"📦 Embedding cache: {cache.stats()}")
 
     except Exception as e:
         print(f"❌ Error: {e}")
     finally:
         conn.close()
+        cache.close()
 
 if __name__ == "__main__":
     vectorize_missing()
\ No newline at end of file
@@ -1,3 +1,5 @@
 from .processor import IngestionEngine
+from .async_engine import AsyncIngestionEngine
 from .generator import generate_log_batch
+from .batch import LogBatch
 from .config import TOTAL_LOGS_TO_PROCESS, BATCH_SIZE
\ No newline at end of file
@@ -0,0 +1,174 @@
+# ingestion/async_engine.py
+import asyncio
+import queue
+import time
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+
+from database.db import COPY_LOGS_SQL, COPY_LOGS_BINARY_SQL, COPY_BINARY_HEADER, COPY_BINARY_TRAILER
+from database.rollups import UPSERT_SQL, aggregate
+from .config import (
+    COPY_FORMAT, FLUSH_POLICY, METRICS_INTERVAL_SECS, FLUSH_MAX_ATTEMPTS,
+    ASYNC_PROCESSES, ASYNC_CONCURRENCY,
+)
+from .processor import IngestionEngine, IngestionWorker, _backoff
+
+async def _aflush_buffer(conn, buffer, rollup_entries=(), copy_format=COPY_FORMAT):
+    """Async twin of processor._flush_buffer: COPY, then the rollup upserts in one pipeline."""
+    async with conn.cursor() as cur:
+        if copy_format == "binary":
+            async with cur.copy(COPY_LOGS_BINARY_SQL) as copy:
+                await copy.write(COPY_BINARY_HEADER)
+                for chunk in buffer:
+                    await copy.write(chunk)
+                await copy.write(COPY_BINARY_TRAILER)
+        else:
+            async with cur.copy(COPY_LOGS_SQL) as copy:
+                for row in buffer:
+                    await copy.write_row(row)
+        # COPY can't run in pipeline mode, but the per-bucket upserts can: one round trip for all of them
+        rows = aggregate(rollup_entries)
+        if rows:
+            async with conn.pipeline():
+                await cur.executemany(UPSERT_SQL, rows)
+
+class AsyncIngestionWorker(IngestionWorker):
+    """A worker process that keeps up to `concurrency` flushes in flight on an AsyncConnectionPool.
+
+    Receiving, parsing and encoding stay sequential (they are CPU work); each
+    buffer that comes due is handed to its own task, so while one COPY waits on
+    the network the next buffer is already being filled and sent. With several
+    shards each process keeps one pool per shard and a flush writes them all
+    concurrently.
+    """
+
+    def __init__(self, transport, worker_id, copy_format=COPY_FORMAT, flush_policy=FLUSH_POLICY, events=None,
+                 dsns=None, concurrency=ASYNC_CONCURRENCY):
+        super().__init__(transport, worker_id, copy_format, flush_policy, events, dsns)
+        self.concurrency = concurrency
+        self.pools = []
+        self.inflight = set()
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_report = time.monotonic() + METRICS_INTERVAL_SECS
+        self.pools = [AsyncConnectionPool(dsn, min_size=1, max_size=self.concurrency, open=False)
+                      for dsn in self.router.dsns]
+        try:
+            for pool in self.pools:
+                await pool.open()
+            print(f"Worker {self.worker_id}: Connected to DB (async, {self.concurrency} in flight)")
+            while True:
+                # Backpressure: don't read more than we can flush
+                while len(self.inflight) >= self.concurrency:
+                    await asyncio.wait(self.inflight, return_when=asyncio.FIRST_COMPLETED)
+
+                now = time.monotonic()
+                age = now - self.buffered_since if self.buffered_since else 0.0
+                wait = self.policy.wait_time(self.buffered_rows, age)
+                wait = next_report - now if wait is None else min(wait, next_report - now)
+                try:
+                    batch = await loop.run_in_executor(None, self.transport.recv, max(wait, 0.0))
+                except queue.Empty:
+                    batch = ()
+
+                if batch is None:
+                    self.flush()
+                    break
+
+                if len(batch):
+                    seq = self.transport.last_seq
+                    if seq is not None:
+                        self._emit("claim", seq)
+                    self.add(batch, seq, self.transport.last_offset)
+
+                age = time.monotonic() - self.buffered_since if self.buffered_since else 0.0
+                if self.policy.due(self.buffered_rows, age):
+                    self.flush()
+
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + METRICS_INTERVAL_SECS
+
+            if self.inflight:
+                await asyncio.wait(self.inflight)
+        except Exception as e:
+            print(f"❌ Worker {self.worker_id} CRASHED: {e}")
+            raise
+        finally:
+            self.report()
+            for pool in self.pools:
+                await pool.close()
+            self.router.close()
+            print(f"Worker {self.worker_id} finished. Rows written: {self.processed_count}")
+
+    def flush(self):
+        """Hands the current buffer to a background flush task and starts a fresh one."""
+        if not self.buffered_rows and not self.seqs:
+            return
+        job = (self.buffers, self.rollup_entries, self.shard_rows, self.seqs, self.seq_parts, self.buffered_rows)
+        self._reset()
+        task = asyncio.create_task(self._flush_job(*job))
+        self.inflight.add(task)
+        task.add_done_callback(self.inflight.discard)
+
+    async def _flush_job(self, buffers, rollup_entries, shard_rows, seqs, seq_parts, rows):
+        shards = list(buffers)
+        elapsed = await asyncio.gather(*(
+            self._flush_shard(shard, buffers[shard], rollup_entries.get(shard, ()), shard_rows[shard])
+            for shard in shards
+        ))
+        failed = {shard for shard, secs in zip(shards, elapsed) if secs is None}
+        self._settle(seqs, seq_parts, failed)
+
+        rows -= sum(shard_rows[shard] for shard in failed)
+        elapsed = max((secs for secs in elapsed if secs is not None), default=0.0)
+        if not failed:
+            self.metrics.observe_flush(rows, elapsed)
+            self.policy.observe(rows, elapsed)
+        self.processed_count += rows
+
+    async def _flush_shard(self, shard, buffer, rollup_entries, rows):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                # The pool commits on a clean exit and rolls back (or discards a broken connection) on error
+                async with self.pools[shard].connection() as conn:
+                    await _aflush_buffer(conn, buffer, rollup_entries, self.copy_format)
+                return time.perf_counter() - started
+            except Exception as e:
+                self.metrics.flush_errors += 1
+                if not isinstance(e, psycopg.OperationalError) and attempt + 1 >= FLUSH_MAX_ATTEMPTS:
+                    print(f"❌ Worker {self.worker_id} giving up on {rows} rows after {attempt + 1} "
+                          f"attempts{self._shard_label(shard)}: {e}")
+                    return None
+                delay = _backoff(attempt)
+                shard_note = f", shard {shard}" if len(self.router) > 1 else ""
+                print(f"⚠️ Write Error: {e} (worker {self.worker_id}{shard_note}, retry in {delay:.1f}s)")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+def _async_worker_process(transport, worker_id, copy_format=COPY_FORMAT, flush_policy=FLUSH_POLICY, events=None,
+                          dsns=None, concurrency=ASYNC_CONCURRENCY):
+    AsyncIngestionWorker(transport, worker_id, copy_format, flush_policy, events, dsns, concurrency).run()
+
+class AsyncIngestionEngine(IngestionEngine):
+    """Same start / ingest_batch / stop interface, but a few processes each multiplexing many connections.
+
+    Spool, supervision and metrics are inherited unchanged.
+    """
+
+    name = "async"
+    worker_target = staticmethod(_async_worker_process)
+
+    def __init__(self, *args, num_workers=ASYNC_PROCESSES, concurrency=ASYNC_CONCURRENCY, **kwargs):
+        super().__init__(*args, num_workers=num_workers, **kwargs)
+        self.concurrency = concurrency
+
+    def _worker_args(self, worker_id):
+        return super()._worker_args(worker_id) + (self.concurrency,)
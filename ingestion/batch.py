@@ -0,0 +1,393 @@
+# ingestion/batch.py
+import math
+import struct
+from datetime import datetime, timezone
+
+import numpy as np
+import ujson as json
+
+from database.db import (
+    PG_EPOCH, COPY_TUPLE_HEADER, COPY_NULL, copy_text_field, copy_jsonb_field, copy_optional_text_field,
+    copy_float8_field, NO_SPAN,
+)
+from database.rollups import extract_latency
+
+_MAGIC = b"LGB1"
+_PREFIX = struct.Struct("<4sI")  # magic + header JSON length
+_ALIGN = 8
+_REQUIRED_KEYS = ("ts", "agent_id", "level", "action")
+_SPAN_KEYS = ("trace_id", "span_id", "parent_span_id")
+_NO_SPAN_FIELDS = COPY_NULL * 4  # trace_id, span_id, parent_span_id, duration_ms
+# Years 1-9999: what both COPY encoders and timestamptz render and parse alike
+_MIN_TS = datetime(1, 1, 1, tzinfo=timezone.utc).timestamp()
+_MAX_TS = datetime(9999, 12, 31, 23, 59, 59, tzinfo=timezone.utc).timestamp()
+
+
+def _pad(n):
+    return -n % _ALIGN
+
+
+def _encode_column(values):
+    """Dictionary-encodes a list of strings -> (int32 codes, vocabulary)."""
+    index = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32, count=len(values))
+    return codes, list(index)
+
+
+def _parse_iso_ts(value):
+    """ISO-8601 text -> epoch seconds; no offset means UTC."""
+    try:
+        ts = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"ts must be epoch seconds or ISO-8601, got {value!r}")
+    return (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def _span_id(r, key):
+    """A trace / span id as text ("" counts as absent); numeric ids are stringified."""
+    value = r.get(key)
+    if value is None or value == "":
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    if not isinstance(value, str):
+        raise ValueError(f"{key} must be a string, got {value!r}")
+    if "\x00" in value:
+        raise ValueError(f"{key} must not contain NUL characters")
+    return value
+
+
+def _has_nul(value):
+    """True if any string in a JSON value (keys included) holds NUL, which text and jsonb both reject."""
+    if isinstance(value, str):
+        return "\x00" in value
+    if isinstance(value, dict):
+        return any(_has_nul(k) or _has_nul(v) for k, v in value.items())
+    if isinstance(value, list):
+        return any(_has_nul(v) for v in value)
+    return False
+
+
+def _clean_record(r, dim):
+    """Validates one log dict -> (ts, agent_id, level, action, payload JSON, latency, vector, trace_id,
+    span_id, parent_span_id, duration_ms); raises ValueError on anything a COPY would choke on."""
+    if not isinstance(r, dict):
+        raise ValueError("log must be a JSON object")
+    missing = [k for k in _REQUIRED_KEYS if k not in r]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    ts = r["ts"]
+    if isinstance(ts, str):
+        ts = _parse_iso_ts(ts)  # Historical dumps usually carry ISO-8601 timestamps
+    elif isinstance(ts, bool) or not isinstance(ts, (int, float)):
+        raise ValueError(f"ts must be epoch seconds or ISO-8601, got {ts!r}")
+    if not (math.isfinite(ts) and _MIN_TS <= ts <= _MAX_TS):
+        raise ValueError(f"ts must fall in years 1-9999, got {ts!r}")
+    for key in ("agent_id", "level", "action"):
+        if not isinstance(r[key], str):
+            raise ValueError(f"{key} must be a string, got {r[key]!r}")
+        if "\x00" in r[key]:
+            raise ValueError(f"{key} must not contain NUL characters")
+
+    payload = r.get("payload")
+    if payload is None:
+        payload = {}
+    elif isinstance(payload, str):
+        payload = json.loads(payload)
+    if not isinstance(payload, dict):
+        raise ValueError("payload must be an object or JSON text of one")
+    if _has_nul(payload):
+        raise ValueError("payload must not contain NUL characters (\\u0000)")
+
+    vector = r.get("embedding")
+    if vector is not None:
+        with np.errstate(over="ignore"):  # Out-of-range values become inf, rejected below
+            vector = np.asarray(vector, dtype=np.float32)
+        if vector.ndim != 1 or (dim is not None and len(vector) != dim):
+            raise ValueError(f"embedding must be a list of {dim or 'n'} floats, got shape {vector.shape}")
+        if not np.isfinite(vector).all():
+            raise ValueError("embedding values must be finite float32 numbers")
+
+    trace_id, span_id, parent_span_id = (_span_id(r, k) for k in _SPAN_KEYS)
+    duration = r.get("duration_ms")
+    if duration is not None:
+        if isinstance(duration, bool) or not isinstance(duration, (int, float)) or not 0 <= duration < float("inf"):
+            raise ValueError(f"duration_ms must be a non-negative number, got {duration!r}")
+        duration = float(duration)
+    return (float(ts), r["agent_id"], r["level"], r["action"], json.dumps(payload), extract_latency(payload),
+            vector, trace_id, span_id, parent_span_id, duration)
+
+
+class LogBatch:
+    """Columnar batch of logs: the unit that moves between generator, transport, workers and COPY.
+
+    ts, latency   float64[N]  (epoch seconds; latency is NaN where the payload has none)
+    *_codes       int32[N]    indexes into the agents / levels / actions vocabularies
+    payloads      list[str]   JSON text per row
+    embeddings    float32[N, D] or None; embedding_mask (bool[N]) marks rows without one
+    trace_ids, span_ids, parent_span_ids
+                  list[str | None] each, or all None when no row belongs to a trace
+    duration      float64[N] span duration in ms (NaN = none), or None with them
+    """
+
+    def __init__(self, ts, agent_codes, agents, level_codes, levels, action_codes, actions,
+                 payloads, latency, embeddings=None, embedding_mask=None,
+                 trace_ids=None, span_ids=None, parent_span_ids=None, duration=None):
+        self.ts = ts
+        self.agent_codes = agent_codes
+        self.agents = agents
+        self.level_codes = level_codes
+        self.levels = levels
+        self.action_codes = action_codes
+        self.actions = actions
+        self.payloads = payloads
+        self.latency = latency
+        self.embeddings = embeddings
+        self.embedding_mask = embedding_mask
+        self.trace_ids = trace_ids
+        self.span_ids = span_ids
+        self.parent_span_ids = parent_span_ids
+        self.duration = duration
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def traced(self):
+        return self.trace_ids is not None
+
+    @property
+    def dim(self):
+        return 0 if self.embeddings is None else self.embeddings.shape[1]
+
+    def __getitem__(self, key):
+        """Row slice (views, no copies) or row selection by an integer index array (copies)."""
+        if isinstance(key, slice):
+            pick = lambda values: values[key]
+        elif isinstance(key, np.ndarray) and key.dtype.kind in "iu":
+            pick = lambda values: [values[i] for i in key]
+        else:
+            raise TypeError("LogBatch only supports slices and integer index arrays")
+        spans = (None,) * 4
+        if self.traced:
+            spans = (pick(self.trace_ids), pick(self.span_ids), pick(self.parent_span_ids), self.duration[key])
+        return LogBatch(
+            self.ts[key], self.agent_codes[key], self.agents, self.level_codes[key], self.levels,
+            self.action_codes[key], self.actions, pick(self.payloads), self.latency[key],
+            None if self.embeddings is None else self.embeddings[key],
+            None if self.embedding_mask is None else self.embedding_mask[key],
+            *spans,
+        )
+
+    # --- Construction ---
+
+    @classmethod
+    def from_records(cls, records, on_error=None):
+        """Builds a batch from log dicts (ts, agent_id, level, action, payload, embedding, and optionally
+        trace_id, span_id, parent_span_id, duration_ms).
+
+        A row that fails validation raises ValueError, or is dropped and reported to on_error when given.
+        """
+        rows = []
+        dim = None
+        for record in records:
+            try:
+                row = _clean_record(record, dim)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(e)
+                continue
+            if dim is None and row[6] is not None:
+                dim = len(row[6])  # Every later vector must match the first one
+            rows.append(row)
+
+        n = len(rows)
+        ts, agent_ids, levels, actions, payloads, latencies, vectors, trace_ids, span_ids, parent_span_ids, \
+            durations = zip(*rows) if rows else ((),) * 11
+        agent_codes, agents = _encode_column(agent_ids)
+        level_codes, levels = _encode_column(levels)
+        action_codes, actions = _encode_column(actions)
+        latency = np.array(latencies, dtype=np.float64)  # None -> NaN
+
+        embeddings = mask = None
+        if dim is not None:
+            present = [v is not None for v in vectors]
+            embeddings = np.zeros((n, dim), dtype=np.float32)
+            for i, v in enumerate(vectors):
+                if v is not None:
+                    embeddings[i] = v
+            if not all(present):
+                mask = np.array(present, dtype=bool)
+
+        spans = (None,) * 4
+        if any(trace_ids):
+            spans = (list(trace_ids), list(span_ids), list(parent_span_ids), np.array(durations, dtype=np.float64))
+
+        return cls(np.array(ts, dtype=np.float64), agent_codes, agents, level_codes, levels, action_codes, actions,
+                   list(payloads), latency, embeddings, mask, *spans)
+
+    @classmethod
+    def from_json(cls, lines, on_error=None):
+        """Parses JSON log lines; bad lines and invalid rows are skipped (and reported to on_error)."""
+        on_error = on_error or (lambda e: None)
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except Exception as e:
+                on_error(e)
+        return cls.from_records(records, on_error=on_error)
+
+    # --- Row views ---
+
+    def rollup_entries(self):
+        """(epoch_ts, agent_id, action, latency_or_None) per row, for record_rollups()."""
+        latency = [None if v != v else v for v in self.latency.tolist()]  # NaN -> None
+        agents = [self.agents[c] for c in self.agent_codes.tolist()]
+        actions = [self.actions[c] for c in self.action_codes.tolist()]
+        return list(zip(self.ts.tolist(), agents, actions, latency))
+
+    def copy_rows(self):
+        """Rows ready for a text-format COPY, in LOG_COLUMNS order."""
+        spans = [NO_SPAN] * len(self)
+        if self.traced:
+            duration = [None if v != v else v for v in self.duration.tolist()]  # NaN -> None
+            spans = zip(self.trace_ids, self.span_ids, self.parent_span_ids, duration)
+        micros = np.round(self.ts * 1_000_000).astype(np.int64).astype("datetime64[us]")
+        stamps = [s + "+00" for s in np.datetime_as_string(micros, unit="us").tolist()]
+        vectors = [None] * len(self)
+        if self.embeddings is not None:
+            # 9 significant digits round-trip any float32, so text COPY stores what binary COPY would
+            literal = "[" + ",".join(["%.9g"] * self.dim) + "]"
+            vectors = [literal % tuple(v) for v in self.embeddings.tolist()]
+            if self.embedding_mask is not None:
+                vectors = [v if ok else None for v, ok in zip(vectors, self.embedding_mask.tolist())]
+        return list(zip(
+            stamps,
+            [self.agents[c] for c in self.agent_codes.tolist()],
+            [self.levels[c] for c in self.level_codes.tolist()],
+            [self.actions[c] for c in self.action_codes.tolist()],
+            self.payloads,
+            vectors,
+            *zip(*spans),
+        )) if len(self) else []
+
+    def encode_binary(self):
+        """COPY BINARY tuples (no header/trailer) for the whole batch.
+
+        Fixed-width fields (ts, vectors) are laid out for all rows at once with
+        NumPy structured arrays; vocabulary fields are encoded once per
+        distinct value. The per-row work is a single join of prepared slices.
+        """
+        n = len(self)
+        ts = np.empty(n, dtype=[("len", ">i4"), ("us", ">i8")])
+        ts["len"] = 8
+        ts["us"] = np.round((self.ts - PG_EPOCH) * 1_000_000)
+        ts_view = memoryview(ts.tobytes())
+
+        agents = [copy_text_field(v) for v in self.agents]
+        levels = [copy_text_field(v) for v in self.levels]
+        actions = [copy_text_field(v) for v in self.actions]
+
+        if self.embeddings is not None:
+            dim = self.dim
+            vec = np.empty(n, dtype=[("len", ">i4"), ("dim", ">i2"), ("unused", ">i2"), ("values", ">f4", (dim,))])
+            vec["len"] = 4 + 4 * dim
+            vec["dim"] = dim
+            vec["unused"] = 0
+            vec["values"] = self.embeddings
+            vec_view = memoryview(vec.tobytes())
+            stride = vec.dtype.itemsize
+            vectors = [vec_view[i * stride:(i + 1) * stride] for i in range(n)]
+            if self.embedding_mask is not None:
+                vectors = [v if ok else COPY_NULL for v, ok in zip(vectors, self.embedding_mask.tolist())]
+        else:
+            vectors = [COPY_NULL] * n
+
+        spans = [_NO_SPAN_FIELDS] * n
+        if self.traced:
+            duration = [None if v != v else v for v in self.duration.tolist()]  # NaN -> None
+            spans = [
+                copy_optional_text_field(t) + copy_optional_text_field(s) + copy_optional_text_field(p)
+                + copy_float8_field(d)
+                for t, s, p, d in zip(self.trace_ids, self.span_ids, self.parent_span_ids, duration)
+            ]
+
+        parts = []
+        for i, (a, l, c) in enumerate(zip(self.agent_codes.tolist(), self.level_codes.tolist(), self.action_codes.tolist())):
+            parts += (COPY_TUPLE_HEADER, ts_view[i * 12:(i + 1) * 12], agents[a], levels[l], actions[c],
+                      copy_jsonb_field(self.payloads[i]), vectors[i], spans[i])
+        return b"".join(parts)
+
+    # --- Wire format (shared-memory slots, spool files) ---
+
+    def to_bytes(self):
+        """Self-describing buffer: small JSON header + 8-byte aligned column sections."""
+        blob = "\x00".join(self.payloads).encode("utf-8")
+        span_blob = b""
+        if self.traced:
+            ids = self.trace_ids + self.span_ids + self.parent_span_ids
+            span_blob = "\x00".join(v or "" for v in ids).encode("utf-8")
+        header = json.dumps({
+            "n": len(self), "dim": self.dim, "masked": self.embedding_mask is not None,
+            "agents": self.agents, "levels": self.levels, "actions": self.actions, "payload_bytes": len(blob),
+            "traced": self.traced, "span_bytes": len(span_blob),
+        }).encode("utf-8")
+        head = _PREFIX.pack(_MAGIC, len(header)) + header
+        sections = [head + b"\x00" * _pad(len(head))]
+        columns = [self.ts, self.latency, self.agent_codes, self.level_codes, self.action_codes]
+        if self.embedding_mask is not None:
+            columns.append(self.embedding_mask)
+        if self.traced:
+            columns.append(self.duration)
+        for column in columns:
+            data = np.ascontiguousarray(column).tobytes()
+            sections.append(data + b"\x00" * _pad(len(data)))
+        sections.append(blob + b"\x00" * _pad(len(blob)))
+        if self.traced:
+            sections.append(span_blob + b"\x00" * _pad(len(span_blob)))
+        if self.embeddings is not None:
+            sections.append(np.ascontiguousarray(self.embeddings, dtype=np.float32).tobytes())
+        return b"".join(sections)
+
+    @classmethod
+    def from_buffer(cls, buf):
+        """Inverse of to_bytes. Numeric columns are zero-copy views onto buf."""
+        buf = memoryview(buf)
+        magic, header_len = _PREFIX.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a LogBatch buffer")
+        offset = _PREFIX.size
+        header = json.loads(bytes(buf[offset:offset + header_len]))
+        offset += header_len
+        offset += _pad(offset)
+        n, dim = header["n"], header["dim"]
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes + _pad(array.nbytes)
+            return array
+
+        ts = take(np.float64, n)
+        latency = take(np.float64, n)
+        agent_codes = take(np.int32, n)
+        level_codes = take(np.int32, n)
+        action_codes = take(np.int32, n)
+        mask = take(np.bool_, n) if header["masked"] else None
+        traced = header.get("traced", False)  # absent in buffers spooled before traces existed
+        duration = take(np.float64, n) if traced else None
+        blob = bytes(buf[offset:offset + header["payload_bytes"]]).decode("utf-8")
+        offset += header["payload_bytes"] + _pad(header["payload_bytes"])
+        payloads = blob.split("\x00") if n else []
+        spans = (None,) * 4
+        if traced:
+            span_bytes = header["span_bytes"]
+            ids = [v or None for v in bytes(buf[offset:offset + span_bytes]).decode("utf-8").split("\x00")]
+            offset += span_bytes + _pad(span_bytes)
+            spans = (ids[:n], ids[n:2 * n], ids[2 * n:], duration)
+        embeddings = take(np.float32, n * dim).reshape(n, dim) if dim else None
+        return cls(ts, agent_codes, header["agents"], level_codes, header["levels"], action_codes,
+                   header["actions"], payloads, latency, embeddings, mask, *spans)
@@ -0,0 +1,66 @@
+# ingestion/flush.py
+from .config import (
+    DB_BATCH_SIZE, FLUSH_MAX_LATENCY_SECS, FLUSH_TARGET_SECS, FLUSH_MIN_ROWS, FLUSH_MAX_ROWS,
+)
+
+
+class FlushPolicy:
+    """Flush when the buffer holds max_rows, or when its oldest row has waited max_latency seconds."""
+
+    name = "fixed"
+
+    def __init__(self, max_rows=DB_BATCH_SIZE, max_latency=FLUSH_MAX_LATENCY_SECS):
+        self.max_rows = max_rows
+        self.max_latency = max_latency
+
+    def due(self, buffered_rows, oldest_age):
+        if buffered_rows >= self.max_rows:
+            return True
+        return buffered_rows > 0 and oldest_age >= self.max_latency
+
+    def wait_time(self, buffered_rows, oldest_age):
+        """How long a worker may block for more input before the latency trigger fires (None = forever)."""
+        if not buffered_rows:
+            return None
+        return max(0.0, self.max_latency - oldest_age)
+
+    def observe(self, rows, seconds):
+        """Called after every successful flush (COPY + commit)."""
+
+
+class AdaptiveFlushPolicy(FlushPolicy):
+    """Sizes flushes so each COPY + commit takes about target_secs.
+
+    Keeps an EWMA of observed rows/sec and sets max_rows = rate * target_secs,
+    clamped to [min_rows, cap_rows] and moved at most 2x per flush. A fast
+    database grows the batches (fewer commits, better COPY amortisation); a
+    slow or struggling one shrinks them so commits stay short.
+    """
+
+    name = "adaptive"
+
+    def __init__(self, max_rows=DB_BATCH_SIZE, max_latency=FLUSH_MAX_LATENCY_SECS, target_secs=FLUSH_TARGET_SECS,
+                 min_rows=FLUSH_MIN_ROWS, cap_rows=FLUSH_MAX_ROWS, alpha=0.3):
+        super().__init__(max_rows, max_latency)
+        self.target_secs = target_secs
+        self.min_rows = min_rows
+        self.cap_rows = cap_rows
+        self.alpha = alpha
+        self.rate = None  # rows/sec EWMA
+
+    def observe(self, rows, seconds):
+        if rows <= 0 or seconds <= 0:
+            return
+        rate = rows / seconds
+        self.rate = rate if self.rate is None else self.alpha * rate + (1 - self.alpha) * self.rate
+        wanted = self.rate * self.target_secs
+        wanted = min(wanted, self.max_rows * 2, self.cap_rows)
+        self.max_rows = int(max(wanted, self.max_rows / 2, self.min_rows))
+
+
+def make_flush_policy(kind):
+    if kind == "fixed":
+        return FlushPolicy()
+    if kind == "adaptive":
+        return AdaptiveFlushPolicy()
+    raise ValueError(f"Unknown flush policy: {kind!r} (expected 'fixed' or 'adaptive')")
@@ -0,0 +1,271 @@
+# ingestion/loader.py
+"""Bulk NDJSON loader: replays log dumps (plain, .gz or .zst) into agent_logs.
+
+  python -m ingestion.loader dump.ndjson.gz [more files...] [--target engine|copy]
+
+Each file is read in LOAD_CHUNK_BYTES chunks cut at line boundaries. A process
+pool parses the chunks into LogBatches, and they are handed on in file order,
+either to IngestionEngine (--target engine) or COPYed straight into the
+owning shards, one transaction per chunk (--target copy). At most two chunks
+per parse worker are in flight, so memory stays bounded whatever the file size.
+
+After every chunk the byte offset (in the decompressed stream) up to which all
+lines are safe is written to <file>.checkpoint. With the copy target that
+means committed. With the engine target it means spooled, and the engine
+replays its spool on its next start. A rerun resumes from the checkpoint,
+and --restart ignores it. The chunk in flight when the loader died may be
+loaded twice.
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import psycopg
+
+from database.db import copy_log_rows
+from database.rollups import record_rollups
+from database.sharding import ShardRouter
+from .batch import LogBatch
+from .config import (
+    SHARD_DSNS, ROLLUPS_ENABLED, SPOOL_DIR, FLUSH_MAX_ATTEMPTS, FLUSH_RETRY_BASE_SECS, FLUSH_RETRY_MAX_SECS,
+    LOAD_CHUNK_BYTES, LOAD_PARSE_WORKERS, LOAD_PROGRESS_SECS,
+)
+
+
+# --- Reading ---
+
+def open_dump(path):
+    """Binary reader over the decompressed contents of a dump."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        import zstandard  # Only needed for .zst dumps
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def _skip(f, offset):
+    if f.seekable():
+        f.seek(offset)
+        return
+    while offset > 0:
+        data = f.read(min(offset, 1 << 20))
+        if not data:
+            break
+        offset -= len(data)
+
+
+def read_chunks(f, offset=0, chunk_bytes=LOAD_CHUNK_BYTES):
+    """Yields (end_offset, bytes) of whole lines, starting at offset of the decompressed stream."""
+    _skip(f, offset)
+    tail = b""
+    while True:
+        data = f.read(chunk_bytes)
+        if not data:
+            break
+        data = tail + data
+        cut = data.rfind(b"\n") + 1
+        tail = data[cut:]
+        if cut:
+            offset += cut
+            yield offset, data[:cut]
+    if tail:
+        yield offset + len(tail), tail  # Last line without a trailing newline
+
+
+def parse_chunk(data):
+    """Runs in the parse pool: chunk bytes -> (LogBatch, bad line count, first error)."""
+    errors = []
+    batch = LogBatch.from_json((line for line in data.split(b"\n") if line.strip()), on_error=errors.append)
+    return batch, len(errors), str(errors[0]) if errors else None
+
+
+# --- Sinks ---
+
+class EngineSink:
+    """Feeds an IngestionEngine; a batch is safe once ingest_batch() has spooled it."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def write(self, batch):
+        self.engine.ingest_batch(batch)
+
+    def close(self):
+        self.engine.stop()
+
+
+class CopySink:
+    """COPYs each batch into its shards (in parallel) and commits before returning."""
+
+    def __init__(self, dsns=None):
+        self.router = ShardRouter(dsns or SHARD_DSNS)
+        self.conns = {}
+
+    def write(self, batch):
+        parts = dict(self.router.split_batch(batch))
+        self.router.map(lambda shard: self._write_shard(shard, parts[shard]), list(parts))
+
+    def _write_shard(self, shard, part):
+        for attempt in range(FLUSH_MAX_ATTEMPTS):
+            conn = self.conns.get(shard)
+            if conn is None or conn.closed:
+                conn = self.conns[shard] = psycopg.connect(self.router.dsns[shard])
+            try:
+                with conn.cursor() as cur:
+                    copy_log_rows(cur, part, "binary")
+                    if ROLLUPS_ENABLED:
+                        record_rollups(cur, part.rollup_entries())
+                conn.commit()
+                return
+            except psycopg.OperationalError as e:
+                # Connection trouble: reconnect and retry the same rows; anything else is fatal
+                conn.close()
+                if attempt + 1 >= FLUSH_MAX_ATTEMPTS:
+                    raise
+                delay = min(FLUSH_RETRY_MAX_SECS, FLUSH_RETRY_BASE_SECS * 2 ** attempt)
+                print(f"⚠️ COPY to shard {shard} failed: {e} (retry in {delay:.1f}s)")
+                time.sleep(delay)
+
+    def close(self):
+        for conn in self.conns.values():
+            conn.close()
+        self.router.close()
+
+
+# --- Checkpoints ---
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path, state):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)  # A crash mid-write leaves the previous checkpoint intact
+
+
+# --- Loading ---
+
+class BulkLoader:
+    def __init__(self, sink, parse_workers=LOAD_PARSE_WORKERS, chunk_bytes=LOAD_CHUNK_BYTES,
+                 progress_secs=LOAD_PROGRESS_SECS):
+        self.sink = sink
+        self.parse_workers = parse_workers
+        self.chunk_bytes = chunk_bytes
+        self.progress_secs = progress_secs
+        self.pool = ProcessPoolExecutor(parse_workers) if parse_workers > 0 else None
+
+    def load(self, path, checkpoint_path=None, restart=False):
+        """Loads one dump, resuming from its checkpoint; returns the rows loaded by this call."""
+        checkpoint_path = checkpoint_path or path + ".checkpoint"
+        state = None if restart else read_checkpoint(checkpoint_path)
+        if state and state.get("done"):
+            print(f"⏭️ {path}: already loaded ({state['rows']:,} rows); --restart to load it again")
+            return 0
+        state = state or {"file": os.path.abspath(path), "offset": 0, "rows": 0, "bad_lines": 0, "done": False}
+        if state["offset"]:
+            print(f"♻️ {path}: resuming at byte {state['offset']:,} ({state['rows']:,} rows already loaded)")
+
+        started = time.time()
+        resumed_rows = state["rows"]
+        next_report = started + self.progress_secs
+        last = (started, state["rows"])
+        with open_dump(path) as f:
+            for end, batch, bad, error in self._parsed(read_chunks(f, state["offset"], self.chunk_bytes)):
+                if bad:
+                    if not state["bad_lines"]:
+                        print(f"⚠️ {path}: skipping unparseable lines (first: {error})")
+                    state["bad_lines"] += bad
+                if len(batch):
+                    self.sink.write(batch)
+                state["offset"] = end
+                state["rows"] += len(batch)
+                write_checkpoint(checkpoint_path, state)
+
+                now = time.time()
+                if now >= next_report:
+                    rate = (state["rows"] - last[1]) / (now - last[0])
+                    print(f"📥 {path}: {state['rows']:,} rows, {state['offset'] / 1e6:,.1f} MB, "
+                          f"{rate:,.0f} rows/sec, {state['bad_lines']:,} bad lines")
+                    last = (now, state["rows"])
+                    next_report = now + self.progress_secs
+
+        state["done"] = True
+        write_checkpoint(checkpoint_path, state)
+        loaded = state["rows"] - resumed_rows
+        duration = time.time() - started
+        print(f"✅ {path}: {loaded:,} rows in {duration:.1f}s ({loaded / duration if duration else 0:,.0f} rows/sec), "
+              f"{state['bad_lines']:,} bad lines")
+        return loaded
+
+    def _parsed(self, chunks):
+        """(end_offset, batch, bad lines, first error) in file order, parsing ahead on the pool."""
+        if self.pool is None:
+            for end, data in chunks:
+                yield (end, *parse_chunk(data))
+            return
+        inflight = deque()
+        for end, data in chunks:
+            inflight.append((end, self.pool.submit(parse_chunk, data)))
+            if len(inflight) >= 2 * self.parse_workers:
+                end, future = inflight.popleft()
+                yield (end, *future.result())
+        while inflight:
+            end, future = inflight.popleft()
+            yield (end, *future.result())
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        self.sink.close()
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ingestion.loader",
+                                     description="Bulk-load NDJSON log dumps (.gz / .zst ok) into agent_logs.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--target", choices=["engine", "copy"], default="engine",
+                        help="engine: IngestionEngine workers; copy: COPY + commit per chunk from this process")
+    parser.add_argument("--parse-workers", type=int, default=LOAD_PARSE_WORKERS, help="0 parses in this process")
+    parser.add_argument("--chunk-mb", type=float, default=LOAD_CHUNK_BYTES / (1024 * 1024))
+    parser.add_argument("--progress-secs", type=float, default=LOAD_PROGRESS_SECS)
+    parser.add_argument("--restart", action="store_true", help="Ignore existing checkpoints")
+    args = parser.parse_args(argv)
+
+    if args.target == "engine":
+        from .processor import IngestionEngine
+        if not SPOOL_DIR:
+            print("⚠️ Spool disabled: rows buffered in the engine when the loader dies are lost, "
+                  "although the checkpoint is past them")
+        engine = IngestionEngine()
+        engine.start()
+        sink = EngineSink(engine)
+    else:
+        sink = CopySink()
+
+    loader = BulkLoader(sink, args.parse_workers, int(args.chunk_mb * 1024 * 1024), args.progress_secs)
+    total = 0
+    try:
+        for path in args.files:
+            total += loader.load(path, restart=args.restart)
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; rerun the same command to resume from the checkpoints")
+    finally:
+        loader.close()
+    print(f"🏁 Loaded {total:,} rows from {len(args.files)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
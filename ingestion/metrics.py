@@ -0,0 +1,83 @@
+# ingestion/metrics.py
+import bisect
+import os
+
+# Upper bounds (seconds) of the flush-duration histogram buckets; the last bucket is open-ended
+FLUSH_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+COUNTERS = ("batches", "rows_parsed", "rows_flushed", "parse_errors", "rejected_batches", "flushes", "flush_errors")
+
+
+class WorkerMetrics:
+    """Counters one worker keeps and periodically ships to the engine as a plain dict."""
+
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.batches = 0
+        self.rows_parsed = 0
+        self.rows_flushed = 0
+        self.parse_errors = 0
+        self.rejected_batches = 0  # undecodable / unencodable batches sent to the dead letter file
+        self.flushes = 0
+        self.flush_errors = 0
+        self.flush_seconds = 0.0
+        self.flush_histogram = [0] * (len(FLUSH_BUCKETS) + 1)
+        self.queue_wait_seconds = 0.0
+        self.queue_wait_max = 0.0
+        self.batch_rows = 0  # current flush size target
+
+    def observe_batch(self, rows, queue_wait):
+        self.batches += 1
+        self.rows_parsed += rows
+        self.queue_wait_seconds += queue_wait
+        self.queue_wait_max = max(self.queue_wait_max, queue_wait)
+
+    def observe_flush(self, rows, seconds):
+        self.flushes += 1
+        self.rows_flushed += rows
+        self.flush_seconds += seconds
+        self.flush_histogram[bisect.bisect_left(FLUSH_BUCKETS, seconds)] += 1
+
+    def snapshot(self):
+        snap = {name: getattr(self, name) for name in COUNTERS}
+        snap.update({
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "flush_seconds": self.flush_seconds,
+            "flush_histogram": list(self.flush_histogram),
+            "queue_wait_seconds": self.queue_wait_seconds,
+            "queue_wait_max": self.queue_wait_max,
+            "batch_rows": self.batch_rows,
+        })
+        return snap
+
+
+def histogram_quantile(counts, q):
+    """Upper bound of the bucket holding the q-quantile (None when empty, inf past the last bound)."""
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in zip(FLUSH_BUCKETS + (float("inf"),), counts):
+        seen += count
+        if seen >= q * total:
+            return bound
+    return float("inf")
+
+
+def aggregate(snapshots):
+    """Folds the latest snapshot from every worker into engine-wide totals."""
+    total = {name: sum(s[name] for s in snapshots) for name in COUNTERS}
+    histogram = [sum(column) for column in zip(*(s["flush_histogram"] for s in snapshots))] or [0] * (len(FLUSH_BUCKETS) + 1)
+    flush_seconds = sum(s["flush_seconds"] for s in snapshots)
+    total.update({
+        "workers": len(snapshots),
+        "flush_seconds_avg": round(flush_seconds / total["flushes"], 4) if total["flushes"] else None,
+        "flush_seconds_p50": histogram_quantile(histogram, 0.50),
+        "flush_seconds_p95": histogram_quantile(histogram, 0.95),
+        "flush_histogram": dict(zip([str(b) for b in FLUSH_BUCKETS] + ["+inf"], histogram)),
+        "queue_wait_avg": round(sum(s["queue_wait_seconds"] for s in snapshots) / total["batches"], 4) if total["batches"] else None,
+        "queue_wait_max": round(max((s["queue_wait_max"] for s in snapshots), default=0.0), 4),
+        "batch_rows": [s["batch_rows"] for s in sorted(snapshots, key=lambda s: (s["worker_id"], s["pid"]))],
+    })
+    return total
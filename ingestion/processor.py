@@ -1,84 +1,506 @@
 # ingestion/processor.py
 import multiprocessing
-import ujson as json
-import psycopg
+import queue
+import threading
 import time
-from .config import NUM_WORKERS, QUEUE_MAX_SIZE, DB_URI, DB_BATCH_SIZE
-
-def _worker_process(queue, worker_id):
-    processed_count = 0
-    buffer = []
-    
-    try:
-        with psycopg.connect(DB_URI) as conn:
-            with conn.cursor() as cur:
-                print(f"Worker {worker_id}: Connected to DB")
-                
-                while True:
-                    batch = queue.get()
-                    if batch is None:
-                        # Flush leftovers before quitting
-                        if buffer: 
-                            _flush_buffer(cur, buffer)
-                            conn.commit()
-                            processed_count += len(buffer)
-                        break
-                    
-                    for log_str in batch:
-                        try:
-                            data = json.loads(log_str)
-                            
-                            row = (
-                                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(data['ts'])),
-                                data['agent_id'],
-                                data['level'],
-                                data['action'],
-                                json.dumps(data['payload']),
-                                str(data['embedding'])  # Back to REAL data
-                            )
-                            buffer.append(row)
-                        except Exception as parse_error:
-                            print(f"⚠️ Worker {worker_id} skipped bad log: {parse_error}")
-                    
-                    # Flush if buffer is full
-                    if len(buffer) >= DB_BATCH_SIZE:
-                        _flush_buffer(cur, buffer)
-                        conn.commit()
-                        processed_count += len(buffer)
-                        buffer.clear()
-                        
-    except Exception as e:
-        print(f"❌ Worker {worker_id} CRASHED: {e}")
-    finally:
-        print(f"Worker {worker_id} finished. Rows written: {processed_count}")
-
-def _flush_buffer(cur, buffer):
+import psycopg
+from database.db import copy_log_rows, write_binary_copy
+from database.rollups import record_rollups
+from database.sharding import ShardRouter
+from .config import (
+    NUM_WORKERS, QUEUE_MAX_SIZE, SHARD_DSNS, ROLLUPS_ENABLED,
+    TRANSPORT, SHM_SLOTS, SHM_SLOT_BYTES, COPY_FORMAT, FLUSH_POLICY, METRICS_INTERVAL_SECS,
+    SPOOL_DIR, FLUSH_RETRY_BASE_SECS, FLUSH_RETRY_MAX_SECS, FLUSH_MAX_ATTEMPTS, SUPERVISOR_INTERVAL_SECS,
+    MAX_DELIVERIES,
+)
+from .batch import LogBatch
+from .flush import make_flush_policy
+from .metrics import WorkerMetrics, aggregate
+from .spool import Spool
+from .transport import make_transport, encode_batch, decode_batch
+
+def _backoff(attempt):
+    return min(FLUSH_RETRY_MAX_SECS, FLUSH_RETRY_BASE_SECS * 2 ** attempt)
+
+class IngestionWorker:
+    """One worker process: receive batches, buffer them, COPY + commit, acknowledge.
+
+    Reports to the engine through `events` as (kind, worker_id, body):
+      "claim"    a spooled batch (body = seq) is now buffered here
+      "ack"      those batches (body = [seq]) are committed
+      "dead"     those batches (body = [seq]) couldn't be decoded / encoded at all
+      "partial"  body = [(seq, offset, rows, [shard])]: the batch's rows from offset on those shards
+                 failed FLUSH_MAX_ATTEMPTS times on non-connection errors, the rest are committed
+      "metrics"  body = WorkerMetrics snapshot
+    A failed flush keeps the buffer and retries with backoff (reconnecting when
+    the connection is gone), so a Postgres restart stalls the worker instead
+    of dropping rows.
+
+    Rows are buffered per shard (by agent_id) and a flush COPYs to every shard
+    in parallel, one connection each; the batches are acknowledged once all
+    shards have committed. When a shard gives up, only the batches' rows on
+    that shard are dead-lettered, since the other shards' rows are committed.
+    """
+
+    def __init__(self, transport, worker_id, copy_format=COPY_FORMAT, flush_policy=FLUSH_POLICY, events=None,
+                 dsns=None):
+        self.transport = transport
+        self.worker_id = worker_id
+        self.copy_format = copy_format
+        self.policy = make_flush_policy(flush_policy)
+        self.metrics = WorkerMetrics(worker_id)
+        self.events = events
+        self.router = ShardRouter(dsns or SHARD_DSNS)
+        self.conns = {}           # shard -> connection
+
+        self.processed_count = 0
+        self.buffers = {}         # shard -> binary: encoded tuple chunks (one per batch); text: COPY rows
+        self.buffered_rows = 0
+        self.buffered_since = None
+        self.rollup_entries = {}  # shard -> (epoch_ts, agent_id, action, latency) per buffered row
+        self.shard_rows = {}      # shard -> buffered rows
+        self.seqs = []            # spool sequence numbers of the buffered batches
+        self.seq_parts = {}       # seq -> (offset, rows of the message, shards it touched)
+
+    def _emit(self, kind, body):
+        if self.events is not None:
+            self.events.put((kind, self.worker_id, body))
+
+    def _skip(self, parse_error):
+        self.metrics.parse_errors += 1
+        print(f"⚠️ Worker {self.worker_id} skipped bad log: {parse_error}")
+
+    def _reject(self, seq, error):
+        """A batch that can't be decoded or encoded would kill every worker it reaches: dead-letter it."""
+        self.metrics.rejected_batches += 1
+        print(f"❌ Worker {self.worker_id} rejected a batch{'' if seq is None else f' (spool seq {seq})'}: {error}")
+        if seq is not None:
+            self._emit("dead", [seq])
+
+    def report(self):
+        self.metrics.batch_rows = self.policy.max_rows
+        self._emit("metrics", self.metrics.snapshot())
+
+    # --- Database ---
+
+    def _shard_label(self, shard):
+        return f" (shard {shard})" if len(self.router) > 1 else ""
+
+    def _connect(self, shard=0):
+        attempt = 0
+        while True:
+            try:
+                self.conns[shard] = psycopg.connect(self.router.dsns[shard])
+                print(f"Worker {self.worker_id}: Connected to DB{self._shard_label(shard)}")
+                return
+            except psycopg.OperationalError as e:
+                delay = _backoff(attempt)
+                print(f"⚠️ Worker {self.worker_id} can't reach the DB{self._shard_label(shard)} ({e}); "
+                      f"retrying in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def flush(self):
+        if not self.buffered_rows and not self.seqs:
+            return
+        # Shards commit independently; a slow one only delays the acknowledgement
+        shards = list(self.buffers)
+        elapsed = self.router.map(self._flush_shard, shards)
+        failed = {shard for shard, secs in zip(shards, elapsed) if secs is None}
+        self._settle(self.seqs, self.seq_parts, failed)
+
+        rows = self.buffered_rows - sum(self.shard_rows[shard] for shard in failed)
+        elapsed = max((secs for secs in elapsed if secs is not None), default=0.0)
+        if not failed:
+            self.metrics.observe_flush(rows, elapsed)
+            self.policy.observe(rows, elapsed)
+        self.processed_count += rows
+        self._reset()
+
+    def _settle(self, seqs, seq_parts, failed):
+        """Acks the flushed batches; those with rows on a failed shard have just those rows dead-lettered."""
+        acked, partial = [], []
+        for seq in seqs:
+            offset, rows, shards = seq_parts[seq]
+            lost = sorted(shards & failed)
+            if lost:
+                partial.append((seq, offset, rows, lost))
+            else:
+                acked.append(seq)
+        if partial:
+            self._emit("partial", partial)
+        if acked:
+            self._emit("ack", acked)
+
+    def _flush_shard(self, shard):
+        """COPY + commit one shard's buffer; seconds taken by the attempt that succeeded, or None on giving up."""
+        buffer = self.buffers[shard]
+        attempt = 0
+        while True:
+            conn = self.conns.get(shard)
+            if conn is None or conn.closed:
+                self._connect(shard)
+                conn = self.conns[shard]
+            started = time.perf_counter()
+            try:
+                with conn.cursor() as cur:
+                    _flush_buffer(cur, buffer, self.rollup_entries.get(shard, ()), self.copy_format)
+                conn.commit()
+                return time.perf_counter() - started
+            except Exception as e:
+                self.metrics.flush_errors += 1
+                connection_lost = isinstance(e, psycopg.OperationalError) or conn.closed
+                try:
+                    conn.rollback()
+                except psycopg.Error:
+                    pass
+                if not connection_lost and attempt + 1 >= FLUSH_MAX_ATTEMPTS:
+                    print(f"❌ Worker {self.worker_id} giving up on {self.shard_rows[shard]} rows after {attempt + 1} "
+                          f"attempts{self._shard_label(shard)}: {e}")
+                    return None
+                delay = _backoff(attempt)
+                shard_note = f", shard {shard}" if len(self.router) > 1 else ""
+                print(f"⚠️ Write Error: {e} (worker {self.worker_id}{shard_note}, retry in {delay:.1f}s)")
+                time.sleep(delay)
+                attempt += 1
+
+    def _reset(self):
+        # Rebound rather than cleared: an async flush may still hold the old ones
+        self.buffered_rows = 0
+        self.buffered_since = None
+        self.buffers = {}
+        self.rollup_entries = {}
+        self.shard_rows = {}
+        self.seqs = []
+        self.seq_parts = {}
+
+    # --- Main loop ---
+
+    def add(self, batch, seq=None, offset=0):
+        # One vectorized conversion per batch, whatever form it arrived in; all of it before touching the
+        # buffers, so a batch that fails half way leaves nothing behind
+        message_rows = len(batch)
+        try:
+            if not isinstance(batch, LogBatch):
+                batch = LogBatch.from_json(batch, on_error=self._skip)
+            parts = [
+                (shard, len(part), part.encode_binary() if self.copy_format == "binary" else part.copy_rows(),
+                 part.rollup_entries() if ROLLUPS_ENABLED else ())
+                for shard, part in self.router.split_batch(batch)
+            ]
+        except Exception as e:
+            self._reject(seq, e)
+            return
+        for shard, rows, encoded, rollups in parts:
+            self.shard_rows[shard] = self.shard_rows.get(shard, 0) + rows
+            buffer = self.buffers.setdefault(shard, [])
+            if self.copy_format == "binary":
+                buffer.append(encoded)
+            else:
+                buffer.extend(encoded)
+            if ROLLUPS_ENABLED:
+                self.rollup_entries.setdefault(shard, []).extend(rollups)
+        self.buffered_rows += len(batch)
+        self.buffered_since = self.buffered_since or time.monotonic()
+        self.metrics.observe_batch(len(batch), self.transport.last_wait)
+        if seq is not None:
+            self.seqs.append(seq)
+            self.seq_parts[seq] = (offset, message_rows, {shard for shard, *_ in parts})
+
+    def run(self):
+        next_report = time.monotonic() + METRICS_INTERVAL_SECS
+        try:
+            for shard in range(len(self.router)):
+                self._connect(shard)
+            while True:
+                now = time.monotonic()
+                age = now - self.buffered_since if self.buffered_since else 0.0
+                wait = self.policy.wait_time(self.buffered_rows, age)
+                wait = next_report - now if wait is None else min(wait, next_report - now)
+                try:
+                    batch = self.transport.recv(timeout=max(wait, 0.0))
+                except queue.Empty:
+                    batch = ()  # Timed out: fall through to the latency / metrics checks
+                except (ValueError, KeyError, UnicodeDecodeError) as e:
+                    self._reject(self.transport.last_seq, e)  # A slot that doesn't decode
+                    batch = ()
+
+                if batch is None:
+                    # Flush leftovers before quitting
+                    self.flush()
+                    break
+
+                if len(batch):
+                    seq = self.transport.last_seq
+                    if seq is not None:
+                        self._emit("claim", seq)
+                    self.add(batch, seq, self.transport.last_offset)
+
+                # Flush on size or on the oldest row's age
+                age = time.monotonic() - self.buffered_since if self.buffered_since else 0.0
+                if self.policy.due(self.buffered_rows, age):
+                    self.flush()
+
+                if time.monotonic() >= next_report:
+                    self.report()
+                    next_report = time.monotonic() + METRICS_INTERVAL_SECS
+
+        except Exception as e:
+            print(f"❌ Worker {self.worker_id} CRASHED: {e}")
+            raise
+        finally:
+            self.report()
+            for conn in self.conns.values():
+                conn.close()
+            self.router.close()
+            print(f"Worker {self.worker_id} finished. Rows written: {self.processed_count}")
+
+def _worker_process(transport, worker_id, copy_format=COPY_FORMAT, flush_policy=FLUSH_POLICY, events=None, dsns=None):
+    IngestionWorker(transport, worker_id, copy_format, flush_policy, events, dsns).run()
+
+def _flush_buffer(cur, buffer, rollup_entries=(), copy_format=COPY_FORMAT):
+    """COPY the buffer (plus its rollups) in the caller's transaction. Raises on failure; the caller retries."""
     if not buffer: return
-    try:
-        # High-Performance COPY Command
-        with cur.copy("COPY agent_logs (ts, agent_id, level, action, payload, embedding) FROM STDIN") as copy:
-            for row in buffer:
-                copy.write_row(row)
-    except Exception as e:
-        print(f"⚠️ Write Error: {e}")
+    # High-Performance COPY Command
+    if copy_format == "binary":
+        write_binary_copy(cur, buffer)
+    else:
+        copy_log_rows(cur, buffer)
+    # Latency rollups for /stats, committed with the rows they describe
+    record_rollups(cur, rollup_entries)
 
 class IngestionEngine:
-    def __init__(self):
-        self.queue = multiprocessing.Queue(maxsize=QUEUE_MAX_SIZE)
-        self.workers = []
+    """One synchronous worker process (one connection) per CPU, fed through the transport."""
+
+    name = "process"
+    worker_target = staticmethod(_worker_process)
+
+    def __init__(self, transport=TRANSPORT, copy_format=COPY_FORMAT, flush_policy=FLUSH_POLICY,
+                 spool_dir=SPOOL_DIR, num_workers=NUM_WORKERS, dsns=None):
+        self.transport = make_transport(transport, QUEUE_MAX_SIZE, SHM_SLOTS, SHM_SLOT_BYTES)
+        self.copy_format = copy_format
+        self.flush_policy = flush_policy
+        self.num_workers = num_workers
+        self.spool = Spool(spool_dir) if spool_dir else None
+        self.dsns = dsns or SHARD_DSNS  # One per shard; SHARD_DSNS unless given
+        self.router = ShardRouter(self.dsns)  # Finds the rows of a failed shard in a spooled batch
+        self.events = multiprocessing.Queue()
+        self.worker_metrics = {}  # (worker_id, pid) -> latest snapshot
+        self.workers = {}         # worker_id -> Process
+        self.respawns = 0
+        self._lock = threading.Lock()
+        self._parts = {}          # seq -> transport messages not yet acknowledged
+        self._dead = set()        # seqs with a part reported dead; dead-lettered once every part is in
+        self._deliveries = {}     # seq -> workers that died holding this batch (carried over on redelivery)
+        self._claims = {}         # worker_id -> {seq: parts buffered there, not yet acknowledged}
+        self._threads = []
+        self._closing = threading.Event()
+
+    def start(self, report_every=None):
+        print(f"🔥 Starting {self.name} engine with {self.num_workers} workers ({self.transport.name} transport, "
+              f"{self.copy_format} COPY, {self.flush_policy} flush, spool {'on' if self.spool else 'off'}, "
+              f"{len(self.dsns)} shard{'s' if len(self.dsns) > 1 else ''})...")
+        for i in range(self.num_workers):
+            self._spawn(i)
+        # Always drain worker events: a worker can't exit while its queued data is unread
+        self._run_thread(self._collect_events)
+        self._run_thread(self._supervise)
+        if report_every:
+            self._run_thread(self._report_loop, report_every)
+        self._replay()
+
+    def _run_thread(self, target, *args):
+        t = threading.Thread(target=target, args=args, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def _spawn(self, worker_id):
+        p = multiprocessing.Process(target=self.worker_target, args=self._worker_args(worker_id))
+        p.start()
+        self.workers[worker_id] = p
+
+    def _worker_args(self, worker_id):
+        return (self.transport, worker_id, self.copy_format, self.flush_policy, self.events, self.dsns)
+
+    def _replay(self):
+        if not self.spool:
+            return
+        pending = self.spool.pending()
+        if pending:
+            print(f"♻️ Replaying {len(pending)} unacknowledged batches from the spool...")
+        for seq in pending:
+            batch = self._decode_spooled(seq, *self.spool.read(seq))
+            if batch is not None:
+                self._send(batch, seq)
+                self.spool.replayed += 1
 
-    def start(self):
-        print(f"🔥 Starting engine with {NUM_WORKERS} workers...")
-        for i in range(NUM_WORKERS):
-            p = multiprocessing.Process(target=_worker_process, args=(self.queue, i))
-            p.start()
-            self.workers.append(p)
+    def _decode_spooled(self, seq, kind, data):
+        """The spooled batch, or None (and dead-lettered) when its bytes don't decode."""
+        try:
+            return decode_batch(kind, data)
+        except Exception as e:
+            print(f"☠️ Spooled batch {seq} doesn't decode ({e}); moved to the dead letter file")
+            self.spool.dead_letter(seq)
+            return None
 
     def ingest_batch(self, batch):
-        self.queue.put(batch)
+        seq = None
+        if self.spool:
+            # Durable before it is handed to a worker
+            seq = self.spool.append(*encode_batch(batch))
+        self._send(batch, seq)
+
+    def _send(self, batch, seq):
+        if seq is None:
+            self.transport.send(batch)
+            return
+        with self._lock:
+            self._parts[seq] = 0
+        parts = self.transport.send(batch, seq)
+        with self._lock:
+            # Some parts may already be acknowledged (count went negative) while the rest were sent
+            self._parts[seq] += parts
+            if self._parts[seq] == 0:
+                del self._parts[seq]
+                self.spool.ack(seq)
+
+    # --- Worker events ---
+
+    def _collect_events(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            kind, worker_id, body = event
+            if kind == "metrics":
+                # Keyed by pid too, so a respawned worker doesn't erase its predecessor's counts
+                self.worker_metrics[(worker_id, body["pid"])] = body
+            elif kind == "claim":
+                with self._lock:
+                    claims = self._claims.setdefault(worker_id, {})
+                    claims[body] = claims.get(body, 0) + 1
+            elif kind in ("ack", "dead"):
+                self._acknowledge(worker_id, body, dead=kind == "dead")
+            elif kind == "partial":
+                for seq, offset, rows, shards in body:
+                    self._dead_letter_rows(seq, offset, rows, shards)
+                self._acknowledge(worker_id, [seq for seq, *_ in body])
+
+    def _acknowledge(self, worker_id, seqs, dead=False):
+        with self._lock:
+            claims = self._claims.get(worker_id, {})
+            for seq in seqs:
+                if claims.get(seq, 0) > 1:
+                    claims[seq] -= 1
+                else:
+                    claims.pop(seq, None)
+                if seq not in self._parts:
+                    continue  # Superseded by a redelivery
+                if dead:
+                    self._dead.add(seq)
+                self._parts[seq] -= 1
+                if self._parts[seq] == 0:
+                    del self._parts[seq]
+                    self._deliveries.pop(seq, None)
+                    if seq in self._dead:
+                        self._dead.discard(seq)
+                        self.spool.dead_letter(seq)
+                    else:
+                        self.spool.ack(seq)
+
+    def _dead_letter_rows(self, seq, offset, rows, shards):
+        """Dead-letters one message's rows on the failed shards (the rest of it was committed)."""
+        with self._lock:
+            if seq not in self._parts:
+                return  # Superseded by a redelivery
+        batch = decode_batch(*self.spool.read(seq))[offset:offset + rows]
+        if not isinstance(batch, LogBatch):
+            batch = LogBatch.from_json(batch)  # Drops the same bad lines the worker did
+        for shard, part in self.router.split_batch(batch):
+            if shard in shards:
+                self.spool.write_dead_letter(seq, *encode_batch(part))
+                print(f"☠️ {len(part)} rows of batch {seq} failed on shard {shard}; moved to the dead letter file")
+
+    # --- Supervision ---
+
+    def _supervise(self):
+        deaths = {}
+        while not self._closing.wait(SUPERVISOR_INTERVAL_SECS):
+            for worker_id, p in list(self.workers.items()):
+                if p.is_alive() or self._closing.is_set():
+                    continue
+                # Back off a worker that keeps dying (e.g. a poison batch or a broken environment)
+                attempt = deaths.get(worker_id, 0)
+                print(f"💀 Worker {worker_id} died (exit code {p.exitcode}); respawning")
+                if self._closing.wait(min(FLUSH_RETRY_MAX_SECS, FLUSH_RETRY_BASE_SECS * attempt)):
+                    break
+                self._spawn(worker_id)
+                self.respawns += 1
+                deaths[worker_id] = attempt + 1
+                self._redeliver(worker_id)
+
+    def _redeliver(self, worker_id):
+        """Resends, from the spool, whatever the dead worker had buffered but not committed."""
+        with self._lock:
+            # Retiring the old sequence numbers makes late acks for other parts of those batches no-ops
+            lost = [seq for seq in self._claims.pop(worker_id, {}) if self._parts.pop(seq, None) is not None]
+            deliveries = {seq: self._deliveries.pop(seq, 0) + 1 for seq in lost}
+            self._dead.difference_update(lost)
+        if not self.spool:
+            print(f"⚠️ Worker {worker_id} lost its buffered rows (spool disabled)")
+            return
+        resent = 0
+        for seq in lost:
+            if deliveries[seq] >= MAX_DELIVERIES:
+                # Probably the batch that keeps killing workers
+                print(f"☠️ Batch {seq} was held by {deliveries[seq]} workers that died; moved to the dead letter file")
+                self.spool.dead_letter(seq)
+                continue
+            kind, data = self.spool.read(seq)
+            batch = self._decode_spooled(seq, kind, data)
+            if batch is None:
+                continue
+            new_seq = self.spool.append(kind, data)
+            with self._lock:
+                self._deliveries[new_seq] = deliveries[seq]
+            self.spool.ack(seq)
+            self._send(batch, new_seq)
+            resent += 1
+        if resent:
+            print(f"♻️ Redelivered {resent} batches from worker {worker_id}")
+
+    # --- Metrics ---
+
+    def metrics(self):
+        """Engine-wide totals from the latest snapshot of every worker, plus the per-worker snapshots."""
+        snapshots = [self.worker_metrics[k] for k in sorted(self.worker_metrics)]
+        totals = aggregate(snapshots)
+        totals["per_worker"] = snapshots
+        totals["respawns"] = self.respawns
+        totals["spool"] = self.spool.stats() if self.spool else None
+        return totals
+
+    def report(self):
+        m = self.metrics()
+        secs = lambda v: "-" if v is None else f"{v}s"
+        print(f"📈 parsed={m['rows_parsed']:,} flushed={m['rows_flushed']:,} "
+              f"errors={m['parse_errors']}/{m['flush_errors']} flush_avg={secs(m['flush_seconds_avg'])} "
+              f"flush_p95<={secs(m['flush_seconds_p95'])} queue_wait_avg={secs(m['queue_wait_avg'])} "
+              f"batch_rows={m['batch_rows']} respawns={m['respawns']}")
+
+    def _report_loop(self, interval):
+        while not self._closing.wait(interval):
+            self.report()
 
     def stop(self):
-        for _ in range(NUM_WORKERS):
-            self.queue.put(None)
-        for p in self.workers:
-            p.join()
\ No newline at end of file
+        self._closing.set()
+        self.transport.close(self.num_workers)
+        for p in list(self.workers.values()):
+            p.join()
+        self.events.put(None)
+        for t in self._threads:
+            t.join()
+        if self.spool:
+            self.spool.close()
+        self.router.close()
+        self.transport.cleanup()
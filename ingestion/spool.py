@@ -0,0 +1,202 @@
+# ingestion/spool.py
+import glob
+import os
+import struct
+import threading
+import zlib
+
+from .config import SPOOL_SEGMENT_BYTES, SPOOL_FSYNC, SPOOL_FSYNC_INTERVAL_SECS
+
+# seq, payload length, crc32(payload), batch kind (see transport.encode_batch)
+_RECORD = struct.Struct("<QIIc")
+_SEGMENT_GLOB = "*.seg"
+DEAD_LETTER_FILE = "dead_letter.seg"
+
+
+class Spool:
+    """Append-only, segmented write-ahead log for ingestion batches.
+
+    Every batch is appended (one sequential write) before ingest_batch()
+    returns and is acknowledged once a worker has committed it. A segment is
+    deleted when it is no longer the active one and every batch in it has been
+    acknowledged; anything still on disk at startup is handed back by
+    pending() for replay. Delivery is at-least-once: a batch committed just
+    before a crash, but not yet acknowledged, is replayed.
+
+    fsync policy: "always" (fsync every append), "interval" (a background
+    thread fsyncs at most every fsync_interval seconds, grouping appends) or
+    "never" (leave it to the OS). Appends always reach the OS before
+    append() returns, so a process crash loses nothing under any policy.
+    """
+
+    def __init__(self, directory, segment_bytes=SPOOL_SEGMENT_BYTES, fsync=SPOOL_FSYNC,
+                 fsync_interval=SPOOL_FSYNC_INTERVAL_SECS):
+        if fsync not in ("always", "interval", "never"):
+            raise ValueError(f"Unknown spool fsync policy: {fsync!r}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._segments = {}  # path -> set of unacknowledged seqs
+        self._index = {}     # seq -> (path, offset of the payload, length, kind)
+        self._next_seq = 1
+        self._active = None  # (path, file) being appended to
+        self._active_size = 0
+        self._dirty = False
+        self._stopping = threading.Event()
+        self._syncer = None
+
+        self.appended = 0
+        self.appended_bytes = 0
+        self.replayed = 0
+
+        self._scan()
+        if fsync == "interval":
+            self._syncer = threading.Thread(target=self._sync_loop, name="spool-fsync", daemon=True)
+            self._syncer.start()
+
+    # --- Recovery ---
+
+    def _scan(self):
+        """Indexes existing segments, truncating any torn record left by a crash mid-append."""
+        for path in sorted(glob.glob(os.path.join(self.directory, _SEGMENT_GLOB))):
+            if os.path.basename(path) == DEAD_LETTER_FILE:
+                continue
+            seqs = set()
+            with open(path, "r+b") as f:
+                offset = 0
+                while True:
+                    header = f.read(_RECORD.size)
+                    if len(header) < _RECORD.size:
+                        break
+                    seq, length, crc, kind = _RECORD.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+                    self._index[seq] = (path, offset + _RECORD.size, length, kind)
+                    seqs.add(seq)
+                    self._next_seq = max(self._next_seq, seq + 1)
+                    offset += _RECORD.size + length
+                if offset < os.path.getsize(path):
+                    print(f"⚠️ Spool: truncating torn tail of {os.path.basename(path)} at byte {offset}")
+                    f.truncate(offset)
+            if seqs:
+                self._segments[path] = seqs
+            else:
+                os.remove(path)
+
+    def pending(self):
+        """Sequence numbers of every unacknowledged batch, oldest first."""
+        with self._lock:
+            return sorted(self._index)
+
+    # --- Write path ---
+
+    def append(self, kind, data):
+        """Writes one encoded batch and returns its sequence number."""
+        with self._lock:
+            if self._active is None or self._active_size >= self.segment_bytes:
+                self._roll()
+            seq = self._next_seq
+            self._next_seq += 1
+            path, f = self._active
+            f.write(_RECORD.pack(seq, len(data), zlib.crc32(data), kind))
+            f.write(data)
+            f.flush()
+            if self.fsync == "always":
+                os.fsync(f.fileno())
+            else:
+                self._dirty = True
+            self._index[seq] = (path, self._active_size + _RECORD.size, len(data), kind)
+            self._segments[path].add(seq)
+            self._active_size += _RECORD.size + len(data)
+            self.appended += 1
+            self.appended_bytes += len(data)
+            return seq
+
+    def _roll(self):
+        if self._active is not None:
+            path, f = self._active
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+            f.close()
+            self._active = None
+            self._drop_if_done(path)
+        path = os.path.join(self.directory, f"{self._next_seq:020d}.seg")
+        self._active = (path, open(path, "ab"))
+        self._active_size = 0
+        self._segments[path] = set()
+
+    def sync(self):
+        with self._lock:
+            if self._dirty and self._active is not None:
+                os.fsync(self._active[1].fileno())
+                self._dirty = False
+
+    def _sync_loop(self):
+        while not self._stopping.wait(self.fsync_interval):
+            self.sync()
+
+    # --- Read / acknowledge ---
+
+    def read(self, seq):
+        """(kind, data) of a still-unacknowledged batch."""
+        with self._lock:
+            path, offset, length, kind = self._index[seq]
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return kind, f.read(length)
+
+    def ack(self, seq):
+        with self._lock:
+            entry = self._index.pop(seq, None)
+            if entry is None:
+                return
+            self._segments[entry[0]].discard(seq)
+            self._drop_if_done(entry[0])
+
+    def dead_letter(self, seq):
+        """Moves a batch that can never be written to dead_letter.seg, then acknowledges it."""
+        self.write_dead_letter(seq, *self.read(seq))
+        self.ack(seq)
+
+    def write_dead_letter(self, seq, kind, data):
+        """Appends (part of) batch seq to dead_letter.seg; acknowledging it is up to the caller."""
+        with open(os.path.join(self.directory, DEAD_LETTER_FILE), "ab") as f:
+            f.write(_RECORD.pack(seq, len(data), zlib.crc32(data), kind))
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _drop_if_done(self, path):
+        active = self._active is not None and self._active[0] == path
+        if not active and not self._segments.get(path):
+            self._segments.pop(path, None)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "unacked": len(self._index),
+                "appended": self.appended,
+                "appended_bytes": self.appended_bytes,
+                "replayed": self.replayed,
+            }
+
+    def close(self):
+        self._stopping.set()
+        if self._syncer:
+            self._syncer.join()
+        with self._lock:
+            if self._active is not None:
+                path, f = self._active
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+                self._active = None
+                self._drop_if_done(path)
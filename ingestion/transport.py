@@ -0,0 +1,181 @@
+# ingestion/transport.py
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+
+from .batch import LogBatch
+
+_LEN = struct.Struct("<I")
+
+# Each slot starts with an 8-byte header (payload kind tag + padding) so columns stay aligned
+_SLOT_HEADER = 8
+RECORDS = b"R"
+COLUMNAR = b"C"
+
+
+def encode_records(batch) -> bytes:
+    """Packs a list of str/bytes records as <u32 length><payload> frames."""
+    parts = []
+    for record in batch:
+        data = record.encode("utf-8") if isinstance(record, str) else record
+        parts.append(_LEN.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_records(buf):
+    """Inverse of encode_records. Returns a list of bytes, each one a copy out of buf.
+
+    Not zero-copy: ujson (like json) only parses str / bytes / bytearray, so a
+    memoryview slice would have to be copied by the caller anyway.
+    """
+    view = memoryview(buf)
+    records = []
+    offset = 0
+    end = len(view)
+    while offset < end:
+        (size,) = _LEN.unpack_from(view, offset)
+        offset += _LEN.size
+        records.append(bytes(view[offset:offset + size]))
+        offset += size
+    return records
+
+
+def encode_batch(batch):
+    """(kind, bytes) for a JSON-lines batch or a LogBatch; shared by the shm slots and the spool."""
+    if isinstance(batch, LogBatch):
+        return COLUMNAR, batch.to_bytes()
+    return RECORDS, encode_records(batch)
+
+
+def decode_batch(kind, buf):
+    if kind == COLUMNAR:
+        return LogBatch.from_buffer(buf)
+    return decode_records(buf)
+
+
+class QueueTransport:
+    """The original path: each batch is pickled through a multiprocessing.Queue pipe.
+
+    Common interface: send(batch, seq) returns how many messages the batch
+    became; recv(timeout) raises queue.Empty on timeout, and afterwards
+    last_seq / last_wait hold the batch's spool sequence number and how long
+    it sat between send() and recv(), and last_offset the position of the
+    message's first row within that batch.
+    """
+
+    name = "queue"
+
+    def __init__(self, max_size):
+        self.queue = multiprocessing.Queue(maxsize=max_size)
+        self.last_seq = None
+        self.last_wait = 0.0
+        self.last_offset = 0  # Batches are never split here
+
+    def send(self, batch, seq=None):
+        self.queue.put((time.time(), seq, batch))
+        return 1
+
+    def recv(self, timeout=None):
+        message = self.queue.get(timeout=timeout)
+        if message is None:
+            return None
+        sent_at, self.last_seq, batch = message
+        self.last_wait = max(0.0, time.time() - sent_at)
+        return batch
+
+    def close(self, num_workers):
+        for _ in range(num_workers):
+            self.queue.put(None)
+
+    def cleanup(self):
+        # Anything still queued (workers died) is in the spool; don't block interpreter exit on it
+        self.queue.cancel_join_thread()
+
+
+class SharedMemoryTransport:
+    """Batches travel through a shared-memory segment split into fixed-size slots.
+
+    The producer takes a free slot (blocking when all are in use, which is the
+    backpressure), writes the batch into it and passes only (slot, nbytes,
+    sent_at, seq) through a queue. JSON batches are framed records that the worker
+    copies out (one copy per record, as the JSON parser needs bytes) and releases
+    at once, so only the pickling is saved; LogBatches are laid out column by column,
+    so the worker maps its arrays straight onto the slot and keeps the slot
+    until its next recv(), by which time the batch has been encoded for COPY.
+    """
+
+    name = "shm"
+
+    def __init__(self, slots, slot_bytes):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.free = multiprocessing.Queue()
+        self.work = multiprocessing.Queue()
+        self._held = None  # worker side: slot backing the last columnar batch
+        self.last_seq = None
+        self.last_wait = 0.0
+        self.last_offset = 0
+        for slot in range(slots):
+            self.free.put(slot)
+
+    def send(self, batch, seq=None, offset=0):
+        kind, data = encode_batch(batch)
+        if len(data) > self.slot_bytes - _SLOT_HEADER:
+            if len(batch) == 1:
+                raise ValueError(f"Single record of {len(data)} bytes exceeds SHM slot size {self.slot_bytes}")
+            # Too big for one slot: split and send the halves
+            half = len(batch) // 2
+            return self.send(batch[:half], seq, offset) + self.send(batch[half:], seq, offset + half)
+        self.send_bytes(kind, data, seq, offset)
+        return 1
+
+    def send_bytes(self, kind, data, seq=None, offset=0):
+        slot = self.free.get()
+        start = slot * self.slot_bytes
+        self.shm.buf[start:start + 1] = kind
+        self.shm.buf[start + _SLOT_HEADER:start + _SLOT_HEADER + len(data)] = data
+        self.work.put((slot, len(data), time.time(), seq, offset))
+
+    def recv(self, timeout=None):
+        self._release()
+        message = self.work.get(timeout=timeout)
+        if message is None:
+            return None
+        slot, size, sent_at, self.last_seq, self.last_offset = message
+        self.last_wait = max(0.0, time.time() - sent_at)
+        start = slot * self.slot_bytes
+        body = self.shm.buf[start + _SLOT_HEADER:start + _SLOT_HEADER + size]
+        if bytes(self.shm.buf[start:start + 1]) == COLUMNAR:
+            self._held = slot
+            return LogBatch.from_buffer(body)
+        try:
+            return decode_records(body)
+        finally:
+            body.release()
+            self.free.put(slot)
+
+    def _release(self):
+        if self._held is not None:
+            self.free.put(self._held)
+            self._held = None
+
+    def close(self, num_workers):
+        for _ in range(num_workers):
+            self.work.put(None)
+
+    def cleanup(self):
+        self.work.cancel_join_thread()
+        self.free.cancel_join_thread()
+        self.shm.close()
+        self.shm.unlink()
+
+
+def make_transport(kind, queue_max_size, shm_slots, shm_slot_bytes):
+    if kind == "queue":
+        return QueueTransport(queue_max_size)
+    if kind == "shm":
+        return SharedMemoryTransport(shm_slots, shm_slot_bytes)
+    raise ValueError(f"Unknown transport: {kind!r} (expected 'queue' or 'shm')")
@@ -0,0 +1,227 @@
+# ingestion/workload.py
+"""Seeded, vectorized synthetic workload: realistic logs a column at a time.
+
+Every column of a batch is drawn with one NumPy call, so generation stays far
+ahead of the engine (millions of rows/sec without embeddings) and every run
+can produce fresh, unique rows instead of replaying one batch.
+
+  agents     `agents` ids, optionally Zipf-skewed (agent_skew > 0)
+  actions    `actions` names with Zipfian popularity (action_skew)
+  outcomes   chaos_monkey's mixture: success 20-150ms INFO, warning 300-700ms
+             WARN, error 800-2000ms ERROR (warning_rate / error_rate)
+  wave       optional seed_fast harmonic on success latency: 80 + 40 sin(step/15)
+             + 15 sin(step/7) + jitter
+  ts         Poisson arrivals at `rate` events/sec from start_ts (default now,
+             or SEED_EPOCH when seeded, so the same seed gives the same rows)
+  embeddings one unit centroid per cluster, actions mapped onto clusters, plus
+             Gaussian noise of norm ~spread (dim=0 leaves them NULL)
+
+Usage:
+  python -m ingestion.workload --rows 1000000 --out logs.ndjson.gz --seed 7
+  python -m ingestion.workload --rows 1000000 --ingest --error-rate 0.05
+"""
+import argparse
+import gzip
+import json
+import time
+
+import numpy as np
+
+from .batch import LogBatch
+from .config import EMBEDDING_DIM, BATCH_SIZE
+
+ACTION_NAMES = [
+    "reasoning_step", "tool_call", "summarize_text", "calculate_tax", "generate_image",
+    "scrape_web", "translate", "retrieve_context", "plan_task", "write_code",
+]
+LEVELS = ["INFO", "WARN", "ERROR"]
+STATUSES = ["success", "warning", "error"]
+# (low, high) latency in ms per outcome, as in database/chaos_monkey.py
+LATENCY_RANGES = [(20, 150), (300, 700), (800, 2000)]
+# Where a seeded run's ts start unless start_ts is given (2026-01-01 UTC)
+SEED_EPOCH = 1_767_225_600.0
+
+
+def _zipf_weights(n, skew):
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+
+class WorkloadGenerator:
+    def __init__(self, seed=None, agents=50, actions=10, agent_skew=0.0, action_skew=1.1, warning_rate=0.2,
+                 error_rate=0.2, wave=False, rate=10_000.0, start_ts=None, dim=EMBEDDING_DIM, clusters=16,
+                 spread=0.3):
+        if warning_rate + error_rate > 1:
+            raise ValueError("warning_rate + error_rate must be <= 1")
+        self.rng = np.random.default_rng(seed)
+        self.agents = [f"agent_{i}" for i in range(1, agents + 1)]
+        self.actions = ACTION_NAMES[:actions] + [f"action_{i}" for i in range(len(ACTION_NAMES), actions)]
+        self.agent_p = None if agent_skew <= 0 else _zipf_weights(agents, agent_skew)
+        self.action_p = None if action_skew <= 0 else _zipf_weights(actions, action_skew)
+        self.outcome_p = np.array([1 - warning_rate - error_rate, warning_rate, error_rate])
+        self.wave = wave
+        self.rate = rate
+        self.dim = dim
+        self.spread = spread
+
+        centroids = self.rng.standard_normal((clusters, dim), dtype=np.float32) if dim else None
+        if centroids is not None:
+            centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+        self.centroids = centroids
+        self.action_cluster = np.arange(actions) % clusters
+
+        if start_ts is None:
+            start_ts = time.time() if seed is None else SEED_EPOCH
+        self.ts = start_ts
+        self.step = 0  # rows generated so far; also makes every payload unique
+
+    def batch(self, n) -> LogBatch:
+        rng = self.rng
+        steps = np.arange(self.step, self.step + n)
+        self.step += n
+
+        arrivals = np.cumsum(rng.exponential(1.0 / self.rate, n))
+        ts = self.ts + arrivals
+        self.ts = float(ts[-1]) if n else self.ts
+
+        agent_codes = rng.choice(len(self.agents), size=n, p=self.agent_p).astype(np.int32)
+        action_codes = rng.choice(len(self.actions), size=n, p=self.action_p).astype(np.int32)
+        outcome = rng.choice(3, size=n, p=self.outcome_p).astype(np.int32)
+
+        low = np.array([r[0] for r in LATENCY_RANGES])[outcome]
+        high = np.array([r[1] for r in LATENCY_RANGES])[outcome]
+        latency = rng.integers(low, high + 1)
+        if self.wave:
+            harmonic = 80 + 40 * np.sin(steps / 15.0) + 15 * np.sin(steps / 7.0) + rng.uniform(-2, 2, n)
+            latency = np.where(outcome == 0, harmonic.astype(np.int64), latency)
+        cpu = rng.integers(10, 91, n)
+        memory = rng.integers(100, 501, n)
+
+        status = [STATUSES[o] for o in outcome.tolist()]
+        payloads = [
+            f'{{"latency":{l},"status":"{s}","cpu_usage":{c},"memory":"{m}MB","step":{i}}}'
+            for l, s, c, m, i in zip(latency.tolist(), status, cpu.tolist(), memory.tolist(), steps.tolist())
+        ]
+
+        embeddings = None
+        if self.dim:
+            noise = rng.standard_normal((n, self.dim), dtype=np.float32)
+            noise *= self.spread / np.sqrt(self.dim)
+            embeddings = noise + self.centroids[self.action_cluster[action_codes]]
+
+        return LogBatch(
+            ts=ts,
+            agent_codes=agent_codes,
+            agents=self.agents,
+            level_codes=outcome,
+            levels=LEVELS,
+            action_codes=action_codes,
+            actions=self.actions,
+            payloads=payloads,
+            latency=latency.astype(np.float64),
+            embeddings=embeddings,
+        )
+
+    def stream(self, total, batch_size=BATCH_SIZE):
+        """Yields batches until `total` rows have been generated."""
+        remaining = total
+        while remaining > 0:
+            n = min(batch_size, remaining)
+            remaining -= n
+            yield self.batch(n)
+
+    # --- Sinks ---
+
+    def ingest(self, engine, total, batch_size=BATCH_SIZE):
+        """Streams `total` rows into a started IngestionEngine / AsyncIngestionEngine."""
+        for batch in self.stream(total, batch_size):
+            engine.ingest_batch(batch)
+        return total
+
+    def write_ndjson(self, path, total, batch_size=BATCH_SIZE):
+        """Writes `total` rows as JSON lines (gzip when the path ends in .gz)."""
+        if path.endswith(".gz"):
+            f = gzip.open(path, "wt", encoding="utf-8", compresslevel=1)  # fast enough to keep up with generation
+        else:
+            f = open(path, "w", encoding="utf-8")
+        with f:
+            for batch in self.stream(total, batch_size):
+                f.write("\n".join(to_json_lines(batch)))
+                f.write("\n")
+        return total
+
+
+def to_json_lines(batch):
+    """One JSON log line per row, in the shape LogBatch.from_json() and /ingest accept."""
+    agents = [batch.agents[c] for c in batch.agent_codes.tolist()]
+    levels = [batch.levels[c] for c in batch.level_codes.tolist()]
+    actions = [batch.actions[c] for c in batch.action_codes.tolist()]
+    vectors = [""] * len(batch)
+    if batch.embeddings is not None:
+        literal = ',"embedding":[' + ",".join(["%.4g"] * batch.dim) + "]"
+        vectors = [literal % tuple(v) for v in batch.embeddings.tolist()]
+    spans = [""] * len(batch)
+    if batch.traced:
+        duration = [None if v != v else v for v in batch.duration.tolist()]  # NaN -> None
+        spans = [
+            "," + json.dumps({"trace_id": t, "span_id": s, "parent_span_id": p, "duration_ms": d})[1:-1]
+            for t, s, p, d in zip(batch.trace_ids, batch.span_ids, batch.parent_span_ids, duration)
+        ]
+    return [
+        f'{{"ts":{t!r},"agent_id":"{a}","level":"{l}","action":"{c}","payload":{p}{v}{s}}}'
+        for t, a, l, c, p, v, s in zip(batch.ts.tolist(), agents, levels, actions, batch.payloads, vectors, spans)
+    ]
+
+
+# --- CLI ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ingestion.workload",
+                                     description="Generate a synthetic log workload into a file or the engine.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--seed", type=int, default=None, help="Same seed, same rows")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--actions", type=int, default=10)
+    parser.add_argument("--agent-skew", type=float, default=0.0, help="Zipf exponent for agents (0 = uniform)")
+    parser.add_argument("--action-skew", type=float, default=1.1, help="Zipf exponent for actions (0 = uniform)")
+    parser.add_argument("--warning-rate", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--wave", action="store_true", help="Harmonic success latency (seed_fast's model)")
+    parser.add_argument("--rate", type=float, default=10_000.0, help="Simulated events/sec (spacing of ts)")
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM, help="Embedding width (0 = no embeddings)")
+    parser.add_argument("--clusters", type=int, default=16)
+    parser.add_argument("--spread", type=float, default=0.3, help="Noise norm around each cluster centroid")
+    parser.add_argument("--start-ts", type=float, default=None,
+                        help="Epoch seconds of the first row (default: now, or SEED_EPOCH with --seed)")
+    sink = parser.add_mutually_exclusive_group()
+    sink.add_argument("--out", default=None, help="NDJSON output path (.gz compresses)")
+    sink.add_argument("--ingest", action="store_true", help="Stream into IngestionEngine")
+    args = parser.parse_args(argv)
+
+    gen = WorkloadGenerator(
+        seed=args.seed, agents=args.agents, actions=args.actions, agent_skew=args.agent_skew,
+        action_skew=args.action_skew, warning_rate=args.warning_rate, error_rate=args.error_rate, wave=args.wave,
+        rate=args.rate, start_ts=args.start_ts, dim=args.dim, clusters=args.clusters, spread=args.spread,
+    )
+    start = time.time()
+    if args.ingest:
+        from .processor import IngestionEngine
+        engine = IngestionEngine()
+        engine.start()
+        gen.ingest(engine, args.rows, args.batch_size)
+        engine.stop()
+        target = "the ingestion engine"
+    elif args.out:
+        gen.write_ndjson(args.out, args.rows, args.batch_size)
+        target = args.out
+    else:
+        for _ in gen.stream(args.rows, args.batch_size):
+            pass
+        target = "nowhere (generation only)"
+    duration = time.time() - start
+    print(f"✅ {args.rows:,} rows to {target} in {duration:.2f}s ({args.rows / duration:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
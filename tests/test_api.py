@@ -1,4 +1,5 @@
 # tests/test_api.py
+import json
 import pytest
 from fastapi.testclient import TestClient
 from api.main import app
@@ -41,4 +42,50 @@ def test_search_authorized(client):
     # Check that we got a list back
     data = response.json()
     assert "results" in data
-    assert isinstance(data["results"], list)
\ No newline at end of file
+    assert isinstance(data["results"], list)
+
+def test_ingest_batch_reports_per_item(client):
+    """Verify a batch keeps the good logs and reports the bad ones by index."""
+    good = {"agent_id": "agent_batch", "level": "INFO", "action": "reasoning_step", "payload": {"latency": 42}}
+    bad = {"agent_id": "agent_batch", "level": "INFO"}  # missing action + payload
+
+    response = client.post("/ingest/batch", json=[good, bad, good])
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["accepted"] == 2
+    assert data["rejected"] == 1
+    assert [r["status"] for r in data["results"]] == ["accepted", "rejected", "accepted"]
+
+def test_ingest_batch_ndjson(client):
+    """Verify NDJSON bodies are accepted line by line."""
+    line = json.dumps({"agent_id": "agent_batch", "level": "INFO", "action": "summarize_text", "payload": {}})
+    body = "\n".join([line, "{not json", line])
+
+    response = client.post("/ingest/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 2
+    assert response.json()["rejected"] == 1
+
+def test_trace_roundtrip(client):
+    """Verify spans ingested in a batch come back as one tree, page through /traces and delete."""
+    headers = {"X-API-Key": "sk-agentops-secret-123"}
+    span = lambda span_id, parent, agent: {
+        "agent_id": agent, "level": "INFO", "action": "tool_call", "payload": {"latency": 10},
+        "trace_id": "trace_test_1", "span_id": span_id, "parent_span_id": parent, "duration_ms": 10.0,
+    }
+    logs = [span("root", None, "agent_trace_a"), span("child", "root", "agent_trace_b"), span("leaf", "child", "agent_trace_a")]
+    assert client.post("/ingest/batch", json=logs).json()["accepted"] == 3
+
+    trace = client.get("/traces/trace_test_1").json()
+    assert trace["span_count"] == 3
+    assert [(s["span_id"], s["depth"]) for s in trace["spans"]] == [("root", 0), ("child", 1), ("leaf", 2)]
+
+    page = client.get("/traces", params={"limit": 1}).json()
+    assert len(page["traces"]) == 1
+    assert page["next_cursor"] is None or client.get("/traces", params={"cursor": page["next_cursor"]}).status_code == 200
+
+    assert client.delete("/traces/trace_test_1").status_code == 403
+    response = client.request("DELETE", "/traces", headers=headers, json={"trace_ids": ["trace_test_1"]})
+    assert response.json()["spans"] == 3
+    assert client.get("/traces/trace_test_1").status_code == 404
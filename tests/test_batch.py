@@ -0,0 +1,204 @@
+# tests/test_batch.py
+import json
+import struct
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from database.db import PG_EPOCH
+from ingestion.batch import LogBatch
+
+def log(**overrides):
+    record = {"ts": 1760000000.5, "agent_id": "agent_1", "level": "INFO", "action": "tool_call",
+              "payload": {"latency": 42}, "embedding": [0.1, 0.2, 0.3]}
+    record.update(overrides)
+    return record
+
+# --- Bad rows ---
+
+@pytest.mark.parametrize("bad", [
+    log(ts="yesterday"),
+    log(ts=True),
+    log(embedding=[0.1, 0.2]),          # width differs from the first vector
+    log(embedding=["a", "b", "c"]),
+    log(payload=[1, 2]),
+    log(payload="{not json"),
+    log(agent_id=7),
+    {"agent_id": "agent_1", "level": "INFO"},
+])
+def test_bad_row_is_dropped_and_reported(bad):
+    """Verify one invalid row costs only itself when on_error is set."""
+    errors = []
+    batch = LogBatch.from_json([json.dumps(log()), json.dumps(bad), json.dumps(log(ts=1760000001))],
+                               on_error=errors.append)
+    assert len(batch) == 2
+    assert len(errors) == 1
+    assert batch.ts.tolist() == [1760000000.5, 1760000001.0]
+
+def test_bad_row_raises_without_on_error():
+    """Verify from_records still fails loudly for direct callers."""
+    with pytest.raises(ValueError):
+        LogBatch.from_records([log(), log(embedding=[1.0])])
+
+def test_payload_as_json_text():
+    batch = LogBatch.from_records([log(payload='{"latency": 7}'), log(payload=None)])
+    assert batch.payloads == ['{"latency":7}', "{}"]
+    assert batch.latency[0] == 7
+
+@pytest.mark.parametrize("bad", [
+    log(trace_id="t", duration_ms="12ms"),
+    log(trace_id="t", duration_ms=-1),
+    log(trace_id={"id": 1}),
+    log(trace_id="t", span_id=[1]),
+])
+def test_bad_span_fields_are_dropped(bad):
+    """Verify bad span fields cost only their row, not the worker that encodes the batch."""
+    errors = []
+    batch = LogBatch.from_json([json.dumps(log(trace_id="t", span_id="a")), json.dumps(bad)], on_error=errors.append)
+    assert len(batch) == 1 and len(errors) == 1
+
+@pytest.mark.parametrize("bad", [
+    log(agent_id="agent\x00_1"),
+    log(action="tool\x00call"),
+    log(payload={"note": "a\x00b"}),
+    log(payload={"nested": [{"k\x00": 1}]}),
+    log(payload='{"note": "a\\u0000b"}'),
+    log(trace_id="t\x00", span_id="a"),
+])
+def test_nul_characters_are_rejected(bad):
+    """Verify strings Postgres text / jsonb would refuse cost only their row."""
+    errors = []
+    batch = LogBatch.from_json([json.dumps(log()), json.dumps(bad)], on_error=errors.append)
+    assert len(batch) == 1 and len(errors) == 1
+
+@pytest.mark.parametrize("ts", [1e300, -1e300, -62135596801, 253402300800, float("nan")])
+def test_ts_outside_timestamptz_range_is_rejected(ts):
+    with pytest.raises(ValueError):
+        LogBatch.from_records([log(ts=ts)])
+
+def test_ts_at_the_range_edges_is_kept():
+    batch = LogBatch.from_records([log(ts=-62135596800), log(ts=253402300799)])
+    assert [row[0][:4] for row in batch.copy_rows()] == ["0001", "9999"]
+
+@pytest.mark.parametrize("embedding", [[1e39, 0.5, 0.1], [float("inf"), 0.5, 0.1], [float("nan"), 0.5, 0.1]])
+def test_non_finite_embeddings_are_rejected(embedding):
+    """Verify values that overflow float32 don't reach COPY as inf / nan."""
+    errors = []
+    batch = LogBatch.from_records([log(), log(embedding=embedding)], on_error=errors.append)
+    assert len(batch) == 1 and len(errors) == 1
+    assert "inf" not in batch.copy_rows()[0][5]
+
+def test_numeric_span_ids_become_text():
+    """Verify integer ids are stored as text instead of failing the COPY encoder."""
+    batch = LogBatch.from_records([log(trace_id=123, span_id=4, parent_span_id=None, duration_ms=12)])
+    assert (batch.trace_ids, batch.span_ids, batch.parent_span_ids) == (["123"], ["4"], [None])
+    assert batch.duration.tolist() == [12.0]
+    batch.encode_binary()
+    LogBatch.from_buffer(batch.to_bytes())
+
+# --- Round trips ---
+
+def mixed_batch():
+    lines = [
+        log(),
+        log(ts=1760000001.25, agent_id="agent_2", level="ERROR", embedding=None, payload={"latency": 900}),
+        log(ts=1760000002, trace_id="t1", span_id="root", duration_ms=15.5),
+        log(ts=1760000003, agent_id="agent_2", trace_id="t1", span_id="child", parent_span_id="root"),
+        log(ts=1760000004, action="summarize", payload={}),
+    ]
+    return LogBatch.from_json([json.dumps(line) for line in lines])
+
+def columns(batch):
+    """Every column as plain Python values (NaN -> None), for comparing batches."""
+    nan = lambda values: [None if v != v else v for v in values]
+    vectors = [None] * len(batch) if batch.embeddings is None else batch.embeddings.tolist()
+    if batch.embedding_mask is not None:
+        vectors = [v if ok else None for v, ok in zip(vectors, batch.embedding_mask.tolist())]
+    return {
+        "ts": batch.ts.tolist(),
+        "agent_id": [batch.agents[c] for c in batch.agent_codes.tolist()],
+        "level": [batch.levels[c] for c in batch.level_codes.tolist()],
+        "action": [batch.actions[c] for c in batch.action_codes.tolist()],
+        "payload": list(batch.payloads),
+        "latency": nan(batch.latency.tolist()),
+        "embedding": vectors,
+        "trace_id": batch.trace_ids and list(batch.trace_ids),
+        "span_id": batch.span_ids and list(batch.span_ids),
+        "parent_span_id": batch.parent_span_ids and list(batch.parent_span_ids),
+        "duration": None if batch.duration is None else nan(batch.duration.tolist()),
+    }
+
+def test_json_to_buffer_round_trip():
+    batch = mixed_batch()
+    assert batch.traced and batch.embedding_mask is not None
+    restored = LogBatch.from_buffer(batch.to_bytes())
+    assert columns(restored) == columns(batch)
+
+def test_round_trip_without_embeddings_or_traces():
+    batch = LogBatch.from_records([log(embedding=None), log(ts=1760000001, embedding=None)])
+    restored = LogBatch.from_buffer(batch.to_bytes())
+    assert restored.embeddings is None and not restored.traced
+    assert columns(restored) == columns(batch)
+
+def test_empty_batch_round_trip():
+    batch = LogBatch.from_json([])
+    assert len(LogBatch.from_buffer(batch.to_bytes())) == 0
+    assert batch.copy_rows() == [] and batch.encode_binary() == b""
+
+def test_slices_and_selections_keep_rows_together():
+    batch = mixed_batch()
+    full = columns(batch)
+    for part, rows in [(batch[1:4], [1, 2, 3]), (batch[np.array([4, 0, 2])], [4, 0, 2])]:
+        expected = {k: None if v is None else [v[i] for i in rows] for k, v in full.items()}
+        assert columns(part) == expected
+        assert columns(LogBatch.from_buffer(part.to_bytes())) == expected
+
+def read_binary_tuples(data):
+    """Decodes encode_binary() output back into per-row field lists (raw bytes, None for NULL)."""
+    rows, offset = [], 0
+    while offset < len(data):
+        (count,) = struct.unpack_from("!h", data, offset)
+        offset += 2
+        fields = []
+        for _ in range(count):
+            (size,) = struct.unpack_from("!i", data, offset)
+            offset += 4
+            fields.append(None if size < 0 else data[offset:offset + size])
+            offset += max(size, 0)
+        rows.append(fields)
+    return rows
+
+def test_binary_and_text_copy_rows_agree():
+    """Verify both COPY encoders write the same values for every column."""
+    batch = mixed_batch()
+    text_rows = batch.copy_rows()
+    binary_rows = read_binary_tuples(batch.encode_binary())
+    assert len(text_rows) == len(binary_rows) == len(batch)
+    for text, binary in zip(text_rows, binary_rows):
+        stamp, agent, level, action, payload, vector, trace_id, span_id, parent_span_id, duration = text
+        (micros,) = struct.unpack("!q", binary[0])
+        expected_ts = datetime.fromisoformat(stamp).timestamp()
+        assert micros / 1e6 + PG_EPOCH == pytest.approx(expected_ts, abs=1e-6)
+        assert [f.decode() for f in binary[1:4]] == [agent, level, action]
+        assert binary[4][:1] == b"\x01" and binary[4][1:].decode() == payload
+        if vector is None:
+            assert binary[5] is None
+        else:
+            dim, _ = struct.unpack_from("!hh", binary[5])
+            values = struct.unpack(f"!{dim}f", binary[5][4:])
+            parsed = np.array(vector.strip("[]").split(","), dtype=np.float64).astype(np.float32)
+            assert parsed.tobytes() == np.array(values, dtype=np.float32).tobytes()
+        assert [None if f is None else f.decode() for f in binary[6:9]] == [trace_id, span_id, parent_span_id]
+        assert (None if binary[9] is None else struct.unpack("!d", binary[9])[0]) == duration
+
+def test_text_vectors_round_trip_float32_exactly():
+    """Verify the text COPY literal parses back to the very same float32 bits."""
+    rng = np.random.default_rng(0)
+    vectors = np.concatenate([rng.standard_normal((50, 16)), rng.uniform(-1e-30, 1e30, (50, 16))]).astype(np.float32)
+    vectors[0, :4] = [np.nextafter(np.float32(1), np.float32(2)), np.finfo(np.float32).max,
+                      np.finfo(np.float32).tiny, -0.0]
+    batch = LogBatch.from_records([log(embedding=v.tolist()) for v in vectors])
+    for row, expected in zip(batch.copy_rows(), vectors):
+        parsed = np.array(row[5].strip("[]").split(","), dtype=np.float64).astype(np.float32)
+        assert parsed.tobytes() == expected.tobytes()
@@ -0,0 +1,92 @@
+# tests/test_benchmarks.py
+import pytest
+
+from benchmarks.runner import _coerce, compare, expand_sweep, scenario_defaults, unmatched
+
+def result(throughput=100.0, p95=10.0, scenario="http_ingest", error=None, **params):
+    r = {"scenario": scenario, "params": {**scenario_defaults(scenario), **params},
+         "throughput": throughput, "latency_ms": None if p95 is None else {"p95": p95}}
+    if error:
+        r["error"] = error
+    return r
+
+def regressed(new, old, threshold=0.10):
+    rows = compare([new], {"results": [old]}, threshold)
+    assert len(rows) == 1
+    return rows[0][4]
+
+# --- Sweeps ---
+
+def test_no_overrides_is_one_run_with_defaults():
+    """Verify a scenario without overrides runs once with its keyword defaults."""
+    assert list(expand_sweep("http_ingest", {})) == [{"concurrency": 16, "requests": 2000}]
+
+def test_sweep_is_the_cartesian_product_with_coerced_values():
+    """Verify CLI strings take the type of the default and every combination is produced."""
+    runs = list(expand_sweep("http_ingest", {"concurrency": ["1", "4"], "requests": ["1e3", "50"]}))
+    assert runs == [
+        {"concurrency": 1, "requests": 1000},
+        {"concurrency": 1, "requests": 50},
+        {"concurrency": 4, "requests": 1000},
+        {"concurrency": 4, "requests": 50},
+    ]
+    assert all(isinstance(v, int) for r in runs for v in r.values())
+
+def test_float_and_string_parameters_are_coerced():
+    """Verify float defaults parse their CLI strings and string defaults pass through."""
+    [run] = expand_sweep("embedding_throughput", {"window_ms": ["2"], "model": ["tiny"]})
+    assert run["window_ms"] == 2.0 and isinstance(run["window_ms"], float)
+    assert run["model"] == "tiny"
+
+def test_bool_strings_are_coerced():
+    """Verify bool defaults accept the usual truthy spellings."""
+    assert _coerce("yes", False) is True and _coerce("1", False) is True
+    assert _coerce("false", True) is False
+
+def test_unknown_parameter_is_refused():
+    """Verify a typo in a parameter name fails instead of silently running the defaults."""
+    with pytest.raises(ValueError, match="concurency"):
+        list(expand_sweep("http_ingest", {"concurency": ["8"]}))
+
+# --- Baseline comparison ---
+
+def test_throughput_drop_beyond_threshold_regresses():
+    """Verify a drop just past the threshold is flagged and one exactly at it is not."""
+    assert regressed(result(throughput=89.0), result(throughput=100.0))
+    assert not regressed(result(throughput=90.0), result(throughput=100.0))
+    assert not regressed(result(throughput=150.0), result(throughput=100.0))
+
+def test_p95_growth_beyond_threshold_regresses():
+    """Verify p95 growth past the threshold is flagged and growth exactly at it is not."""
+    assert regressed(result(p95=11.5), result(p95=10.0))
+    assert not regressed(result(p95=11.0), result(p95=10.0))
+
+def test_p95_growth_within_timer_noise_is_ignored():
+    """Verify a large relative but sub-millisecond p95 growth is not a regression."""
+    assert not regressed(result(p95=0.8), result(p95=0.5))
+    assert regressed(result(p95=1.6), result(p95=0.5))
+
+def test_threshold_is_configurable():
+    """Verify a looser threshold accepts what the default one flags."""
+    assert regressed(result(throughput=80.0), result(throughput=100.0))
+    assert not regressed(result(throughput=80.0), result(throughput=100.0), threshold=0.25)
+
+def test_missing_numbers_compare_as_unknown():
+    """Verify runs without latencies or a zero baseline throughput report no change."""
+    [(_, _, throughput, p95, flagged)] = compare([result(p95=None)], {"results": [result(throughput=0.0)]})
+    assert throughput is None and p95 is None and not flagged
+
+def test_only_matching_successful_runs_are_compared():
+    """Verify failed runs and runs with different parameters never make a row."""
+    baseline = {"results": [result(concurrency=4), result(concurrency=8, error="boom"), result(concurrency=16)]}
+    results = [result(concurrency=4), result(concurrency=8), result(concurrency=16, error="boom"),
+               result(concurrency=32)]
+    rows = compare(results, baseline)
+    assert [row[0]["params"]["concurrency"] for row in rows] == [4]
+
+def test_unmatched_lists_baseline_runs_that_did_not_rerun():
+    """Verify baseline runs of scenarios that ran but have no successful counterpart are reported."""
+    baseline = {"results": [result(concurrency=4), result(concurrency=16), result(concurrency=8, error="boom"),
+                            result(scenario="stats_pollers")]}
+    results = [result(concurrency=4), result(concurrency=16, error="boom")]
+    assert [b["params"]["concurrency"] for b in unmatched(results, baseline)] == [16]
@@ -0,0 +1,83 @@
+# tests/test_cache.py
+import threading
+import time
+
+import pytest
+
+from api.cache import ResponseCache
+
+def counting(value):
+    calls = []
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+def test_hit_until_ttl_expires():
+    cache = ResponseCache(max_staleness=10)
+    compute, calls = counting({"n": 1})
+    assert cache.get_or_compute("stats", None, 0.05, compute) == {"n": 1}
+    assert cache.get_or_compute("stats", None, 0.05, compute) == {"n": 1}
+    assert len(calls) == 1
+    time.sleep(0.06)
+    cache.get_or_compute("stats", None, 0.05, compute)
+    assert len(calls) == 2
+
+def test_params_are_part_of_the_key():
+    cache = ResponseCache()
+    compute, calls = counting([])
+    cache.get_or_compute("search", {"q": "a"}, 5, compute)
+    cache.get_or_compute("search", {"q": "b"}, 5, compute)
+    cache.get_or_compute("search", {"q": "a"}, 5, compute)
+    assert len(calls) == 2
+
+def test_ingest_makes_entries_stale_after_max_staleness():
+    """Verify an ingest only hides cached answers once they are older than max_staleness."""
+    cache = ResponseCache(max_staleness=0.05)
+    compute, calls = counting({"n": 1})
+    cache.get_or_compute("stats", None, 10, compute)
+    cache.bump()
+    cache.get_or_compute("stats", None, 10, compute)
+    assert len(calls) == 1  # Still within max_staleness of the ingest
+    time.sleep(0.06)
+    cache.get_or_compute("stats", None, 10, compute)
+    assert len(calls) == 2
+    assert cache.stats()["stale"] == 1
+    cache.get_or_compute("stats", None, 10, compute)
+    assert len(calls) == 2  # Recomputed under the new watermark
+
+def test_concurrent_misses_compute_once():
+    cache = ResponseCache()
+    calls = []
+    def slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"n": len(calls)}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("stats", None, 5, slow)))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [{"n": 1}] * 8
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"]) == (1, 7)
+
+def test_failed_computation_reaches_every_waiter_and_is_not_cached():
+    cache = ResponseCache()
+    def boom():
+        raise RuntimeError("db down")
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute("stats", None, 5, boom)
+    compute, calls = counting({"n": 1})
+    assert cache.get_or_compute("stats", None, 5, compute) == {"n": 1}
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b", "a", "c"):
+        cache.get_or_compute("e", key, 5, lambda: key)
+    compute, calls = counting("b again")
+    assert cache.get_or_compute("e", "b", 5, compute) == "b again"  # b was least recently used
+    assert cache.stats()["evictions"] == 2
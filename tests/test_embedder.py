@@ -0,0 +1,116 @@
+# tests/test_embedder.py
+import threading
+
+import pytest
+
+from api.embedder import EmbeddingService
+
+class FakeModel:
+    """Encodes each text to [len(text), ord(text[0])] and records every call's texts."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("CUDA out of memory")
+        return [[len(t), ord(t[0])] for t in texts]
+
+def test_queued_requests_share_one_model_call():
+    """Verify requests waiting together are coalesced and each caller gets its own vectors."""
+    model = FakeModel()
+    service = EmbeddingService(model, batch_window=0.2, max_batch=64)
+    futures = [service.submit(["a" * (i + 1), "b" * (i + 1)]) for i in range(5)]
+    service.start()
+    results = [f.result(timeout=2) for f in futures]
+    service.stop()
+
+    assert len(model.calls) == 1 and len(model.calls[0]) == 10
+    for i, vectors in enumerate(results):
+        assert vectors == [[i + 1, ord("a")], [i + 1, ord("b")]]
+    assert service.stats()["requests"] == 5
+
+def test_batches_never_exceed_max_batch():
+    """Verify coalescing stops at max_batch texts and the rest go in the next batch, in order."""
+    model = FakeModel()
+    service = EmbeddingService(model, batch_window=0.2, max_batch=4)
+    futures = [service.submit([chr(ord("a") + i)] * 3) for i in range(3)]  # 3 + 3 + 3 texts
+    service.start()
+    results = [f.result(timeout=2) for f in futures]
+    service.stop()
+
+    assert [len(call) for call in model.calls] == [3, 3, 3]
+    for i, vectors in enumerate(results):
+        assert vectors == [[1, ord("a") + i]] * 3
+    assert service.stats()["max_batch_texts"] == 3
+
+def test_small_requests_fill_up_to_max_batch():
+    """Verify single-text requests are packed until max_batch, with callers mapped by position."""
+    model = FakeModel()
+    service = EmbeddingService(model, batch_window=0.2, max_batch=4)
+    texts = [chr(ord("a") + i) for i in range(10)]
+    futures = [service.submit([t]) for t in texts]
+    service.start()
+    results = [f.result(timeout=2) for f in futures]
+    service.stop()
+
+    assert model.calls == [texts[0:4], texts[4:8], texts[8:10]]
+    assert results == [[[1, ord(t)]] for t in texts]
+
+def test_concurrent_callers_get_their_own_results():
+    """Verify encode() from many threads returns each thread's vectors while sharing batches."""
+    model = FakeModel()
+    service = EmbeddingService(model, batch_window=0.05, max_batch=16)
+    service.start()
+    results = {}
+    barrier = threading.Barrier(12)
+
+    def caller(i):
+        text = chr(ord("a") + i) * (i + 1)
+        barrier.wait()
+        results[i] = service.encode([text])
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(12)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    service.stop()
+
+    assert results == {i: [[i + 1, ord("a") + i]] for i in range(12)}
+    assert len(model.calls) < 12
+    assert all(len(call) <= 16 for call in model.calls)
+
+def test_oversized_request_is_encoded_alone():
+    """Verify a request larger than max_batch still goes through as its own batch."""
+    model = FakeModel()
+    service = EmbeddingService(model, batch_window=0.05, max_batch=2)
+    service.start()
+    assert service.encode(["x", "y", "z"]) == [[1, ord("x")], [1, ord("y")], [1, ord("z")]]
+    service.stop()
+    assert model.calls == [["x", "y", "z"]]
+
+def test_model_failure_fails_every_request_in_the_batch():
+    """Verify an exception from the model reaches each caller instead of hanging them."""
+    model = FakeModel(fail=True)
+    service = EmbeddingService(model, batch_window=0.2)
+    futures = [service.submit(["a"]), service.submit(["b"])]
+    service.start()
+    for f in futures:
+        with pytest.raises(RuntimeError):
+            f.result(timeout=2)
+    service.stop()
+    assert service.stats()["failed_batches"] == 1
+
+def test_submit_after_stop_fails():
+    """Verify a stopped service refuses new work and empty requests resolve at once."""
+    service = EmbeddingService(FakeModel())
+    service.start()
+    service.stop()
+    assert service.submit([]).result(timeout=1) == []
+    with pytest.raises(RuntimeError):
+        service.encode(["a"])
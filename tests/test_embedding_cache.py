@@ -0,0 +1,73 @@
+# tests/test_embedding_cache.py
+import numpy as np
+
+from database.embedding_cache import EmbeddingCache
+
+def fake_model(dim=4):
+    calls = []
+    def encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(t)] * dim for t in texts], dtype=np.float64)
+    return encode, calls
+
+def test_duplicates_in_a_batch_are_encoded_once():
+    """Verify repeated texts in one call share a single model call and vector."""
+    cache = EmbeddingCache()
+    encode, calls = fake_model()
+    vectors = cache.encode(["a", "bb", "a", "a"], encode)
+    assert calls == [["a", "bb"]]
+    assert [v[0] for v in vectors] == [1, 2, 1, 1]
+    assert all(v.dtype == np.float32 for v in vectors)
+    assert cache.stats()["misses"] == 4
+
+def test_repeats_are_served_from_memory():
+    """Verify a second call for known texts never reaches the model."""
+    cache = EmbeddingCache()
+    encode, calls = fake_model()
+    cache.encode(["a", "bb"], encode)
+    cache.encode(["bb", "ccc"], encode)
+    assert calls == [["a", "bb"], ["ccc"]]
+    assert cache.stats()["hits"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    """Verify the entry bound evicts the oldest unused vector, not the recently read one."""
+    cache = EmbeddingCache(max_entries=2)
+    encode, calls = fake_model()
+    cache.encode(["a", "bb"], encode)
+    cache.encode(["a"], encode)  # "a" is now the most recently used
+    cache.encode(["ccc"], encode)  # evicts "bb"
+    assert cache.stats()["evictions"] == 1
+    cache.encode(["a"], encode)
+    cache.encode(["bb"], encode)
+    assert calls == [["a", "bb"], ["ccc"], ["bb"]]
+
+def test_byte_bound_evicts():
+    """Verify max_bytes caps the memory tier."""
+    cache = EmbeddingCache(max_entries=None, max_bytes=2 * 4 * 4)
+    encode, _ = fake_model()
+    cache.encode(["a", "bb", "ccc"], encode)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 32 and stats["evictions"] == 1
+
+def test_sqlite_tier_survives_a_restart(tmp_path):
+    """Verify vectors persisted by one cache are read back bit for bit by the next."""
+    path = str(tmp_path / "embeddings.sqlite")
+    first = EmbeddingCache(path=path, namespace="m")
+    encode, calls = fake_model()
+    original = first.encode(["a", "bb"], encode)
+    first.close()
+
+    second = EmbeddingCache(path=path, namespace="m")
+    restored = second.encode(["bb", "a"], encode)
+    assert calls == [["a", "bb"]]
+    assert np.array_equal(restored[0], original[1]) and np.array_equal(restored[1], original[0])
+    assert second.stats()["disk_hits"] == 2
+    second.close()
+
+def test_namespaces_do_not_share_vectors(tmp_path):
+    """Verify a different model namespace misses on the same file."""
+    path = str(tmp_path / "embeddings.sqlite")
+    encode, calls = fake_model()
+    EmbeddingCache(path=path, namespace="m1").encode(["a"], encode)
+    EmbeddingCache(path=path, namespace="m2").encode(["a"], encode)
+    assert calls == [["a"], ["a"]]
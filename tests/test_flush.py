@@ -0,0 +1,45 @@
+# tests/test_flush.py
+import pytest
+
+from ingestion.flush import FlushPolicy, AdaptiveFlushPolicy, make_flush_policy
+
+def test_fixed_policy_flushes_on_rows_or_age():
+    policy = FlushPolicy(max_rows=100, max_latency=0.5)
+    assert policy.due(100, 0.0)
+    assert policy.due(1, 0.5)
+    assert not policy.due(99, 0.4)
+    assert not policy.due(0, 10.0)  # Nothing buffered, nothing to flush
+
+def test_wait_time_counts_down_to_the_latency_trigger():
+    policy = FlushPolicy(max_rows=100, max_latency=0.5)
+    assert policy.wait_time(0, 0.0) is None
+    assert policy.wait_time(10, 0.2) == pytest.approx(0.3)
+    assert policy.wait_time(10, 0.9) == 0.0
+
+def test_adaptive_policy_grows_at_most_2x_per_flush():
+    policy = AdaptiveFlushPolicy(max_rows=1000, target_secs=0.5, min_rows=100, cap_rows=100_000)
+    policy.observe(1000, 0.01)  # 100k rows/s wants 50k-row flushes
+    assert policy.max_rows == 2000
+    for _ in range(20):
+        policy.observe(policy.max_rows, 0.01)
+    assert policy.max_rows == 100_000  # Capped
+
+def test_adaptive_policy_shrinks_at_most_half_per_flush():
+    policy = AdaptiveFlushPolicy(max_rows=8000, target_secs=0.5, min_rows=100, cap_rows=100_000, alpha=1.0)
+    policy.observe(100, 10.0)  # 10 rows/s wants 5-row flushes
+    assert policy.max_rows == 4000
+    for _ in range(20):
+        policy.observe(100, 10.0)
+    assert policy.max_rows == 100  # Floored
+
+def test_adaptive_policy_ignores_empty_observations():
+    policy = AdaptiveFlushPolicy(max_rows=1000)
+    policy.observe(0, 1.0)
+    policy.observe(10, 0.0)
+    assert policy.rate is None and policy.max_rows == 1000
+
+def test_make_flush_policy():
+    assert isinstance(make_flush_policy("adaptive"), AdaptiveFlushPolicy)
+    assert type(make_flush_policy("fixed")) is FlushPolicy
+    with pytest.raises(ValueError):
+        make_flush_policy("sometimes")
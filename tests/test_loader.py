@@ -0,0 +1,50 @@
+# tests/test_loader.py
+import gzip
+import json
+from ingestion.loader import BulkLoader, parse_chunk, read_checkpoint
+
+class ListSink:
+    def __init__(self):
+        self.rows = 0
+
+    def write(self, batch):
+        self.rows += len(batch)
+
+    def close(self):
+        pass
+
+def line(**overrides):
+    record = {"ts": 1760000000.0, "agent_id": "agent_1", "level": "INFO", "action": "tool_call", "payload": {"latency": 5}}
+    record.update(overrides)
+    return json.dumps(record)
+
+def test_parse_chunk_accepts_iso_timestamps():
+    """Verify ISO-8601 ts (as in historical dumps) parse, UTC when no offset is given."""
+    data = "\n".join([line(ts="2024-05-01T10:00:00Z"), line(ts="2024-05-01T10:00:00"),
+                      line(ts="2024-05-01T12:00:00+02:00")]).encode()
+    batch, bad, _ = parse_chunk(data)
+    assert bad == 0
+    assert batch.ts.tolist() == [1714557600.0] * 3
+
+def test_load_counts_bad_lines(tmp_path):
+    """Verify a dump with bad lines loads the rest and records them as bad_lines."""
+    lines = [line(ts=1760000000.0 + i) for i in range(100)]
+    lines[10] = "{not json"
+    lines[20] = line(ts="yesterday")
+    lines[30] = line(embedding=[0.1, 0.2])
+    lines[31] = line(embedding=[0.1, 0.2, 0.3])  # a different width than the first vector
+    lines[40] = line(ts="2024-05-01T10:00:00Z")
+    path = str(tmp_path / "dump.ndjson.gz")
+    with gzip.open(path, "wt") as f:
+        f.write("\n".join(lines) + "\n")
+
+    sink = ListSink()
+    loader = BulkLoader(sink, parse_workers=0, chunk_bytes=1024)
+    assert loader.load(path) == 97
+    state = read_checkpoint(path + ".checkpoint")
+    assert state["done"] and state["rows"] == 97 and state["bad_lines"] == 3
+    assert sink.rows == 97
+
+    # Done files are skipped on a rerun
+    assert loader.load(path) == 0
+    loader.close()
@@ -0,0 +1,74 @@
+# tests/test_pools.py
+from contextlib import contextmanager
+
+import psycopg
+import pytest
+
+from api.pools import ReadRouter
+
+class FakePool:
+    def __init__(self, name, fail=None):
+        self.name = name
+        self.fail = fail  # raised when a connection is requested
+
+    @contextmanager
+    def connection(self, timeout=None):
+        if self.fail:
+            raise self.fail
+        yield self.name
+
+def make_router(*replicas, **kwargs):
+    router = ReadRouter(FakePool("primary"), [FakePool(name) for name in replicas], **kwargs)
+    for replica in router.replicas:
+        replica.healthy, replica.lag_secs, replica.latency_ms = True, 0.0, 1.0
+    return router
+
+def test_round_robin_over_healthy_replicas():
+    router = make_router("r0", "r1")
+    assert [router.choose().pool.name for _ in range(4)] == ["r0", "r1", "r0", "r1"]
+    router.replicas[0].healthy = False
+    assert {router.choose().pool.name for _ in range(4)} == {"r1"}
+
+def test_least_latency_picks_the_fastest():
+    router = make_router("r0", "r1", strategy="least_latency")
+    router.replicas[0].latency_ms = 9.0
+    assert router.choose().pool.name == "r1"
+
+def test_lag_bound_and_unknown_lag():
+    """Verify replicas over max_lag, or whose lag is unknown, fall back to the primary."""
+    router = make_router("r0", "r1", max_lag=2.0)
+    router.replicas[0].lag_secs = 5.0
+    router.replicas[1].lag_secs = None
+    assert router.choose() is None
+    router.replicas[1].lag_secs = 1.5
+    assert router.choose().pool.name == "r1"
+    assert make_router("r0").choose() is not None  # No bound: lag doesn't matter
+
+def test_connection_falls_back_to_the_primary():
+    router = make_router("r0")
+    router.replicas[0].healthy = False
+    with router.connection() as conn:
+        assert conn == "primary"
+    assert (router.primary_reads, router.fallbacks) == (1, 1)
+
+def test_failing_to_connect_marks_the_replica_unhealthy():
+    router = make_router("r0")
+    router.replicas[0].pool.fail = psycopg.OperationalError("connection refused")
+    with pytest.raises(psycopg.OperationalError):
+        with router.connection():
+            pass
+    assert not router.replicas[0].healthy
+    assert router.choose() is None
+
+def test_query_errors_leave_replica_health_alone():
+    """Verify a statement_timeout cancel in the caller's query doesn't take the replica out of rotation."""
+    router = make_router("r0")
+    with pytest.raises(psycopg.errors.QueryCanceled):
+        with router.connection() as conn:
+            assert conn == "r0"
+            raise psycopg.errors.QueryCanceled("canceling statement due to statement timeout")
+    assert router.replicas[0].healthy and router.replicas[0].last_error is None
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        ReadRouter(FakePool("primary"), strategy="random")
@@ -0,0 +1,46 @@
+# tests/test_rollups.py
+import numpy as np
+import pytest
+
+from database.rollups import aggregate, merge_rollup_rows, sketch_indices, sketch_quantile, SKETCH_BUCKETS
+
+def entries(latencies, ts=1760000000.0, agent="agent_1", action="step"):
+    return [(ts + i * 0.001, agent, action, latency) for i, latency in enumerate(latencies)]
+
+def read_rows(rows, resolution=1):
+    """aggregate() rows of one resolution, in the shape fetch_rollup_rows() returns."""
+    return [(row[1],) + tuple(row[4:]) for row in rows if row[0] == resolution]
+
+def test_quantiles_within_sketch_error():
+    rng = np.random.default_rng(7)
+    latencies = rng.lognormal(mean=5, sigma=1, size=20_000)
+    counts = np.bincount(sketch_indices(latencies), minlength=SKETCH_BUCKETS)
+    for q in (0.5, 0.95, 0.99):
+        assert sketch_quantile(counts, q) == pytest.approx(np.quantile(latencies, q), rel=0.06)
+
+def test_empty_and_sub_millisecond_sketches():
+    assert sketch_quantile(np.zeros(SKETCH_BUCKETS), 0.5) is None
+    assert sketch_quantile(np.bincount(sketch_indices([0.2, 0.5]), minlength=SKETCH_BUCKETS), 0.5) == 1.0
+
+def test_merging_partial_rollups_matches_one_pass():
+    """Verify rollups upserted per flush (or per shard) merge to the same answer as one aggregate."""
+    latencies = list(np.random.default_rng(1).uniform(20, 2000, 1000))
+    first, second = entries(latencies[:400]), entries(latencies[400:], ts=1760000000.4)
+    merged = merge_rollup_rows(read_rows(aggregate(first)) + read_rows(aggregate(second)))
+    whole = merge_rollup_rows(read_rows(aggregate(first + second)))
+    assert merged == whole
+    assert whole[0]["count"] == 1000
+    assert whole[0]["min"] == min(latencies) and whole[0]["max"] == max(latencies)
+
+def test_rows_without_latency_count_but_stay_out_of_the_sketch():
+    rows = read_rows(aggregate(entries([None, None, 100.0])))
+    (bucket,) = merge_rollup_rows(rows)
+    assert bucket["count"] == 3
+    assert bucket["avg"] == 100.0
+    assert bucket["p50"] == pytest.approx(100.0, rel=0.06)
+
+def test_coarser_buckets_fold_the_one_second_rows():
+    rows = read_rows(aggregate(entries([10.0] * 3, ts=1760000100) + entries([30.0] * 3, ts=1760000170)))
+    buckets = merge_rollup_rows(rows, bucket_secs=60)
+    assert [b["count"] for b in buckets] == [3, 3]
+    assert merge_rollup_rows(rows, bucket_secs=300)[0]["avg"] == 20.0
@@ -0,0 +1,75 @@
+# tests/test_sharding.py
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from database.sharding import HashRing, ShardRouter, merge_top_k
+from ingestion.batch import LogBatch
+
+AGENTS = [f"agent_{i}" for i in range(2000)]
+
+@pytest.fixture
+def router():
+    r = ShardRouter(["postgresql://shard0", "postgresql://shard1", "postgresql://shard2"])
+    yield r
+    r.close()
+
+def test_ring_is_deterministic_and_spreads_keys():
+    ring = HashRing(4)
+    owners = [ring.node_for(a) for a in AGENTS]
+    assert owners == [HashRing(4).node_for(a) for a in AGENTS]
+    counts = np.bincount(owners, minlength=4)
+    assert counts.min() > len(AGENTS) / 4 * 0.6
+
+def test_adding_a_node_only_moves_keys_to_it():
+    """Verify growing the ring relocates about 1/N of the keys, all onto the new node."""
+    before, after = HashRing(4), HashRing(5)
+    moved = [a for a in AGENTS if before.node_for(a) != after.node_for(a)]
+    assert all(after.node_for(a) == 4 for a in moved)
+    assert 0.1 < len(moved) / len(AGENTS) < 0.3
+
+def test_split_batch_routes_every_row_once(router):
+    records = [{"ts": 1760000000 + i, "agent_id": AGENTS[i % 40], "level": "INFO", "action": "step",
+                "payload": {"i": i}} for i in range(200)]
+    batch = LogBatch.from_records(records)
+    parts = router.split_batch(batch)
+    assert sorted(shard for shard, _ in parts) == sorted({router.shard_for(a) for a in AGENTS[:40]})
+    seen = []
+    for shard, part in parts:
+        agents = [part.agents[c] for c in part.agent_codes.tolist()]
+        assert {router.shard_for(a) for a in agents} == {shard}
+        seen += part.ts.tolist()
+    assert sorted(seen) == batch.ts.tolist()
+
+def test_split_batch_single_shard_and_empty():
+    single = ShardRouter(["postgresql://only"])
+    batch = LogBatch.from_records([{"ts": 1, "agent_id": "a", "level": "INFO", "action": "x", "payload": {}}])
+    assert single.split_batch(batch) == [(0, batch)]
+    assert single.split_batch(batch[0:0]) == []
+
+def test_merge_top_k_takes_the_global_best():
+    shards = [[(0.1, "a"), (0.5, "b")], [(0.2, "c"), (0.3, "d")], []]
+    assert merge_top_k(shards, 3, key=lambda row: row[0]) == [(0.1, "a"), (0.2, "c"), (0.3, "d")]
+    assert merge_top_k(shards, 10, key=lambda row: row[0])[-1] == (0.5, "b")
+
+def test_concurrent_fan_outs_are_not_capped_at_one_thread_per_shard():
+    """Verify a shared router runs max_workers shard calls at once, not len(shards)."""
+    shared = ShardRouter(["postgresql://shard0", "postgresql://shard1"], max_workers=8)
+    running, peak, lock = [0], [0], threading.Lock()
+    def query(shard):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return shard
+    callers = [threading.Thread(target=shared.map, args=(query,)) for _ in range(4)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+    shared.close()
+    assert peak[0] == 8
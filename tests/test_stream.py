@@ -0,0 +1,62 @@
+# tests/test_stream.py
+import asyncio
+
+from api.stream import StatsBroadcaster
+
+def point(ts, latency=10):
+    return {"ts": ts, "latency": latency}
+
+def drain(sub):
+    points = []
+    while not sub.queue.empty():
+        points.append(sub.queue.get_nowait())
+    return points
+
+def test_new_clients_get_the_history_with_the_current_second_updated():
+    broadcaster = StatsBroadcaster(lambda: [], history=3)
+    broadcaster.subscribe()
+    for p in (point(1), point(2), point(3), point(3, latency=20), point(4)):
+        broadcaster.publish(p)
+    assert broadcaster.snapshot() == [point(2), point(3, latency=20), point(4)]
+
+def test_history_is_cleared_when_the_last_client_leaves():
+    """Verify a client arriving after an idle spell isn't replayed points from before it."""
+    broadcaster = StatsBroadcaster(lambda: [])
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    broadcaster.publish(point(1))
+    broadcaster.unsubscribe(first)
+    assert broadcaster.snapshot() == [point(1)]
+    broadcaster.unsubscribe(second)
+    assert broadcaster.snapshot() == []
+    assert broadcaster._deltas([point(1)]) == [point(1)]  # Sent again to whoever connects next
+
+def test_only_new_or_changed_points_are_published():
+    broadcaster = StatsBroadcaster(lambda: [])
+    assert broadcaster._deltas([point(1), point(2)]) == [point(1), point(2)]
+    assert broadcaster._deltas([point(1), point(2, latency=30), point(3)]) == [point(2, latency=30), point(3)]
+    assert broadcaster._deltas([point(2, latency=30), point(3)]) == []
+
+def test_slow_client_drops_oldest_then_is_disconnected():
+    broadcaster = StatsBroadcaster(lambda: [], buffer_size=2, max_lag=3)
+    slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+    broadcaster.publish(point(1))
+    broadcaster.publish(point(2))
+    assert drain(fast) == [point(1), point(2)]
+    broadcaster.publish(point(3))  # slow drops point 1
+    assert drain(fast) == [point(3)]
+    assert slow.dropped == 1 and not slow.closed and fast.dropped == 0
+    for ts in (4, 5):
+        broadcaster.publish(point(ts))
+        drain(fast)
+    assert slow.closed and broadcaster.disconnected == 1
+    assert drain(slow)[-1] is None  # Wakes the client's generator to end the response
+    assert broadcaster.subscribers == {fast}
+
+def test_reading_resets_the_lag_count():
+    broadcaster = StatsBroadcaster(lambda: [], buffer_size=1, max_lag=2)
+    sub = broadcaster.subscribe()
+    for ts in range(10):
+        broadcaster.publish(point(ts))
+        broadcaster.publish(point(ts + 0.5))  # One drop each time...
+        assert asyncio.run(sub.get()) == point(ts + 0.5)  # ...but the client keeps reading
+    assert not sub.closed and sub.dropped == 10
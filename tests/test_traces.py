@@ -0,0 +1,44 @@
+# tests/test_traces.py
+from datetime import datetime, timezone
+
+import pytest
+
+from api.traces import build_span_tree, encode_cursor, decode_cursor, shard_bound
+
+def span(span_id, parent=None, ts=0):
+    return {"span_id": span_id, "parent_span_id": parent, "ts": ts}
+
+def shape(ordered):
+    return [(s["span_id"], s["depth"]) for s in ordered]
+
+def test_tree_is_depth_first_with_children_by_ts():
+    spans = [span("root", ts=0), span("b", "root", ts=2), span("a", "root", ts=1), span("a1", "a", ts=3)]
+    spans.sort(key=lambda s: s["ts"])  # Shards answer in ts order
+    ordered = build_span_tree(spans)
+    assert shape(ordered) == [("root", 0), ("a", 1), ("a1", 2), ("b", 1)]
+    assert ordered[0]["children"] == ["a", "b"]
+
+def test_orphans_and_cycles_become_roots():
+    spans = [span("x", "missing"), span("p", "q"), span("q", "p"), span("self", "self")]
+    ordered = build_span_tree(spans)
+    assert sorted(s["span_id"] for s in ordered) == ["p", "q", "self", "x"]
+    assert {s["span_id"]: s["depth"] for s in ordered}["x"] == 0
+
+def test_deep_chain_does_not_recurse():
+    spans = [span("s0")] + [span(f"s{i}", f"s{i - 1}", ts=i) for i in range(1, 5000)]
+    ordered = build_span_tree(spans)
+    assert ordered[-1]["depth"] == 4999
+
+def test_cursor_round_trip():
+    ts = datetime(2026, 10, 18, 12, 30, 1, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(ts, 2, 991)) == (ts, 2, 991)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+def test_shard_bound_continues_the_global_order():
+    """Verify (ts, shard, id) descending: at the cursor's ts, lower shards still have rows to give."""
+    ts = datetime(2026, 10, 18, tzinfo=timezone.utc)
+    cursor = (ts, 1, 50)
+    assert shard_bound(cursor, 1) == (ts, 50)
+    assert shard_bound(cursor, 0)[1] > 10 ** 18  # Every row at ts is still ahead
+    assert shard_bound(cursor, 2) == (ts, 0)    # Every row at ts was already returned
@@ -0,0 +1,88 @@
+# tests/test_transport.py
+import json
+import queue
+
+import pytest
+
+from ingestion.batch import LogBatch
+from ingestion.transport import SharedMemoryTransport, decode_records, encode_records
+
+def log(i):
+    return {"ts": 1760000000.0 + i, "agent_id": f"agent_{i % 3}", "level": "INFO", "action": "tool_call",
+            "payload": {"latency": i}, "embedding": [0.1 * i, 0.2, 0.3]}
+
+@pytest.fixture
+def shm():
+    transport = SharedMemoryTransport(slots=1, slot_bytes=4096)
+    yield transport
+    transport._release()
+    transport.cleanup()
+
+def slot_is_free(transport):
+    """Takes the free slot if there is one, and gives it back."""
+    try:
+        slot = transport.free.get(timeout=0.2)
+    except queue.Empty:
+        return False
+    transport.free.put(slot)
+    return True
+
+def test_records_round_trip():
+    """Verify framed records decode back to the same bytes, including empty ones."""
+    records = ["a", b"", "é" * 3, json.dumps(log(1))]
+    assert decode_records(encode_records(records)) == [r.encode("utf-8") if isinstance(r, str) else r
+                                                        for r in records]
+
+def test_json_batch_round_trip_releases_the_slot_at_once(shm):
+    """Verify a JSON-lines batch arrives intact and its slot is free again after recv."""
+    lines = [json.dumps(log(i)) for i in range(5)]
+    assert shm.send(lines, seq=7) == 1
+    assert shm.recv(timeout=1) == [line.encode("utf-8") for line in lines]
+    assert shm.last_seq == 7 and shm.last_offset == 0
+    assert slot_is_free(shm)
+
+def test_columnar_batch_holds_its_slot_until_the_next_recv(shm):
+    """Verify a LogBatch maps onto the slot and the slot is reused only after the worker moves on."""
+    sent = LogBatch.from_records([log(i) for i in range(4)])
+    shm.send(sent, seq=1)
+    received = shm.recv(timeout=1)
+    assert received.ts.tolist() == sent.ts.tolist()
+    assert received.payloads == sent.payloads
+    assert received.embeddings.tolist() == sent.embeddings.tolist()
+    assert not slot_is_free(shm)
+    del received
+
+    # The next recv releases the held slot, which the producer can then reuse
+    with pytest.raises(queue.Empty):
+        shm.recv(timeout=0.05)
+    shm.send([b"next"], seq=2)
+    assert shm.recv(timeout=1) == [b"next"]
+    assert shm.last_seq == 2
+
+def test_oversized_batch_is_split_across_slots():
+    """Verify a batch bigger than a slot is sent in pieces with their row offsets."""
+    transport = SharedMemoryTransport(slots=8, slot_bytes=256)
+    try:
+        lines = [json.dumps(log(i)) for i in range(8)]
+        parts = transport.send(lines, seq=3)
+        assert parts > 1
+        received = []
+        for _ in range(parts):
+            batch = transport.recv(timeout=1)
+            assert transport.last_offset == len(received)
+            received.extend(batch)
+        assert received == [line.encode("utf-8") for line in lines]
+    finally:
+        transport.cleanup()
+
+def test_single_record_larger_than_a_slot_is_refused(shm):
+    """Verify a record that can never fit raises instead of splitting forever."""
+    with pytest.raises(ValueError):
+        shm.send(["x" * 5000])
+    assert slot_is_free(shm)
+
+def test_close_wakes_workers(shm):
+    """Verify close() sends one None per worker."""
+    shm.close(2)
+    assert shm.recv(timeout=1) is None
+    assert shm.recv(timeout=1) is None
@@ -0,0 +1,95 @@
+# tests/test_workload.py
+import json
+
+import numpy as np
+import pytest
+
+from ingestion.batch import LogBatch
+from ingestion.workload import LATENCY_RANGES, SEED_EPOCH, WorkloadGenerator, to_json_lines
+
+def columns(batch):
+    return (batch.ts.tolist(), batch.agent_codes.tolist(), batch.level_codes.tolist(), batch.action_codes.tolist(),
+            batch.payloads, batch.latency.tolist(),
+            None if batch.embeddings is None else batch.embeddings.tolist())
+
+def test_same_seed_gives_identical_batches():
+    """Verify two generators with one seed produce the same rows, batch after batch."""
+    a = WorkloadGenerator(seed=7, dim=8)
+    b = WorkloadGenerator(seed=7, dim=8)
+    for n in (100, 1, 250):
+        assert columns(a.batch(n)) == columns(b.batch(n))
+
+def test_different_seeds_differ():
+    """Verify the seed actually drives the draws."""
+    assert columns(WorkloadGenerator(seed=1, dim=8).batch(50)) != columns(WorkloadGenerator(seed=2, dim=8).batch(50))
+
+def test_seeded_ts_start_at_the_epoch_and_increase():
+    """Verify seeded runs start at SEED_EPOCH and arrivals keep going across batches."""
+    gen = WorkloadGenerator(seed=3, rate=1000.0, dim=0)
+    first, second = gen.batch(500), gen.batch(500)
+    ts = np.concatenate([first.ts, second.ts])
+    assert ts[0] > SEED_EPOCH and np.all(np.diff(ts) > 0)
+    # Poisson arrivals at 1000/s: ~1s for 1000 rows
+    assert 0.8 < ts[-1] - SEED_EPOCH < 1.2
+
+def test_outcome_rates_and_latency_ranges_are_respected():
+    """Verify level mix follows warning_rate / error_rate and latency stays in each outcome's range."""
+    batch = WorkloadGenerator(seed=11, warning_rate=0.1, error_rate=0.05, dim=0).batch(20_000)
+    rates = np.bincount(batch.level_codes, minlength=3) / len(batch)
+    assert rates == pytest.approx([0.85, 0.1, 0.05], abs=0.01)
+    for outcome, (low, high) in enumerate(LATENCY_RANGES):
+        latency = batch.latency[batch.level_codes == outcome]
+        assert latency.min() >= low and latency.max() <= high
+
+def test_zero_error_rate_gives_no_errors():
+    """Verify rates of 0 are honored exactly."""
+    batch = WorkloadGenerator(seed=5, warning_rate=0.0, error_rate=0.0, dim=0).batch(2000)
+    assert set(batch.level_codes.tolist()) == {0}
+
+def test_rates_over_one_are_refused():
+    with pytest.raises(ValueError):
+        WorkloadGenerator(warning_rate=0.6, error_rate=0.5)
+
+def test_agent_and_action_counts_are_respected():
+    """Verify codes stay inside the vocabularies and extra actions get generated names."""
+    gen = WorkloadGenerator(seed=9, agents=3, actions=12, dim=0)
+    batch = gen.batch(5000)
+    assert batch.agents == ["agent_1", "agent_2", "agent_3"]
+    assert len(batch.actions) == 12 and batch.actions[-1] == "action_11"
+    assert set(batch.agent_codes.tolist()) == {0, 1, 2}
+    assert batch.action_codes.max() < 12
+
+def test_action_skew_favors_the_first_actions():
+    """Verify Zipf skew makes the first action the most common one, and 0 keeps it uniform."""
+    skewed = WorkloadGenerator(seed=2, action_skew=1.5, dim=0).batch(10_000)
+    counts = np.bincount(skewed.action_codes, minlength=10)
+    assert counts.argmax() == 0 and counts[0] > 3 * counts[-1]
+    uniform = WorkloadGenerator(seed=2, action_skew=0.0, dim=0).batch(10_000)
+    assert np.bincount(uniform.action_codes, minlength=10) / 10_000 == pytest.approx([0.1] * 10, abs=0.015)
+
+def test_dim_zero_leaves_embeddings_null():
+    batch = WorkloadGenerator(seed=1, dim=0).batch(10)
+    assert batch.embeddings is None
+
+def test_embeddings_cluster_around_their_action_centroid():
+    """Verify vectors have the requested width and sit within ~spread of their centroid."""
+    gen = WorkloadGenerator(seed=4, dim=32, clusters=4, spread=0.3)
+    batch = gen.batch(1000)
+    assert batch.embeddings.shape == (1000, 32) and batch.embeddings.dtype == np.float32
+    centroids = gen.centroids[gen.action_cluster[batch.action_codes]]
+    distance = np.linalg.norm(batch.embeddings - centroids, axis=1)
+    assert distance.mean() == pytest.approx(0.3, rel=0.1)
+
+def test_stream_yields_exactly_total_rows():
+    sizes = [len(b) for b in WorkloadGenerator(seed=1, dim=0).stream(2500, batch_size=1000)]
+    assert sizes == [1000, 1000, 500]
+
+def test_json_lines_parse_back_into_the_same_rows():
+    """Verify to_json_lines output is accepted by LogBatch.from_json with the same values."""
+    batch = WorkloadGenerator(seed=6, dim=4).batch(20)
+    lines = to_json_lines(batch)
+    assert all(json.loads(line)["payload"]["step"] == i for i, line in enumerate(lines))
+    parsed = LogBatch.from_json(lines)
+    assert parsed.ts.tolist() == batch.ts.tolist()
+    assert parsed.latency.tolist() == batch.latency.tolist()
+    assert parsed.embeddings.shape == (20, 4)
@@ -0,0 +1,106 @@
+# tests/test_write_behind.py
+import threading
+import time
+
+from api.write_behind import WriteBehindQueue
+
+class Recorder:
+    def __init__(self, fail_times=0, delay=0.0):
+        self.groups = []
+        self.fail_times = fail_times
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, group):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls += 1
+            if self.calls <= self.fail_times:
+                raise RuntimeError("database is down")
+            self.groups.append(list(group))
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+def test_full_group_flushes_without_waiting_for_the_interval():
+    """Verify flush_rows items go out as one group well before flush_interval."""
+    flush = Recorder()
+    wb = WriteBehindQueue(flush, flush_rows=5, flush_interval=0.5)
+    for i in range(5):
+        assert wb.put(i)
+    wb.start()
+    assert wait_for(lambda: flush.groups, timeout=0.2)
+    assert flush.groups == [[0, 1, 2, 3, 4]]
+    wb.stop()
+
+def test_partial_group_flushes_once_the_interval_closes():
+    """Verify a group smaller than flush_rows is flushed after flush_interval."""
+    flush = Recorder()
+    wb = WriteBehindQueue(flush, flush_rows=100, flush_interval=0.05)
+    wb.start()
+    wb.put("a")
+    wb.put("b")
+    assert wait_for(lambda: flush.groups)
+    assert flush.groups == [["a", "b"]]
+    assert wb.stats()["flushed_rows"] == 2
+    wb.stop()
+
+def test_full_queue_rejects():
+    """Verify put() returns False instead of blocking when the queue is full."""
+    wb = WriteBehindQueue(Recorder(), max_size=2)
+    assert wb.put(1) and wb.put(2)
+    assert not wb.put(3)
+    assert wb.stats()["rejected"] == 1
+
+def test_stop_drains_queued_items_and_refuses_new_ones():
+    """Verify stop() flushes everything already queued before returning."""
+    flush = Recorder(delay=0.01)
+    wb = WriteBehindQueue(flush, flush_rows=10, flush_interval=0.02)
+    wb.start()
+    for i in range(35):
+        assert wb.put(i)
+    wb.stop()
+    assert sorted(item for group in flush.groups for item in group) == list(range(35))
+    assert wb.stats()["depth"] == 0
+    assert not wb.put(99)
+
+def test_failed_group_is_requeued_and_retried():
+    """Verify a group whose flush raises is flushed again rather than lost."""
+    flush = Recorder(fail_times=2)
+    wb = WriteBehindQueue(flush, flush_rows=3, flush_interval=0.01)
+    for i in range(3):
+        wb.put(i)
+    wb.start()
+    assert wait_for(lambda: flush.groups)
+    assert flush.groups == [[0, 1, 2]]
+    stats = wb.stats()
+    assert stats["retried_rows"] == 6 and stats["failed_rows"] == 0 and stats["flushed_rows"] == 3
+    wb.stop()
+
+def test_group_is_dropped_after_max_retries():
+    """Verify a group that keeps failing is counted as failed instead of retried forever."""
+    flush = Recorder(fail_times=100)
+    wb = WriteBehindQueue(flush, flush_rows=2, flush_interval=0.01, max_retries=2)
+    wb.put("a")
+    wb.put("b")
+    wb.start()
+    assert wait_for(lambda: wb.stats()["failed_rows"] == 2)
+    assert flush.calls == 3 and not flush.groups
+    wb.stop()
+
+def test_partial_failures_are_counted():
+    """Verify a flush_fn return value is counted as failed rows, not retried."""
+    wb = WriteBehindQueue(lambda group: 1, flush_rows=4, flush_interval=0.01)
+    for i in range(4):
+        wb.put(i)
+    wb.start()
+    assert wait_for(lambda: wb.stats()["flushes"] == 1)
+    stats = wb.stats()
+    assert stats["flushed_rows"] == 3 and stats["failed_rows"] == 1 and stats["retried_rows"] == 0
+    wb.stop()